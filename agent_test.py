@@ -7,7 +7,10 @@ interface, but cannot be automatically assessed for correctness.
 STUDENTS SHOULD NOT NEED TO MODIFY THIS CODE.  IT WOULD BE BEST TO TREAT THIS
 FILE AS A BLACK BOX FOR TESTING.
 """
+import json
+import pickle
 import random
+import struct
 import unittest
 import timeit
 import sys
@@ -24,6 +27,7 @@ from threading import Thread
 from multiprocessing import TimeoutError
 from queue import Empty as QueueEmptyError
 from importlib import reload
+from isolation.geometry import DIRECTIONS
 
 WRONG_MOVE = """
 The {} function failed because it returned a non-optimal move at search depth {}.
@@ -536,5 +540,1245 @@ class Project1Test(unittest.TestCase):
                 legal_moves, chosen_move))
 
 
+class BitBoardTest(unittest.TestCase):
+
+    def test_matches_board(self):
+        """ Test that BitBoard follows the same rules as Board """
+        rng = random.Random(0)
+        for w, h in [(7, 7), (5, 9), (9, 5)]:
+            board = isolation.Board("p1", "p2", w, h)
+            bitboard = isolation.BitBoard("p1", "p2", w, h)
+            while True:
+                for player in ("p1", "p2"):
+                    self.assertEqual(board.get_legal_moves(player),
+                                     bitboard.get_legal_moves(player))
+                    self.assertEqual(board.get_player_location(player),
+                                     bitboard.get_player_location(player))
+                    self.assertEqual(board.is_winner(player),
+                                     bitboard.is_winner(player))
+                    self.assertEqual(board.utility(player),
+                                     bitboard.utility(player))
+                self.assertEqual(board.get_blank_spaces(),
+                                 bitboard.get_blank_spaces())
+                self.assertEqual(board.to_string(), bitboard.to_string())
+
+                legal_moves = board.get_legal_moves()
+                if not legal_moves:
+                    break
+                move = rng.choice(legal_moves)
+                forecast = bitboard.forecast_move(move)
+                self.assertNotEqual(forecast.to_string(), bitboard.to_string())
+                board.apply_move(move)
+                bitboard.apply_move(move)
+                self.assertEqual(forecast.to_string(), bitboard.to_string())
+
+
+class GeometryTest(unittest.TestCase):
+
+    def test_tables_are_shared(self):
+        """ Test that boards of the same size share one set of tables and
+        that the reported memory usage covers every size built """
+        from isolation.geometry import get_geometry, memory_usage
+        boards = [isolation.Board("p1", "p2", 6, 4), isolation.BitBoard("p1", "p2", 6, 4),
+                  isolation.Board("p1", "p2", 3, 8)]
+        boards.append(boards[0].forecast_move((0, 0)))
+        small, large = get_geometry(6, 4), get_geometry(3, 8)
+        self.assertIsNot(small, large)
+        for board in boards[:2] + boards[3:]:
+            self.assertIs(small, board.__geometry__)
+        self.assertIs(large, boards[2].__geometry__)
+
+        usage = memory_usage()
+        self.assertEqual(small.memory_usage(), usage[(6, 4)])
+        self.assertEqual(large.memory_usage(), usage[(3, 8)])
+        self.assertGreater(small.memory_usage(), sys.getsizeof(small.zobrist_blocked))
+
+
+class MobilityTest(unittest.TestCase):
+
+    def test_matches_move_lists(self):
+        """ Test that the fused mobility terms and the heuristics using them
+        match the move lists and terminal tests of every game state """
+        import sample_players
+
+        def improved(game, player):
+            if game.is_loser(player):
+                return float("-inf")
+            if game.is_winner(player):
+                return float("inf")
+            return float(len(game.get_legal_moves(player)) -
+                         len(game.get_legal_moves(game.get_opponent(player))))
+
+        rng = random.Random(2)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for w, h in [(7, 7), (5, 8)]:
+                for _ in range(5):
+                    board = board_class("p1", "p2", w, h)
+                    while True:
+                        for player in ("p1", "p2"):
+                            opponent = board.get_opponent(player)
+                            utility = float("-inf") if board.is_loser(player) else \
+                                float("inf") if board.is_winner(player) else 0.
+                            self.assertEqual((len(board.get_legal_moves(player)),
+                                              len(board.get_legal_moves(opponent)),
+                                              len(board.get_blank_spaces()), utility),
+                                             board.mobility(player))
+                            self.assertEqual(utility, sample_players.null_score(board, player))
+                            self.assertEqual(improved(board, player),
+                                             sample_players.improved_score(board, player))
+                            self.assertEqual(improved(board, player),
+                                             game_agent.custom_score_simple(board, player))
+                        legal_moves = board.get_legal_moves()
+                        if not legal_moves:
+                            break
+                        board.apply_move(rng.choice(legal_moves))
+
+
+class BatchEvalTest(unittest.TestCase):
+
+    def test_matches_heuristics(self):
+        """ Test that the batch variant of every heuristic scores the children
+        of a position exactly like the heuristic scores each child """
+        import batch_eval
+        import sample_players
+
+        modules = {"game_agent": game_agent, "sample_players": sample_players}
+        score_fns = [getattr(modules[module], name) for module, name in batch_eval.BATCH_VARIANTS]
+        # the distance heuristics are undefined before both players moved
+        distance_fns = [game_agent.custom_score_diff_in_mine_and_double_opponent_chase_incase_of_tie,
+                        game_agent.custom_score_diff_in_mine_and_double_opponent_run_away_incase_of_tie,
+                        game_agent.custom_score_diff_in_mine_and_double_opponent_closest_to_center_tie]
+        rng = random.Random(5)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for w, h, prepared in [(7, 7, False), (7, 7, True), (5, 8, True)]:
+                board = board_class("p1", "p2", w, h)
+                if prepared:
+                    board.get_degrees()
+                while True:
+                    legal_moves = board.get_legal_moves()
+                    if not legal_moves:
+                        break
+                    for score_fn in score_fns:
+                        if board.move_count == 0 and score_fn in distance_fns:
+                            continue
+                        evaluator = batch_eval.BatchEvaluator.for_score(score_fn)
+                        for player in ("p1", "p2"):
+                            expected = [score_fn(board.forecast_move(move), player)
+                                        for move in legal_moves]
+                            self.assertEqual(expected, evaluator(board, legal_moves, player))
+                    board.apply_move(rng.choice(legal_moves))
+
+    def test_search_unchanged(self):
+        """ Test that batch evaluation does not change the search results """
+        from sample_players import improved_score
+
+        rng = random.Random(6)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class("p1", "p2", 7, 7)
+            for _ in range(8):
+                board.apply_move(rng.choice(board.get_legal_moves()))
+            for method in ("minimax", "alphabeta", "pvs"):
+                results = []
+                for batch_eval in (False, True):
+                    player = game_agent.CustomPlayer(4, improved_score, False, method,
+                                                     batch_eval=batch_eval)
+                    player.time_left = lambda: float("inf")
+                    results.append((player.search(board, 4, method=method),
+                                    player.nodes, player.leaf_evals, player.cutoffs))
+                self.assertEqual(results[0], results[1])
+
+        with self.assertRaises(ValueError):
+            game_agent.CustomPlayer(score_fn=lambda game, player: 0., batch_eval=True)
+
+
+class HeuristicsTest(unittest.TestCase):
+
+    def test_features(self):
+        """ Test that compiled heuristics match the hand-written heuristics
+        and the definitions of their features """
+        import heuristics
+
+        presets = {"simple": game_agent.custom_score_simple,
+                   "diff_in_mine_and_double_opponent": game_agent.custom_score_diff_in_mine_and_double_opponent,
+                   "chase_incase_of_tie": game_agent.custom_score_diff_in_mine_and_double_opponent_chase_incase_of_tie,
+                   "closest_to_center_tie": game_agent.custom_score_diff_in_mine_and_double_opponent_closest_to_center_tie}
+        features = {feature: heuristics.compile_heuristic({feature: 1.})
+                    for feature in ("own_moves2", "opp_moves2", "own_area", "blanks")}
+
+        def two_step(board, player):
+            blanks = set(board.get_blank_spaces())
+            return float(sum(len(blanks & set((r + dr, c + dc) for dr, dc in DIRECTIONS))
+                             for r, c in board.get_legal_moves(player)))
+
+        rng = random.Random(3)
+        board = isolation.Board("p1", "p2", 7, 7)
+        for _ in range(2):
+            board.apply_move(rng.choice(board.get_legal_moves()))
+        while board.get_legal_moves():
+            for player in ("p1", "p2"):
+                for name, score_fn in presets.items():
+                    self.assertEqual(score_fn(board, player),
+                                     heuristics.compile_heuristic(name)(board, player))
+                if board.utility(player):
+                    continue
+                opponent = board.get_opponent(player)
+                self.assertEqual(two_step(board, player), features["own_moves2"](board, player))
+                self.assertEqual(two_step(board, opponent), features["opp_moves2"](board, player))
+                self.assertEqual(bin(board.get_reachable_mask(player)).count("1"),
+                                 features["own_area"](board, player))
+                self.assertEqual(len(board.get_blank_spaces()), features["blanks"](board, player))
+            board.apply_move(rng.choice(board.get_legal_moves()))
+
+    def test_compile(self):
+        """ Test sweeps, pickling and invalid features """
+        import heuristics
+
+        grid = {"own_moves": [1.], "opp_moves": [-1., -2.], "opp_area": [0., -.5, -1.]}
+        compiled = heuristics.sweep(grid)
+        self.assertEqual(6, len(compiled))
+        self.assertEqual(6, len(set(h.name for h in compiled)))
+        self.assertNotIn("opp_area", heuristics.compile_heuristic({"own_moves": 1., "opp_area": 0.}).source)
+
+        board = isolation.Board("p1", "p2", 7, 7)
+        for move in [(2, 3), (4, 4), (0, 2)]:
+            board.apply_move(move)
+        restored = pickle.loads(pickle.dumps(compiled[-1]))
+        self.assertEqual(compiled[-1].name, restored.name)
+        self.assertEqual(compiled[-1](board, "p1"), restored(board, "p1"))
+
+        with self.assertRaises(ValueError):
+            heuristics.compile_heuristic({"own_moves": 1., "knights": 2.})
+
+
+class IncrementalFeaturesTest(unittest.TestCase):
+
+    def test_push_pop_copy(self):
+        """ Test that the maintained move counts, second-order mobility and
+        reachable regions match their definitions after moves, undos and
+        copies """
+        geometry = isolation.geometry.get_geometry(7, 7)
+
+        def region(board, player):
+            location = board.get_player_location(player)
+            if location is None:
+                return board.get_blank_mask()
+            return geometry.reachable(location[0] * 7 + location[1], board.get_blank_mask())
+
+        def degrees(board):
+            blanks = set(board.get_blank_spaces())
+            return [len(blanks & set(moves)) for moves in geometry.neighbors]
+
+        rng = random.Random(4)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for _ in range(10):
+                board = board_class("p1", "p2", 7, 7)
+                pushed = 0
+                while True:
+                    self.assertEqual(degrees(board), board.get_degrees())
+                    for player in ("p1", "p2"):
+                        self.assertEqual(region(board, player), board.get_reachable_mask(player))
+                        self.assertEqual(sum(degrees(board)[r * 7 + c] for r, c in board.get_legal_moves(player)),
+                                         board.second_order_mobility(player))
+                    legal_moves = board.get_legal_moves()
+                    if pushed and (not legal_moves or rng.random() < .3):
+                        board.pop()
+                        pushed -= 1
+                    elif not legal_moves:
+                        break
+                    elif rng.random() < .8:
+                        board.push(rng.choice(legal_moves))
+                        pushed += 1
+                    else:
+                        board = board.forecast_move(rng.choice(legal_moves))
+                        pushed = 0
+
+    def test_prepared_search(self):
+        """ Test that searching from a board prepared for a heuristic gives
+        the same results as searching without the maintained features """
+        import heuristics
+
+        score_fn = heuristics.compile_heuristic({"own_moves": 1., "opp_moves2": -.5, "own_area": .2})
+        rng = random.Random(8)
+        board = isolation.Board("p1", "p2", 7, 7)
+        for _ in range(10):
+            board.apply_move(rng.choice(board.get_legal_moves()))
+        results = []
+        for prepare in (False, True):
+            for in_place in (False, True):
+                game = board.copy()
+                if prepare:
+                    score_fn.prepare(game)
+                player = game_agent.CustomPlayer(4, score_fn, False, "alphabeta", in_place=in_place)
+                player.time_left = lambda: float("inf")
+                results.append((player.search(game, 4, method="alphabeta"), player.nodes))
+        self.assertEqual([results[0]] * 4, results)
+
+
+class MakeUnmakeTest(unittest.TestCase):
+
+    def test_push_pop(self):
+        """ Test that pop() restores the state from before push() """
+        rng = random.Random(1)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class("p1", "p2", 7, 7)
+            states = []
+            while board.get_legal_moves():
+                states.append((board.to_string(), board.get_legal_moves("p1"),
+                               board.get_legal_moves("p2"), board.move_count))
+                board.push(rng.choice(board.get_legal_moves()))
+            while states:
+                board.pop()
+                self.assertEqual(states.pop(), (board.to_string(),
+                                                board.get_legal_moves("p1"),
+                                                board.get_legal_moves("p2"),
+                                                board.move_count))
+            self.assertRaises(IndexError, board.pop)
+
+    def test_in_place_search(self):
+        """ Test that in-place search matches search on board copies """
+        from sample_players import improved_score
+        for method in ("minimax", "alphabeta"):
+            results = []
+            for in_place in (False, True):
+                agentUT = game_agent.CustomPlayer(3, improved_score, False,
+                                                  method, in_place=in_place)
+                agentUT.time_left = lambda: 1e3
+                board = isolation.Board(agentUT, "null_agent")
+                board.apply_move((2, 3))
+                board.apply_move((0, 0))
+                before = board.to_string()
+                if method == "minimax":
+                    results.append(agentUT.minimax(board, 3))
+                else:
+                    results.append(agentUT.alphabeta(board, 3))
+                self.assertEqual(before, board.to_string())
+            self.assertEqual(results[0], results[1])
+
+
+class ZobristHashTest(unittest.TestCase):
+
+    def test_hash(self):
+        """ Test that the position hash depends only on the game state """
+        hashes = []
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class("p1", "p2", 7, 7)
+            empty_hash = board.hash
+            for move in [(3, 3), (0, 0), (1, 2), (2, 2), (0, 4), (4, 3)]:
+                board.push(move)
+            hashes.append(board.hash)
+            self.assertEqual(board.hash, board.copy().hash)
+            self.assertNotEqual(board.hash, board.forecast_move((2, 5)).hash)
+
+            # the same position reached through a different move order
+            other = board_class("p1", "p2", 7, 7)
+            for move in [(1, 2), (2, 2), (3, 3), (0, 0), (0, 4), (4, 3)]:
+                other.apply_move(move)
+            self.assertEqual(board.to_string(), other.to_string())
+            hashes.append(other.hash)
+
+            # the same cells with the players swapped
+            other = board_class("p1", "p2", 7, 7)
+            for move in [(0, 0), (3, 3), (2, 2), (1, 2), (4, 3), (0, 4)]:
+                other.apply_move(move)
+            self.assertNotEqual(board.hash, other.hash)
+
+            for _ in range(6):
+                board.pop()
+            self.assertEqual(empty_hash, board.hash)
+
+        self.assertEqual(len(set(hashes)), 1)
+
+
+class SymmetryTest(unittest.TestCase):
+
+    def random_moves(self, rng, width, height, plies):
+        board = isolation.Board("p1", "p2", width=width, height=height)
+        moves = []
+        for _ in range(plies):
+            if not board.get_legal_moves():
+                break
+            moves.append(rng.choice(board.get_legal_moves()))
+            board.apply_move(moves[-1])
+        return board, moves
+
+    def test_symmetric_positions_share_canonical_hash(self):
+        """ Test that every orientation of a position has the same canonical
+        hash and that moves map back from the canonical orientation """
+        rng = random.Random(14)
+        for width, height in [(7, 7), (5, 6)]:
+            for board_class in (isolation.Board, isolation.BitBoard):
+                board, moves = self.random_moves(rng, width, height, 9)
+                key, symmetry = board.canonical_hash()
+                num_symmetries = len(board.symmetric_hashes())
+                self.assertEqual(8 if width == height else 4, num_symmetries)
+                for index in range(num_symmetries):
+                    other = board_class("p1", "p2", width=width, height=height)
+                    for move in moves:
+                        other.apply_move(board.transform_move(move, index))
+                    self.assertEqual(board.symmetric_hashes()[index], other.hash)
+                    self.assertEqual(key, other.canonical_hash()[0])
+                    move = rng.choice(board.get_legal_moves())
+                    self.assertEqual(move, board.untransform_move(board.transform_move(move, index), index))
+
+    def test_hashes_are_maintained_by_moves(self):
+        """ Test that the hashes of every orientation are updated by
+        apply_move(), push() and pop() """
+        rng = random.Random(4)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class("p1", "p2")
+            board.symmetric_hashes()
+            while board.get_legal_moves():
+                board.push(rng.choice(board.get_legal_moves()))
+                fresh = board.copy()
+                fresh.__symmetric_hashes__ = None
+                self.assertEqual(fresh.symmetric_hashes(), board.symmetric_hashes())
+            while board.__undo_stack__ is not None:
+                board.pop()
+            self.assertEqual((0,) * 8, board.symmetric_hashes())
+
+    def test_symmetric_transposition_table(self):
+        """ Test that search with a symmetric transposition table returns the
+        same scores as search without one """
+        from sample_players import improved_score
+        from transposition import TranspositionTable
+        plain = game_agent.CustomPlayer(score_fn=improved_score)
+        plain.time_left = lambda: 1e3
+        agentUT = game_agent.CustomPlayer(score_fn=improved_score,
+                                          tt=TranspositionTable(symmetric=True))
+        agentUT.time_left = lambda: 1e3
+        board = isolation.Board(agentUT, "p2", width=5, height=5)
+        for move in [(2, 2), (1, 1)]:
+            board.apply_move(move)
+        for depth in range(1, 6):
+            self.assertEqual(plain.alphabeta(board, depth)[0], agentUT.alphabeta(board, depth)[0])
+        self.assertGreater(agentUT.tt.hits, 0)
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_alphabeta_scores(self):
+        """ Test that alpha-beta with a transposition table finds the same
+        scores as plain alpha-beta while deepening """
+        from sample_players import improved_score
+        from transposition import TranspositionTable
+        table = TranspositionTable(entries=512)
+        plain = game_agent.CustomPlayer(1, improved_score, False, "alphabeta")
+        cached = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                         tt=table)
+        plain.time_left = cached.time_left = lambda: 1e3
+        board = isolation.Board(plain, cached)
+        for move in [(3, 3), (0, 0), (1, 5), (2, 2), (3, 4)]:
+            board.apply_move(move)
+        for depth in range(1, 6):
+            self.assertEqual(plain.alphabeta(board, depth)[0],
+                             cached.alphabeta(board, depth)[0])
+        self.assertGreater(table.hits, 0)
+        self.assertLessEqual(table.stats()["entries"], 512)
+
+    def test_rejects_colliding_entry(self):
+        """ Test that an entry whose move is illegal in the searched position
+        (a key collision) is neither returned at the root nor reused """
+        from sample_players import improved_score
+        from transposition import EXACT, LOWER, TranspositionTable
+        plain = game_agent.CustomPlayer(3, improved_score, False, "alphabeta")
+        plain.time_left = lambda: 1e3
+        board = isolation.Board(plain, "null_agent")
+        for move in [(3, 3), (0, 0), (1, 5), (2, 2)]:
+            board.apply_move(move)
+        expected = plain.alphabeta(board, 3)
+        for bound in (EXACT, LOWER):
+            table = TranspositionTable()
+            table.store(board.hash, 10, 99., bound, (6, 6))
+            cached = game_agent.CustomPlayer(3, improved_score, False, "alphabeta", tt=table)
+            cached.time_left = lambda: 1e3
+            self.assertEqual(expected, cached.alphabeta(board, 3))
+
+    def test_bound_in_original_window(self):
+        """ Test that a result searched in a window narrowed by a stored
+        bound is stored with its bound in the original window """
+        from sample_players import improved_score
+        from transposition import EXACT, LOWER, TranspositionTable
+        plain = game_agent.CustomPlayer(3, improved_score, False, "alphabeta")
+        plain.time_left = lambda: 1e3
+        board = isolation.Board(plain, "null_agent")
+        for move in [(3, 3), (0, 0), (1, 5), (2, 2)]:
+            board.apply_move(move)
+        score, move = plain.alphabeta(board, 3)
+
+        # the stored lower bound is the exact score: the search fails low
+        # in the narrowed window, but is exact in the full one
+        table = TranspositionTable()
+        table.store(board.hash, 3, score, LOWER, move)
+        cached = game_agent.CustomPlayer(3, improved_score, False, "alphabeta", tt=table)
+        cached.time_left = lambda: 1e3
+        self.assertEqual(score, cached.alphabeta(board, 3)[0])
+        self.assertEqual((3, score, EXACT), table.probe(board.hash)[1:4])
+
+
+class MoveOrderingTest(unittest.TestCase):
+
+    def test_alphabeta_scores(self):
+        """ Test that move ordering does not change alpha-beta scores """
+        from sample_players import improved_score
+        from move_ordering import MoveOrderer
+        from transposition import TranspositionTable
+        ordering = MoveOrderer(mobility=True)
+        plain = game_agent.CustomPlayer(1, improved_score, False, "alphabeta")
+        ordered = game_agent.CustomPlayer(1, improved_score, False, "alphabeta",
+                                          tt=TranspositionTable(),
+                                          move_ordering=ordering)
+        plain.time_left = ordered.time_left = lambda: 1e3
+        board = isolation.Board(plain, ordered)
+        for move in [(3, 3), (0, 0), (1, 5), (2, 2), (3, 4)]:
+            board.apply_move(move)
+        for depth in range(1, 6):
+            self.assertEqual(plain.alphabeta(board, depth)[0],
+                             ordered.alphabeta(board, depth)[0])
+        self.assertGreater(ordering.stats()["first_move_cutoff_rate"], 0.5)
+
+
+class PrincipalVariationTest(unittest.TestCase):
+
+    def test_pvs_scores(self):
+        """ Test that PVS finds the same scores as alpha-beta """
+        from sample_players import improved_score
+        from move_ordering import MoveOrderer
+        from transposition import TranspositionTable
+        plain = game_agent.CustomPlayer(1, improved_score, False, "alphabeta")
+        scout = game_agent.CustomPlayer(1, improved_score, False, "pvs",
+                                        tt=TranspositionTable(),
+                                        move_ordering=MoveOrderer())
+        plain.time_left = scout.time_left = lambda: 1e3
+        board = isolation.Board(plain, scout)
+        for move in [(3, 3), (0, 0), (1, 5), (2, 2), (3, 4)]:
+            board.apply_move(move)
+        for depth in range(1, 6):
+            self.assertEqual(plain.alphabeta(board, depth)[0],
+                             scout.pvs(board, depth)[0])
+            self.assertEqual(plain.alphabeta(board, depth, maximizing_player=False)[0],
+                             scout.pvs(board, depth, maximizing_player=False)[0])
+
+    def test_aspiration_windows(self):
+        """ Test that aspiration windows do not change the search scores """
+        from sample_players import improved_score
+        results = []
+        for aspiration in (None, 0.5):
+            agentUT = game_agent.CustomPlayer(5, improved_score, False, "pvs",
+                                              aspiration=aspiration)
+            agentUT.time_left = lambda: 1e3
+            board = isolation.Board(agentUT, "null_agent")
+            for move in [(3, 3), (0, 0), (1, 5), (2, 2)]:
+                board.apply_move(move)
+            scores = [agentUT.aspiration_search(agentUT.pvs, board, depth, 0.)
+                      for depth in range(1, 5)]
+            results.append([score for score, _ in scores])
+            self.assertEqual(len(agentUT.nodes_per_depth), 4)
+        self.assertEqual(results[0], results[1])
+
+
+class NegamaxTest(unittest.TestCase):
+
+    def test_trapped_opponent(self):
+        """ Test that every search method scores a trapped opponent as a win
+        at any depth """
+        from sample_players import improved_score
+        for method in ("minimax", "alphabeta", "pvs"):
+            agentUT = game_agent.CustomPlayer(1, improved_score, False, method)
+            agentUT.time_left = lambda: 1e3
+            board = isolation.Board(agentUT, "null_agent")
+            for move in [(2, 1), (6, 6), (3, 3), (0, 0)]:
+                board.apply_move(move)
+            for depth in range(1, 4):
+                score, move = agentUT.search(board, depth, method=method)
+                self.assertEqual((score, move), (float("inf"), (1, 2)))
+
+
+class SearchStatsTest(unittest.TestCase):
+
+    def test_counts_match_counter_board(self):
+        """ Test that the built-in node and leaf counts agree with the nodes
+        counted by the board """
+        from sample_players import improved_score
+        agentUT = game_agent.CustomPlayer(3, improved_score, False, "minimax")
+        board = CounterBoard(agentUT, "null_agent", 7, 7)
+        board.apply_move((2, 3))
+        board.apply_move((0, 5))
+        move = agentUT.get_move(board, board.get_legal_moves(), lambda: 1e4)
+        stats = agentUT.stats
+        self.assertEqual(move, stats.move)
+        self.assertEqual(("search", 3), (stats.source, stats.depth))
+        # the root is searched without being forecast
+        self.assertEqual(board.counts[0] + 1, stats.nodes)
+        leaves = sum(len(board.forecast_move(a).forecast_move(b).get_legal_moves())
+                     for a in board.get_legal_moves()
+                     for b in board.forecast_move(a).get_legal_moves())
+        self.assertEqual(leaves, stats.leaf_evals)
+        self.assertEqual(0, stats.cutoffs)
+
+    def test_profiled_search_and_hooks(self):
+        """ Test that profiling times every section without changing the
+        search, and that hooks receive the stats of every move """
+        from sample_players import improved_score
+        from search_stats import SECTIONS, StatsTotals
+        from transposition import TranspositionTable
+        totals = StatsTotals()
+        plain = game_agent.CustomPlayer(4, improved_score, False, "alphabeta",
+                                        tt=TranspositionTable(), in_place=True)
+        profiled = game_agent.CustomPlayer(4, improved_score, False, "alphabeta",
+                                           tt=TranspositionTable(), in_place=True,
+                                           profile=True, stats_hooks=[totals])
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class(plain, profiled)
+            for move in [(3, 3), (0, 0), (1, 5)]:
+                board.apply_move(move)
+            for agentUT in (plain, profiled):
+                agentUT.get_move(board, board.get_legal_moves(), lambda: 1e4)
+            self.assertEqual(plain.stats.move, profiled.stats.move)
+            self.assertEqual(plain.stats.nodes_per_depth, profiled.stats.nodes_per_depth)
+            self.assertEqual(plain.stats.nodes, profiled.stats.nodes)
+            self.assertIsNone(plain.stats.timings)
+            for section in SECTIONS:
+                self.assertGreater(profiled.stats.timings[section], 0.)
+            self.assertGreater(profiled.stats.cutoffs, 0)
+            self.assertGreater(profiled.stats.tt_probes, profiled.stats.tt_hits)
+            self.assertGreater(profiled.stats.time_left, 0.)
+        self.assertEqual(2, totals.moves)
+        self.assertEqual(4, totals.max_depth)
+        self.assertEqual(plain.stats.nodes + totals.nodes - profiled.stats.nodes, totals.nodes)
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_configs_agree(self):
+        """ Test that every search method and board class finds the same
+        moves and scores on the benchmark positions at the same depth """
+        import benchmark
+        configs = [name for name in benchmark.CONFIGS if not benchmark.CONFIGS[name][3]]
+        results = benchmark.run(configs, depth=3)
+        self.assertEqual(1, results["positions_version"])
+        checksums = set(result["checksum"] for result in results["configs"].values())
+        self.assertEqual(1, len(checksums))
+        nodes = results["configs"]["alphabeta-board"]["nodes"]
+        self.assertEqual(nodes, results["configs"]["alphabeta-bitboard"]["nodes"])
+        self.assertLess(nodes, results["configs"]["minimax-board"]["nodes"])
+
+        # the output is JSON and can be compared with itself
+        results = json.loads(json.dumps(results))
+        for change in benchmark.compare(results, results).values():
+            self.assertEqual(0., change["change"])
+            self.assertTrue(change["same_nodes"] and change["same_checksum"])
+
+
+class RootParallelTest(unittest.TestCase):
+
+    def test_matches_serial_search(self):
+        """ Test that root-parallel search picks a move with the same score
+        as serial alpha-beta search """
+        from sample_players import improved_score
+        from parallel_search import RootParallelPlayer
+        serial = game_agent.CustomPlayer(4, improved_score, False, "alphabeta")
+        serial.time_left = lambda: 1e3
+        parallel = RootParallelPlayer(4, improved_score, False, "alphabeta",
+                                      processes=2)
+        try:
+            board = isolation.Board(parallel, serial)
+            for move in [(3, 3), (0, 0), (1, 2), (2, 2)]:
+                board.apply_move(move)
+            move = parallel.get_move(board, board.get_legal_moves(), lambda: 1e4)
+            best_score, _ = serial.alphabeta(board, 4)
+            score, _ = serial.alphabeta(board.forecast_move(move), 3, maximizing_player=False)
+            self.assertEqual(best_score, score)
+        finally:
+            parallel.close()
+
+    def test_unlimited_time(self):
+        """ Test that root-parallel search waits for the workers when the
+        time is unlimited """
+        from sample_players import improved_score
+        from parallel_search import RootParallelPlayer
+        parallel = RootParallelPlayer(3, improved_score, False, "alphabeta",
+                                      processes=2)
+        try:
+            board = isolation.Board(parallel, "opponent")
+            for move in [(3, 3), (0, 0), (1, 2), (2, 2)]:
+                board.apply_move(move)
+            move = parallel.get_move(board, board.get_legal_moves(), lambda: float("inf"))
+            self.assertIn(move, board.get_legal_moves())
+            self.assertEqual(3, parallel.stats.depth)
+        finally:
+            parallel.close()
+
+    def test_lazy_smp_search(self):
+        """ Test that Lazy SMP search at a fixed depth picks a move with the
+        same score as serial alpha-beta search and reports every worker """
+        from sample_players import improved_score
+        from parallel_search import LazySMPPlayer
+        serial = game_agent.CustomPlayer(4, improved_score, False, "alphabeta")
+        serial.time_left = lambda: 1e3
+        parallel = LazySMPPlayer(4, improved_score, False, "alphabeta", processes=2)
+        try:
+            board = isolation.Board(parallel, serial)
+            for move in [(3, 3), (0, 0), (1, 2), (2, 2)]:
+                board.apply_move(move)
+            move = parallel.get_move(board, board.get_legal_moves(), lambda: 1e4)
+            best_score, _ = serial.alphabeta(board, 4)
+            score, _ = serial.alphabeta(board.forecast_move(move), 3, maximizing_player=False)
+            self.assertEqual(best_score, score)
+            self.assertEqual([0, 1], [stats["worker"] for stats in parallel.worker_stats])
+        finally:
+            parallel.close()
+
+    def test_lazy_smp_table_lifetime(self):
+        """ Test that Lazy SMP players create their shared table on first use,
+        that copies create their own, and that the table is released when
+        the player is closed or collected """
+        import gc
+        from multiprocessing import shared_memory
+        from sample_players import improved_score
+        from parallel_search import LazySMPPlayer
+        parallel = LazySMPPlayer(2, improved_score, False, "alphabeta", processes=1)
+        self.assertIsNone(parallel.tt)
+        board = isolation.Board(parallel, "opponent")
+        board.apply_move((3, 3))
+        board.apply_move((0, 0))
+        parallel.get_move(board, board.get_legal_moves(), lambda: 1e4)
+        copied = pickle.loads(pickle.dumps(parallel))
+        self.assertIsNone(copied.tt)
+        names = [parallel.tt.memory.name]
+        parallel.close()
+        self.assertIsNone(parallel.tt)
+        copied.get_move(board, board.get_legal_moves(), lambda: 1e4)
+        names.append(copied.tt.memory.name)
+        self.assertNotEqual(names[0], names[1])
+        del copied
+        gc.collect()
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+    def test_uses_endgame_solver(self):
+        """ Test that both parallel players play the solver's move without
+        searching once the players are separated """
+        from endgame import EndgameSolver
+        from parallel_search import LazySMPPlayer, RootParallelPlayer
+        for player_class in (RootParallelPlayer, LazySMPPlayer):
+            parallel = player_class(method="alphabeta", endgame=EndgameSolver(), processes=2)
+            try:
+                board = isolation.Board("p1", parallel, width=5, height=5)
+                for move in [(4, 2), (3, 4), (3, 0), (2, 2), (1, 1), (4, 3), (3, 2), (3, 1),
+                             (2, 0), (2, 3), (4, 1), (0, 2), (3, 3), (2, 1), (1, 4)]:
+                    board.apply_move(move)
+                _, best_move = EndgameSolver().solve(board, parallel)
+                self.assertEqual(best_move, parallel.get_move(board, board.get_legal_moves(), lambda: 1e3))
+                self.assertEqual(("endgame", 0), (parallel.stats.source, parallel.nodes))
+                self.assertIsNone(parallel.pool)
+            finally:
+                parallel.close()
+
+    def test_helpers_keep_shared_table(self):
+        """ Test that a helper starting a new game keeps the entries that the
+        main process stored in the shared table, but forgets its private
+        tables, under the same condition as the player, and restores each
+        searched position once """
+        import parallel_search
+        from transposition import EXACT, SharedTranspositionTable, TranspositionTable
+        board = isolation.Board("p1", "p2")
+        board.apply_move((3, 3))
+        state = parallel_search.snapshot(board)
+        for last_ply in (10, 1):
+            for tt, kept in [(SharedTranspositionTable(64), True), (TranspositionTable(), False)]:
+                try:
+                    tt.store(977, 2, 1.5, EXACT, None)
+                    engine = parallel_search._WorkerEngine(None, "alphabeta", False, tt, None)
+                    engine.last_ply = last_ply
+                    parallel_search._init_worker(engine, None)
+                    game = parallel_search._start_search(state)
+                    self.assertEqual(kept, tt.probe(977) is not None)
+                    self.assertEqual(1, engine.last_ply)
+                    self.assertEqual(board.hash, game.hash)
+
+                    # the other tasks of the position reuse its board
+                    tt.store(977, 2, 1.5, EXACT, None)
+                    self.assertIs(game, parallel_search._start_search(state))
+                    self.assertIsNotNone(tt.probe(977))
+                finally:
+                    parallel_search._init_worker(None, None)
+                    if kept:
+                        tt.close()
+
+    def test_workers_reread_alpha(self):
+        """ Test that a root move searched by a worker is narrowed by the
+        alpha that other workers raise during its search, and that a score
+        not above that alpha is reported as an upper bound """
+        import multiprocessing
+        import parallel_search
+        from sample_players import improved_score
+        board = isolation.Board("p1", "p2")
+        for move in [(3, 3), (0, 0), (1, 2), (2, 2)]:
+            board.apply_move(move)
+        serial = game_agent.CustomPlayer(5, improved_score, False, "alphabeta")
+        serial.time_left = lambda: float("inf")
+        best_score, best_move = serial.alphabeta(board, 5)
+        move = [move for move in board.get_legal_moves() if move != best_move][0]
+
+        results = []
+        for raised in (False, True):
+            shared = multiprocessing.Array('d', [1., float("-inf")])
+            evaluations = []
+
+            def score_fn(game, player):
+                # another worker finds the best move after the first leaf
+                evaluations.append(player)
+                if raised and len(evaluations) == 1:
+                    shared[1] = best_score
+                return improved_score(game, player)
+
+            engine = parallel_search._WorkerEngine(score_fn, "alphabeta", False, None, None)
+            try:
+                parallel_search._init_worker(engine, shared)
+                results.append(parallel_search._search_root_move(
+                    parallel_search.snapshot(board), 0, move, 5, float("inf"), 1))
+            finally:
+                parallel_search._init_worker(None, None)
+        _, score, exact, nodes = results[1]
+        self.assertLess(nodes, results[0][3])
+        self.assertLessEqual(score, best_score)
+        self.assertFalse(exact)
+
+    def test_profiled_search(self):
+        """ Test that both parallel players can profile their moves """
+        from sample_players import improved_score
+        from parallel_search import LazySMPPlayer, RootParallelPlayer
+        for player_class in (RootParallelPlayer, LazySMPPlayer):
+            parallel = player_class(3, improved_score, False, "alphabeta",
+                                    processes=2, profile=True)
+            try:
+                board = isolation.Board(parallel, "opponent")
+                for move in [(3, 3), (0, 0), (1, 2), (2, 2)]:
+                    board.apply_move(move)
+                move = parallel.get_move(board, board.get_legal_moves(), lambda: 1e4)
+                self.assertIn(move, board.get_legal_moves())
+                self.assertEqual(3, parallel.stats.depth)
+                self.assertIsNotNone(parallel.stats.timings)
+            finally:
+                parallel.close()
+
+
+class SharedTranspositionTableTest(unittest.TestCase):
+
+    def setUp(self):
+        from transposition import SharedTranspositionTable
+        self.tt = SharedTranspositionTable(entries=64)
+
+    def tearDown(self):
+        self.tt.close()
+
+    def test_store_and_probe(self):
+        """ Test that entries round-trip through the packed slots and are
+        visible to a second table attached to the same memory """
+        from transposition import LOWER, SharedTranspositionTable
+        key = 2**64 - 12345
+        self.tt.store(key, 3, float("-inf"), LOWER, (4, 5))
+        other = SharedTranspositionTable(name=self.tt.memory.name)
+        try:
+            self.assertEqual((key, 3, float("-inf"), LOWER, (4, 5), 0), other.probe(key))
+            self.assertIsNone(other.probe(key + 1))
+        finally:
+            other.close()
+
+    def test_torn_entry_is_rejected(self):
+        """ Test that a slot whose data words do not match its check word is
+        treated as a miss """
+        from transposition import EXACT
+        key = 977
+        self.tt.store(key, 2, 1.5, EXACT, None)
+        self.assertEqual(1.5, self.tt.probe(key)[2])
+        offset = self.tt.HEADER.size + (key % self.tt.num_buckets) * 2 * self.tt.SLOT.size
+        # overwrite the score without updating the check word
+        self.tt.memory.buf[offset + 8:offset + 16] = struct.pack("<d", 2.5)
+        self.assertIsNone(self.tt.probe(key))
+
+
+class EndgameTest(unittest.TestCase):
+
+    @staticmethod
+    def wins(game):
+        """ Return True if the active player wins with perfect play """
+        return any(not EndgameTest.wins(game.forecast_move(move))
+                   for move in game.get_legal_moves())
+
+    def test_solver_matches_game_tree(self):
+        """ Test that the endgame solver agrees with full game tree search on
+        random partitioned positions of both board classes """
+        from endgame import EndgameSolver
+        rng = random.Random(11)
+        for trial in range(60):
+            board_class = (isolation.Board, isolation.BitBoard)[trial % 2]
+            board = board_class("p1", "p2", width=5, height=5)
+            while not board.is_partitioned() and board.get_legal_moves():
+                board.apply_move(rng.choice(board.get_legal_moves()))
+            if not board.is_partitioned():
+                continue
+            score, move = EndgameSolver().solve(board, board.active_player)
+            self.assertEqual(self.wins(board), score == float("inf"))
+            if score == float("inf"):
+                self.assertFalse(self.wins(board.forecast_move(move)))
+
+    def test_partition_detection(self):
+        """ Test that players in separate regions are detected """
+        for board_class in (isolation.Board, isolation.BitBoard):
+            board = board_class("p1", "p2", width=5, height=5)
+            for move in [(2, 0), (2, 2), (1, 2), (1, 4), (0, 0), (3, 3)]:
+                board.apply_move(move)
+            self.assertFalse(board.is_partitioned())
+            # player 2 is left with a single cell that player 1 cannot reach
+            board.apply_move((2, 1))
+            self.assertEqual(1 << (4 * 5 + 1), board.get_reachable_mask("p2"))
+            self.assertEqual(0, board.get_reachable_mask("p1") & board.get_reachable_mask("p2"))
+            self.assertTrue(board.is_partitioned())
+
+    def test_agent_uses_solver(self):
+        """ Test that the agent plays the solver's move without searching once
+        the players are separated """
+        from endgame import EndgameSolver
+        agentUT = game_agent.CustomPlayer(method="alphabeta", endgame=EndgameSolver())
+        board = isolation.Board("p1", agentUT, width=5, height=5)
+        for move in [(2, 0), (2, 2), (1, 2), (1, 4), (0, 0), (3, 3), (2, 1)]:
+            board.apply_move(move)
+        self.assertEqual((4, 1), agentUT.get_move(board, board.get_legal_moves(), lambda: 1e3))
+        self.assertEqual(0, agentUT.nodes)
+        self.assertEqual(1, agentUT.endgame.solved)
+
+
+class TablebaseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import os
+        import tempfile
+        import tablebase
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, tablebase.default_path(5, 5))
+        tablebase.generate(5, 5, path, games=5)
+        cls.tablebase = tablebase.Tablebase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tablebase.close()
+        cls.directory.cleanup()
+
+    @staticmethod
+    def solve(game):
+        """ Return the win flag and plies to the end for the active player """
+        results = [TablebaseTest.solve(game.forecast_move(move))
+                   for move in game.get_legal_moves()]
+        losses = [plies for won, plies in results if not won]
+        if losses:
+            return True, 1 + min(losses)
+        return False, 1 + max([plies for _, plies in results] or [-1])
+
+    def test_probe_matches_game_tree(self):
+        """ Test that tablebase results match full game tree search """
+        rng = random.Random(12)
+        hits = 0
+        for _ in range(40):
+            board = isolation.Board("p1", "p2", width=5, height=5)
+            while board.get_legal_moves():
+                result = self.tablebase.probe(board)
+                if result is not None:
+                    hits += 1
+                    self.assertEqual(self.solve(board), result)
+                board.apply_move(rng.choice(board.get_legal_moves()))
+        self.assertGreater(hits, 0)
+
+    def test_probe_hashes_small_regions_only(self):
+        """ Test that probes reject regions larger than any record before
+        computing their key """
+        import tablebase
+        hashed = []
+        region_key = tablebase.region_key
+
+        def counting_region_key(game, region=None):
+            hashed.append(bin(region).count("1"))
+            return region_key(game, region)
+
+        rng = random.Random(12)
+        rejected = 0
+        tablebase.region_key = counting_region_key
+        try:
+            for _ in range(20):
+                board = isolation.Board("p1", "p2", width=5, height=5)
+                while board.get_legal_moves():
+                    region = tablebase.reachable_region(board)
+                    if region is not None and bin(region).count("1") > self.tablebase.max_cells \
+                            and 25 - board.move_count <= self.tablebase.max_blanks:
+                        rejected += 1
+                        self.assertIsNone(self.tablebase.probe(board))
+                    else:
+                        self.tablebase.probe(board)
+                    board.apply_move(rng.choice(board.get_legal_moves()))
+        finally:
+            tablebase.region_key = region_key
+        self.assertGreater(rejected, 0)
+        self.assertGreater(len(hashed), 0)
+        self.assertLessEqual(max(hashed), self.tablebase.max_cells)
+
+    def test_search_uses_tablebase(self):
+        """ Test that search scores tablebase positions exactly instead of
+        with the heuristic """
+        agentUT = game_agent.CustomPlayer(timeout=0., tablebase=self.tablebase)
+        agentUT.time_left = lambda: 1e3
+        rng = random.Random(3)
+        result = None
+        while result is None:
+            board = isolation.Board(agentUT, "p2", width=5, height=5)
+            while board.get_legal_moves() and result is None:
+                board.apply_move(rng.choice(board.get_legal_moves()))
+                result = self.tablebase.probe(board)
+        agent_to_move = board.active_player is agentUT
+        score, _ = agentUT.search(board, 0, maximizing_player=agent_to_move)
+        self.assertEqual(float("inf") if result[0] == agent_to_move else float("-inf"), score)
+
+class OpeningBookTest(unittest.TestCase):
+
+    def test_book_moves_are_best_moves(self):
+        """ Test that book moves score as well as a search of the position in
+        every orientation of the board """
+        import os
+        import tempfile
+        import opening_book
+        from sample_players import improved_score
+        searcher = game_agent.CustomPlayer(3, improved_score, False, "alphabeta")
+        searcher.time_left = lambda: 1e3
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, opening_book.default_path(5, 5))
+            opening_book.build(5, 5, 3, searcher, path)
+            book = opening_book.OpeningBook(path)
+
+        agentUT = game_agent.CustomPlayer(3, improved_score, False, "alphabeta", book=book)
+        for moves in [[(1, 1), (2, 3)], [(3, 3), (2, 1)], [(1, 3), (3, 2)], [(0, 4)]]:
+            board = isolation.Board(agentUT, "p2", width=5, height=5)
+            for move in moves:
+                board.apply_move(move)
+            move = agentUT.get_move(board, board.get_legal_moves(), lambda: 1e3)
+            best_score, _ = searcher.alphabeta(board, 3)
+            score, _ = searcher.alphabeta(board.forecast_move(move), 2, maximizing_player=False)
+            self.assertEqual(best_score, score)
+        self.assertEqual(4, book.hits)
+
+    def test_book_move_starts_new_game(self):
+        """ Test that a book move at the start of a new game forgets the
+        transposition table of the previous game """
+        from transposition import EXACT, TranspositionTable
+
+        class FirstMoveBook(object):
+            def probe(self, game):
+                return game.get_legal_moves()[0]
+
+        agentUT = game_agent.CustomPlayer(method="alphabeta", tt=TranspositionTable(),
+                                          book=FirstMoveBook())
+        agentUT.last_ply = 20
+        agentUT.tt.store(977, 2, 1.5, EXACT, None)
+        board = isolation.Board(agentUT, "p2", width=5, height=5)
+        move = agentUT.get_move(board, board.get_legal_moves(), lambda: 1e3)
+        self.assertEqual(("book", move), (agentUT.stats.source, board.get_legal_moves()[0]))
+        self.assertEqual(0, agentUT.last_ply)
+        self.assertIsNone(agentUT.tt.probe(977))
+
+
+class TournamentTest(unittest.TestCase):
+
+    def setUp(self):
+        from sample_players import GreedyPlayer, improved_score
+        from tournament import Agent
+        self.agents = [Agent(GreedyPlayer(), "Greedy"),
+                       Agent(game_agent.CustomPlayer(2, improved_score, False, "alphabeta"), "AB")]
+
+    def test_parallel_matches_match_serial(self):
+        """ Test that matches played by a worker pool have the same seeds and
+        results as matches played serially """
+        import tournament
+        matches = tournament.schedule_round(self.agents, 2, seed=15)
+        self.assertEqual(matches, tournament.schedule_round(self.agents, 2, seed=15))
+        serial = [result[1:3] for result in tournament.play_matches(self.agents, matches)]
+        parallel = [result[1:3] for result in
+                    tournament.play_matches(self.agents, matches, processes=2, pin_cpus=True)]
+        self.assertEqual(serial, parallel)
+
+    def test_distributed_workers(self):
+        """ Test that workers connected to a coordinator over a local socket
+        play every match, including the match leased by a lost worker """
+        import multiprocessing
+        from multiprocessing.connection import Client
+        import tournament
+        matches = tournament.schedule_round(self.agents, 2, seed=18)
+        serial = [result[1:3] for result in tournament.play_matches(self.agents, matches)]
+        players = [agent.player for agent in self.agents]
+        coordinator = tournament.MatchCoordinator(players, matches, ("", 0),
+                                                  authkey=b"test", lease_timeout=.5)
+        try:
+            # an empty host only accepts local connections
+            self.assertEqual("127.0.0.1", coordinator.address[0])
+            # a worker that takes the first match and never returns it
+            lost = Client(coordinator.address, authkey=b"test")
+            lost.send(("ready",))
+            self.assertEqual(("job", 0), lost.recv()[:2])
+            with self.assertRaises(multiprocessing.AuthenticationError):
+                Client(coordinator.address, authkey=b"guess")
+            workers = [multiprocessing.Process(target=tournament.run_worker,
+                                               args=(coordinator.address, b"test", cpu, 0.))
+                       for cpu in range(2)]
+            for worker in workers:
+                worker.start()
+            results = list(coordinator.results())
+            for worker in workers:
+                worker.join(10)
+                self.assertEqual(0, worker.exitcode)
+            lost.close()
+        finally:
+            coordinator.close()
+        self.assertEqual(matches, [result[0] for result in results])
+        self.assertEqual(serial, [result[1:3] for result in results])
+        self.assertGreaterEqual(coordinator.requeued, 1)
+
+    def test_match_pool(self):
+        """ Test that a match pool plays several batches with the same workers,
+        in order or as they complete, and only submits the matches that the
+        caller asks for """
+        import tournament
+        matches = tournament.schedule_round(self.agents, 2, seed=19)
+        serial = [result[1:3] for result in tournament.play_matches(self.agents, matches)]
+        players = [agent.player for agent in self.agents]
+        submitted = []
+
+        def lazy_matches():
+            for match in matches:
+                submitted.append(match)
+                yield match
+
+        with tournament.MatchPool(processes=2) as pool:
+            workers = pool.pool
+            ordered = [result[1:3] for result in pool.imap(players, matches[:4])]
+            unordered = {result[0]: result[1:3] for result in pool.imap_unordered(players, matches[4:])}
+            results = pool.imap_unordered(players, lazy_matches(), window=2)
+            next(results)
+            results.close()
+            self.assertIs(workers, pool.pool)
+        self.assertEqual(serial[:4], ordered)
+        self.assertEqual(serial[4:], [unordered[match] for match in matches[4:]])
+        self.assertEqual(2, len(submitted))
+
+    def test_coordinator_key(self):
+        """ Test that coordinators without a key share a random one and that
+        workers refuse to run without a key """
+        import tournament
+        players = [agent.player for agent in self.agents]
+        coordinators = [tournament.MatchCoordinator(players, [], ("localhost", 0), authkey=None)
+                        for _ in range(2)]
+        for coordinator in coordinators:
+            coordinator.close()
+        self.assertEqual(coordinators[0].authkey, coordinators[1].authkey)
+        self.assertEqual(32, len(coordinators[0].authkey))
+        self.assertEqual(tournament.session_authkey(), coordinators[0].authkey)
+        with self.assertRaises(ValueError):
+            tournament.run_worker(coordinators[0].address, None)
+
+    def test_resume_from_log(self):
+        """ Test that a round resumed from a truncated results log only plays
+        the missing matches and reports the same totals """
+        import os
+        import tempfile
+        import tournament
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "results.jsonl")
+            win_ratio = tournament.play_round(self.agents, 2, seed=16, log=log)
+            with open(log) as f:
+                lines = f.readlines()
+            self.assertEqual(8, len(lines))
+            record = json.loads(lines[0])
+            self.assertEqual(["AB", "Greedy"], record["agents"])
+            # only the search agent reports search stats
+            self.assertGreater(record["search"][0]["nodes"], 0)
+            self.assertIsNone(record["search"][1])
+            # every move after the opening plus the final move of the loser
+            self.assertEqual(record["plies"] - 1, len(record["move_times"]))
+
+            # drop the last match and half of the one before
+            with open(log, "w") as f:
+                f.writelines(lines[:5])
+            self.assertEqual(win_ratio, tournament.play_round(self.agents, 2, log=log))
+            with open(log) as f:
+                resumed = f.readlines()
+            # only the missing games are played, the recorded game of the
+            # half-recorded match is not played again
+            self.assertEqual(8, len(resumed))
+            outcome = lambda line: [json.loads(line)[key] for key in ("match_id", "game", "opening", "winner")]
+            self.assertEqual(sorted(outcome(line) for line in lines[5:]),
+                             sorted(outcome(line) for line in resumed[5:]))
+
+    def test_sprt(self):
+        """ Test that the SPRT accepts H1 for a much stronger candidate and
+        reports an Elo estimate consistent with its score """
+        import tournament
+        from sample_players import RandomPlayer
+        llr, elo, _ = tournament.sprt_stats([10, 20, 10], 0., 20.)
+        self.assertAlmostEqual(0., elo)
+        self.assertLess(llr, 0.)
+
+        # the random player draws its moves from the global generator
+        random.seed(17)
+        result = tournament.sprt(self.agents[1], tournament.Agent(RandomPlayer(), "Random"),
+                                 elo0=0., elo1=100., batch=5, max_matches=200, seed=17)
+        self.assertEqual("H1", result["result"])
+        self.assertGreaterEqual(result["llr"], result["bounds"][1])
+        self.assertGreater(result["wins"], result["losses"])
+        self.assertGreater(result["elo"], 0.)
+        self.assertEqual(2 * result["matches"], result["wins"] + result["losses"])
+
+
+class TuningTest(unittest.TestCase):
+
+    def test_resume(self):
+        """ Test that a tuning run resumed from its checkpoint plays the same
+        iterations as an uninterrupted run """
+        import os
+        import tempfile
+        import tuning
+
+        weights = {"own_moves": 1., "opp_moves": -1., "opp_area": 0.}
+        args = {"search_depth": 1, "method": "alphabeta", "iterative": False}
+        complete = tuning.SPSATuner(weights, matches=2, seed=5, player_args=args)
+        complete.run(3)
+        self.assertEqual(3, len(complete.history))
+        self.assertNotEqual(weights, complete.weights)
+        for record in complete.history:
+            self.assertEqual(4, record["wins_plus"] + record["wins_minus"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "tuning.json")
+            tuning.SPSATuner(weights, matches=2, seed=5, player_args=args).run(2, checkpoint)
+            resumed = tuning.SPSATuner.load(checkpoint)
+            self.assertEqual(2, resumed.iteration)
+            resumed.run(3, checkpoint)
+            self.assertEqual(complete.history, resumed.history)
+
+            score_fn = tuning.load_score_fn(checkpoint)
+            self.assertEqual(complete.weights, score_fn.weights)
+            player = game_agent.CustomPlayer(score_fn=score_fn)
+            self.assertIs(score_fn, player.score)
+
+    def test_parallel_iterations(self):
+        """ Test that the iterations played by one pool of worker processes
+        match the iterations played serially """
+        import tuning
+        weights = {"own_moves": 1., "opp_moves": -1.}
+        args = {"search_depth": 1, "method": "alphabeta", "iterative": False}
+        serial = tuning.SPSATuner(weights, matches=2, seed=8, player_args=args)
+        serial.run(2)
+        parallel = tuning.SPSATuner(weights, matches=2, seed=8, player_args=args)
+        parallel.run(2, processes=2)
+        self.assertEqual(serial.history, parallel.history)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,206 @@
+"""This file contains the batch evaluation of the leaves of the search: the
+heuristic values of every child of a position, computed at once with NumPy
+instead of creating each child board and calling the heuristic on it.
+
+A move changes the board in only one cell, so the mobility terms of every
+child follow from the parent: a player moving to cell `c` has the parent's
+blank neighbors of `c` as moves, and the other player keeps its moves except
+`c`. Both counts are read from the move counts the parent maintains (see
+`Board.get_degrees()`) or counted from its blank cells with the knight
+neighbor masks of the board size, and each supported heuristic has a batch
+variant computing its value from arrays of the terms. The values are
+identical to those of the heuristic on each child (the search results do not
+change), but no child board is copied or moved.
+
+Batch evaluation is enabled with `CustomPlayer(..., batch_eval=True)`,
+which imports this module (and NumPy) on first use; the search then scores
+the leaves of every node at depth 1 with `BatchEvaluator`.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from isolation import Board
+
+# Terms of the heuristics for a batch of children, from the point of view
+# of the searching player: the arrays of own and opponent move counts, the
+# number of blank cells, the boolean array of the children where the game is
+# over (None if it is over in none of them) and its utility there (+inf or
+# -inf), the cell indices of both players (a list by child, a single index
+# or None before the first move) and the board size
+BatchTerms = namedtuple("BatchTerms", ["own_moves", "opp_moves", "blanks", "over", "over_value",
+                                       "own_cells", "opp_cells", "width", "height"])
+
+
+def child_terms(game, moves, player):
+    """Return the `BatchTerms` of the children of `game` reached by `moves`.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The parent position (an instance of any board class).
+
+    moves : list<(int, int)>
+        Legal moves of the active player of `game`.
+
+    player : object
+        The player the terms are computed for.
+    """
+    width = game.width
+    masks = game.__geometry__.neighbor_masks
+    cells = [r * width + c for r, c in moves]
+
+    # the mover's moves from its new cell, and the other player's moves
+    # without the cell taken by the mover, in a single array; the moves from
+    # a cell are read from the counts maintained by the board (see
+    # `Board.get_degrees()`) or counted from its blank cells
+    count = len(cells)
+    child_blanks = width * game.height - game.move_count - 1
+    location = game.get_player_location(game.inactive_player)
+    other_cell = None if location is Board.NOT_MOVED else location[0] * width + location[1]
+    degrees = getattr(game, "__degrees__", None)
+    if degrees is None:
+        blank_mask = game.get_blank_mask()
+        counts = [bin(masks[cell] & blank_mask).count("1") for cell in cells]
+        if other_cell is not None:
+            other_degree = bin(masks[other_cell] & blank_mask).count("1")
+    else:
+        counts = [degrees[cell] for cell in cells]
+        if other_cell is not None:
+            other_degree = degrees[other_cell]
+    if other_cell is None:
+        other_counts = [child_blanks] * count
+    else:
+        other_mask = masks[other_cell]
+        other_counts = [other_degree - (other_mask >> cell & 1) for cell in cells]
+    counts = np.array(counts + other_counts, dtype=float)
+    mover_moves, other_moves = counts[:count], counts[count:]
+
+    # the other player is to move in every child, and loses without moves
+    over = None if all(other_counts) else other_moves == 0
+    if player == game.active_player:
+        return BatchTerms(mover_moves, other_moves, child_blanks, over, float("inf"),
+                          cells, other_cell, width, game.height)
+    return BatchTerms(other_moves, mover_moves, child_blanks, over, float("-inf"),
+                      other_cell, cells, width, game.height)
+
+
+def _finish(terms, values):
+    """Return the utility of the children where the game is over and
+    `values` elsewhere."""
+    if terms.over is None:
+        return values
+    return np.where(terms.over, terms.over_value, values)
+
+
+def _distance(cells, other_rows, other_cols, width):
+    """Return the euclidean distance between the cells of indices `cells`
+    and other cells given by their rows and columns."""
+    rows, cols = np.divmod(np.asarray(cells), width)
+    dr = rows - other_rows
+    dc = cols - other_cols
+    return np.sqrt(dr * dr + dc * dc)
+
+
+def _players_distance(terms):
+    """Return the euclidean distance between the players."""
+    opp_rows, opp_cols = np.divmod(np.asarray(terms.opp_cells), terms.width)
+    return _distance(terms.own_cells, opp_rows, opp_cols, terms.width)
+
+
+def null_score(terms):
+    return _finish(terms, np.zeros(len(terms.own_moves)))
+
+
+def open_move_score(terms):
+    return _finish(terms, terms.own_moves)
+
+
+def improved_score(terms):
+    return _finish(terms, terms.own_moves - terms.opp_moves)
+
+
+def free_percent_score(terms):
+    return _finish(terms, terms.own_moves / terms.blanks - terms.opp_moves / terms.blanks)
+
+
+def double_opponent_score(terms):
+    return _finish(terms, terms.own_moves - 2 * terms.opp_moves)
+
+
+def double_own_score(terms):
+    return _finish(terms, terms.opp_moves - 2 * terms.own_moves)
+
+
+def ratio_score(terms):
+    ratio = np.divide(terms.own_moves, terms.opp_moves,
+                      out=np.full(len(terms.own_moves), float("inf")),
+                      where=terms.opp_moves != 0)
+    return _finish(terms, ratio)
+
+
+def chase_score(terms):
+    distance = _players_distance(terms)
+    return _finish(terms, (terms.own_moves - 2 * terms.opp_moves) * 2 - distance)
+
+
+def run_away_score(terms):
+    distance = _players_distance(terms)
+    return _finish(terms, (terms.own_moves - 2 * terms.opp_moves) * 2 + distance)
+
+
+def center_score(terms):
+    distance = _distance(terms.own_cells, terms.height // 2, terms.width // 2, terms.width)
+    return _finish(terms, (terms.own_moves - 2 * terms.opp_moves) * 2 - distance)
+
+
+# Batch variant of each heuristic, by module and function name (so that
+# reloaded modules keep their variants)
+BATCH_VARIANTS = {
+    ("sample_players", "null_score"): null_score,
+    ("sample_players", "open_move_score"): open_move_score,
+    ("sample_players", "improved_score"): improved_score,
+    ("game_agent", "custom_score"): ratio_score,
+    ("game_agent", "custom_score_simple"): improved_score,
+    ("game_agent", "custom_score_my_open_moves"): open_move_score,
+    ("game_agent", "custom_score_diff_in_free_percent_of_board"): free_percent_score,
+    ("game_agent", "custom_score_diff_in_mine_and_double_opponent"): double_opponent_score,
+    ("game_agent", "custom_score_diff_in_opp_and_double_mine"): double_own_score,
+    ("game_agent", "custom_score_divide_own_by_opponent"): ratio_score,
+    ("game_agent", "custom_score_diff_in_mine_and_double_opponent_chase_incase_of_tie"): chase_score,
+    ("game_agent", "custom_score_diff_in_mine_and_double_opponent_run_away_incase_of_tie"): run_away_score,
+    ("game_agent", "custom_score_diff_in_mine_and_double_opponent_closest_to_center_tie"): center_score,
+}
+
+
+class BatchEvaluator(object):
+    """Callable scoring every child of a position with the batch variant of
+    a heuristic.
+
+    Parameters
+    ----------
+    batch_fn : callable
+        A batch heuristic batch_fn(terms) returning the array of values of
+        the children described by a `BatchTerms`.
+    """
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+
+    @classmethod
+    def for_score(cls, score_fn):
+        """Return the evaluator of the batch variant of `score_fn`, or None
+        if the heuristic has no batch variant."""
+        key = (getattr(score_fn, "__module__", None), getattr(score_fn, "__name__", None))
+        batch_fn = BATCH_VARIANTS.get(key)
+        return None if batch_fn is None else cls(batch_fn)
+
+    def prepare(self, game):
+        """Enable the move counts maintained by `game` and the boards
+        searched from it, from which the terms of the children are read."""
+        game.get_degrees()
+
+    def __call__(self, game, moves, player):
+        """Return the list of heuristic values for `player` of the children
+        of `game` reached by each of `moves`."""
+        return self.batch_fn(child_terms(game, moves, player)).tolist()
@@ -0,0 +1,252 @@
+"""This file contains the search speed benchmark: a fixed set of positions
+searched to a fixed depth by each engine configuration, reporting the nodes
+searched, the time taken and the nodes per second.
+
+The positions are loaded from `benchmark_positions.json`, a versioned file
+of move sequences from the empty board to early, middle and late game
+positions on boards of several sizes. Changing the positions changes every
+result, so the file carries a version number that is copied to the output;
+only results of the same version are comparable.
+
+Every configuration also reports a checksum of the best move and score of
+each position. Searches to the same depth return the same moves and scores
+whatever the board implementation, and minimax, alpha-beta and PVS agree
+with each other, so a checksum that changes between commits (or differs
+from the other configurations at the same depth) points to a search bug
+rather than a speed change. (Transposition tables reuse results searched
+deeper than required, so they can in principle change the results.)
+
+Results are written as JSON:
+
+    python benchmark.py [--depth N] [--config NAME ...] [--output FILE]
+                        [--compare BASELINE]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import timeit
+
+from game_agent import CustomPlayer
+from isolation import BitBoard
+from isolation import Board
+from move_ordering import MoveOrderer
+from sample_players import improved_score
+from search import ALPHABETA, MINIMAX, PVS
+from transposition import TranspositionTable
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "benchmark_positions.json")
+
+# Version of the output format
+FORMAT_VERSION = 1
+
+# Engine configurations: search method, board class, default search depth,
+# whether the search uses a transposition table with move ordering and
+# whether the leaves are scored in batches (see `batch_eval`). Minimax
+# visits every node, so it is searched less deep.
+CONFIGS = {
+    "minimax-board": (MINIMAX, Board, 6, False, False),
+    "minimax-bitboard": (MINIMAX, BitBoard, 6, False, False),
+    "alphabeta-board": (ALPHABETA, Board, 9, False, False),
+    "alphabeta-bitboard": (ALPHABETA, BitBoard, 9, False, False),
+    "alphabeta-batch-board": (ALPHABETA, Board, 9, False, True),
+    "alphabeta-batch-bitboard": (ALPHABETA, BitBoard, 9, False, True),
+    "pvs-board": (PVS, Board, 9, False, False),
+    "pvs-bitboard": (PVS, BitBoard, 9, False, False),
+    "pvs-tt-board": (PVS, Board, 9, True, False),
+    "pvs-tt-bitboard": (PVS, BitBoard, 9, True, False),
+}
+
+
+def load_positions(path=POSITIONS_FILE):
+    """Load the benchmark positions.
+
+    Returns
+    -------
+    int
+        The version of the position set.
+
+    list<dict>
+        The positions, each with a name, the board width and height, the
+        game phase and the moves leading to it from the empty board.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    positions = [dict(position, moves=[tuple(move) for move in position["moves"]])
+                 for position in data["positions"]]
+    return data["version"], positions
+
+
+def build_position(position, board_class, player_1, player_2="opponent"):
+    """Return a board of `board_class` with the moves of a position applied."""
+    game = board_class(player_1, player_2, width=position["width"], height=position["height"])
+    for move in position["moves"]:
+        game.apply_move(move)
+    return game
+
+
+def checksum(results):
+    """Return a hexadecimal digest of the best move and score of each
+    position in a list of position results."""
+    digest = hashlib.sha1()
+    for result in results:
+        digest.update("{}:{}:{!r};".format(result["name"], result["move"], result["score"]).encode())
+    return digest.hexdigest()[:16]
+
+
+def run_config(name, positions, depth=None, repeat=1):
+    """Search every position with one engine configuration.
+
+    Parameters
+    ----------
+    name : str
+        The name of the configuration (a key of `CONFIGS`).
+
+    positions : list<dict>
+        The positions to search (see `load_positions()`).
+
+    depth : int (optional)
+        The search depth; defaults to the depth of the configuration.
+
+    repeat : int (optional)
+        The number of times each position is searched; the fastest time is
+        reported, which reduces the noise of a busy machine.
+
+    Returns
+    -------
+    dict
+        The method, board class and depth of the configuration, its total
+        nodes, seconds and nodes per second, the checksum of its results and
+        the results (nodes, seconds, best move and score) of each position.
+    """
+    method, board_class, default_depth, use_tt, batch_eval = CONFIGS[name]
+    depth = default_depth if depth is None else depth
+    results = []
+    for position in positions:
+        seconds = float("inf")
+        for _ in range(repeat):
+            player = CustomPlayer(depth, improved_score, False, method,
+                                  tt=TranspositionTable() if use_tt else None,
+                                  move_ordering=MoveOrderer() if use_tt else None,
+                                  batch_eval=batch_eval)
+            player.time_left = lambda: float("inf")
+            game = build_position(position, board_class, player)
+            start = timeit.default_timer()
+            # enable the incremental features as `CustomPlayer.get_move()`
+            for prepared in (player.score, player.batch_score):
+                if hasattr(prepared, "prepare"):
+                    prepared.prepare(game)
+            score, move = player.search(game, depth, method=method)
+            seconds = min(seconds, timeit.default_timer() - start)
+        results.append({"name": position["name"], "nodes": player.nodes,
+                        "leaf_evals": player.leaf_evals, "cutoffs": player.cutoffs,
+                        "seconds": seconds, "nps": player.nodes / seconds if seconds else 0.,
+                        "move": list(move), "score": score})
+
+    nodes = sum(result["nodes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {"method": method, "board": board_class.__name__, "depth": depth,
+            "transposition_table": use_tt, "batch_eval": batch_eval,
+            "nodes": nodes, "seconds": seconds,
+            "nps": nodes / seconds if seconds else 0., "checksum": checksum(results),
+            "positions": results}
+
+
+def run(configs=None, depth=None, repeat=1, path=POSITIONS_FILE):
+    """Run the benchmark.
+
+    Parameters
+    ----------
+    configs : list<str> (optional)
+        The names of the configurations to run; defaults to every one.
+
+    depth : int (optional)
+        The search depth of every configuration; defaults to the depth of
+        each configuration.
+
+    repeat : int (optional)
+        See `run_config()`.
+
+    path : str (optional)
+        The positions file.
+
+    Returns
+    -------
+    dict
+        The output format and position set versions, the Python version and
+        the results of each configuration (see `run_config()`).
+    """
+    version, positions = load_positions(path)
+    configs = sorted(CONFIGS) if configs is None else configs
+    return {"format": FORMAT_VERSION, "positions_version": version,
+            "python": platform.python_version(),
+            "configs": {name: run_config(name, positions, depth, repeat) for name in configs}}
+
+
+def compare(baseline, current):
+    """Compare two benchmark outputs.
+
+    Returns
+    -------
+    dict<str, dict>
+        For each configuration in both outputs, the nodes per second of each
+        one, the relative change, and whether the nodes searched and the
+        checksums match.
+    """
+    if baseline["positions_version"] != current["positions_version"]:
+        raise ValueError("Benchmarks of different position sets cannot be compared.")
+    changes = {}
+    for name, result in current["configs"].items():
+        old = baseline["configs"].get(name)
+        if old is None or old["depth"] != result["depth"]:
+            continue
+        changes[name] = {"baseline_nps": old["nps"], "nps": result["nps"],
+                         "change": result["nps"] / old["nps"] - 1 if old["nps"] else 0.,
+                         "same_nodes": old["nodes"] == result["nodes"],
+                         "same_checksum": old["checksum"] == result["checksum"]}
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the search speed of each engine configuration.")
+    parser.add_argument("--config", action="append", choices=sorted(CONFIGS),
+                        help="configuration to run (repeatable; default: all)")
+    parser.add_argument("--depth", type=int, help="search depth of every configuration")
+    parser.add_argument("--repeat", type=int, default=1, help="searches of each position")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a baseline to compare with")
+    args = parser.parse_args(argv)
+
+    results = run(args.config, args.depth, args.repeat)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    print("{:<26}{:>6}{:>12}{:>10}{:>12}{:>18}".format(
+        "Config", "Depth", "Nodes", "Seconds", "kN / s", "Checksum"))
+    for name, result in sorted(results["configs"].items()):
+        print("{:<26}{:>6}{:>12}{:>10.3f}{:>12.1f}{:>18}".format(
+            name, result["depth"], result["nodes"], result["seconds"],
+            result["nps"] / 1000., result["checksum"]))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nCompared to {}:".format(args.compare))
+        for name, change in sorted(compare(baseline, results).items()):
+            print("{:<26}{:>+9.1f}%{}{}".format(
+                name, 100. * change["change"],
+                "" if change["same_nodes"] else "  nodes differ",
+                "" if change["same_checksum"] else "  CHECKSUM DIFFERS"))
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""This file contains the exact endgame solver used by `CustomPlayer` once the
+two players are separated (see `Board.is_partitioned()`).
+
+When no blank cell is reachable by both players, neither player can affect
+the other, and each one simply makes the longest knight path available in
+its own region. The player to move makes a moves and the opponent b moves,
+so the player to move wins if and only if a > b. Longest paths are found by
+depth-first search memoized on (cell, open cells) bitmasks, where the open
+cells are always restricted to the region reachable from the current cell
+so that equivalent positions share entries, and the search stops as soon as
+a path reaches the parity bound of the region.
+"""
+
+from search import Timeout
+
+
+class EndgameSolver(object):
+    """Longest-path solver for partitioned Isolation positions.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        The number of memoized (cell, open cells) results kept before the
+        memo is cleared.
+    """
+    def __init__(self, max_entries=2**20):
+        self.max_entries = max_entries
+        self.time_left = None
+        self.threshold = 0.
+        self.clear()
+
+    def __getstate__(self):
+        # the clock of the last move cannot be sent to other processes
+        state = self.__dict__.copy()
+        state["time_left"] = None
+        return state
+
+    def clear(self):
+        """Forget every memoized result and reset the counters."""
+        self.memo = {}
+        self.nodes = 0
+        self.solved = 0
+
+    def longest_path(self, geometry, index, open_mask, limit=None):
+        """Return the number of moves in the longest knight path starting on
+        cell `index` and visiting only cells in `open_mask`.
+
+        When `limit` is given the search stops as soon as a path of `limit`
+        moves is found, so the result is only exact if it is below `limit`.
+        Raises `search.Timeout` when the solver's `time_left` callable (if
+        set) reports less than `threshold` milliseconds left.
+        """
+        limit = float("inf") if limit is None else limit
+        return self.__longest__(geometry, index, geometry.reachable(index, open_mask), limit)
+
+    def __longest__(self, geometry, index, region, limit):
+        key = (index, region)
+        entry = self.memo.get(key)
+        # entries are (length, exact); inexact lengths are lower bounds
+        if entry is not None and (entry[1] or entry[0] >= limit):
+            return entry[0]
+
+        self.nodes += 1
+        if self.time_left is not None and not self.nodes & 1023 and \
+                self.time_left() < self.threshold:
+            raise Timeout()
+
+        # knight moves alternate between the two cell parities, so a path
+        # takes turns visiting cells of the other parity and of the same one
+        parity = geometry.parity_masks[(index // geometry.width + index % geometry.width) % 2]
+        same = bin(region & parity).count("1")
+        other = bin(region & ~parity).count("1")
+        bound = min(2 * other, 2 * same + 1)
+
+        # try the cells with the fewest onward moves first (Warnsdorff's
+        # rule), which tends to find a path reaching the bound early
+        masks = geometry.neighbor_masks
+        children = []
+        moves = masks[index] & region
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            cell = bit.bit_length() - 1
+            children.append((bin(masks[cell] & region).count("1"), cell, region & ~bit))
+        children.sort()
+
+        length = 0
+        target = min(bound, limit)
+        for _, cell, rest in children:
+            if length >= target:
+                break
+            length = max(length, 1 + self.__longest__(geometry, cell, geometry.reachable(cell, rest),
+                                                      target - 1))
+
+        if len(self.memo) >= self.max_entries:
+            self.memo.clear()
+        self.memo[key] = (length, length >= bound or length < limit)
+        return length
+
+    def solve(self, game, player):
+        """Solve a partitioned position exactly.
+
+        The smaller of the two regions is solved exactly first, and the
+        other one is only searched until a path long enough to decide the
+        game is found.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            A game state in which `game.is_partitioned()` is True and
+            `player` holds initiative.
+
+        player : object
+            The player to move.
+
+        Returns
+        -------
+        float
+            float("inf") if the player wins with perfect play, otherwise
+            float("-inf").
+
+        tuple(int, int)
+            A winning move if there is one, otherwise the first move of the
+            player's longest path; (-1, -1) for no legal moves.
+        """
+        self.solved += 1
+        geometry = game.__geometry__
+        blank_mask = game.get_blank_mask()
+        width = game.width
+
+        moves = game.get_legal_moves(player)
+        if not moves:
+            return float("-inf"), (-1, -1)
+        row, col = game.get_player_location(game.get_opponent(player))
+        opponent = row * width + col
+        own_cells = [move[0] * width + move[1] for move in moves]
+
+        if bin(game.get_reachable_mask(player)).count("1") <= \
+                bin(game.get_reachable_mask(game.get_opponent(player))).count("1"):
+            lengths = [1 + self.longest_path(geometry, index, blank_mask & ~(1 << index))
+                       for index in own_cells]
+            best_length = max(lengths)
+            best_move = moves[lengths.index(best_length)]
+            won = self.longest_path(geometry, opponent, blank_mask, best_length) < best_length
+            return float("inf") if won else float("-inf"), best_move
+
+        opponent_length = self.longest_path(geometry, opponent, blank_mask)
+        best_length, best_move = -1, moves[0]
+        for move, index in zip(moves, own_cells):
+            length = 1 + self.longest_path(geometry, index, blank_mask & ~(1 << index),
+                                           opponent_length)
+            if length > opponent_length:
+                return float("inf"), move
+            if length > best_length:
+                best_length, best_move = length, move
+        return float("-inf"), best_move
@@ -8,48 +8,39 @@ relative strength using tournament.py and include the results in your report.
 """
 import random
 import math
+import timeit
 
-def custom_score_simple(game, player):
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+from search import ALPHABETA, MINIMAX, PVS
+from search import SearchEngine
+from search import Timeout
+from search_stats import SCORING
+from search_stats import SearchStats
+from search_stats import SectionTimer
+from search_stats import profiled_board
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+def custom_score_simple(game, player):
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = own_moves - opp_moves
     return float(diff)
 
 def custom_score_my_open_moves(game, player):
     #just rank moves according to what gives me the most options
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, _, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
     return float(own_moves)
 
 def custom_score_diff_in_free_percent_of_board(game, player):
     #this will take the percentage the free spaces I can move to - the percentage of free spaces an opponent can move to
     #this should weight more heavily for me when the opponent  has a smaller number of moves
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, opp_moves, blank_spaces, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    blank_spaces = len(game.get_blank_spaces())
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     my_free_percent = own_moves / blank_spaces
     opp_free_percent = opp_moves / blank_spaces
     diff_in_free_percent = my_free_percent - opp_free_percent
@@ -57,41 +48,29 @@ def custom_score_diff_in_free_percent_of_board(game, player):
 
 def custom_score_diff_in_mine_and_double_opponent(game, player):
     #simply take the difference in my moves - (2 * opponentes moves), should weight 2 to 1 better than 5 to 4
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = own_moves - (2 * opp_moves)
     return float(diff)
 
 def custom_score_diff_in_opp_and_double_mine(game, player):
     #this is to test a bad scoring algorithm
     #simply take the difference in my opp - (2 * my moves), should weight 2 to 1 better than 5 to 4
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = opp_moves - (2 * own_moves)
     return float(diff)
 
 def custom_score_divide_own_by_opponent(game, player):
     #divide my moves by the opponent
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     if(opp_moves == 0):
         return float("inf")
     return float(own_moves / opp_moves)
@@ -99,14 +78,10 @@ def custom_score_divide_own_by_opponent(game, player):
 def custom_score_diff_in_mine_and_double_opponent_chase_incase_of_tie(game, player):
     #take the difference in my moves - (2 * opponentes moves)
     #then double the number and subtract the distance away, meaning it will rank higher for moves closer to the opponent
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = own_moves - (2 * opp_moves)
 
     own_location = game.get_player_location(player)
@@ -119,14 +94,10 @@ def custom_score_diff_in_mine_and_double_opponent_chase_incase_of_tie(game, play
 def custom_score_diff_in_mine_and_double_opponent_run_away_incase_of_tie(game, player):
     # take the difference in my moves - (2 * opponentes moves)
     # then double the number and add the distance away, meaning it will rank higher for moves away from the opponent
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = own_moves - (2 * opp_moves)
 
     own_location = game.get_player_location(player)
@@ -139,14 +110,10 @@ def custom_score_diff_in_mine_and_double_opponent_run_away_incase_of_tie(game, p
 def custom_score_diff_in_mine_and_double_opponent_closest_to_center_tie(game, player):
     # take the difference in my moves - (2 * opponentes moves)
     # then double the number and subtract the distance away from the center, meaning it will rank higher for moves closest to the center
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     diff = own_moves - (2 * opp_moves)
 
     own_location = game.get_player_location(player)
@@ -156,11 +123,6 @@ def custom_score_diff_in_mine_and_double_opponent_closest_to_center_tie(game, pl
     # still want to make the main driver the differenc in locations, and don't want the distance to factor too much into, so double the diff
     return float(diff * 2 - dist_between_locations)
 
-class Timeout(Exception):
-    """Subclass base exception for code clarity."""
-    pass
-
-
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -185,7 +147,7 @@ def custom_score(game, player):
     """
     return custom_score_divide_own_by_opponent(game, player)
 
-class CustomPlayer:
+class CustomPlayer(SearchEngine):
     """Game-playing agent that chooses a move using your evaluation function
     and a depth-limited minimax algorithm with alpha-beta pruning. You must
     finish and test this player to make sure it properly uses minimax and
@@ -206,24 +168,118 @@ class CustomPlayer:
         Flag indicating whether to perform fixed-depth search (False) or
         iterative deepening search (True).
 
-    method : {'minimax', 'alphabeta'} (optional)
+    method : {'minimax', 'alphabeta', 'pvs'} (optional)
         The name of the search method to use in get_move().
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    in_place : boolean (optional)
+        Flag indicating whether the search should apply and undo moves on a
+        single board with `push()`/`pop()` (True) or create a new board for
+        every node with `forecast_move()` (False).
+
+    tt : `transposition.TranspositionTable` (optional)
+        A table used by alpha-beta search to remember search results across
+        iterative deepening iterations and across moves within a game. The
+        table is cleared automatically when a new game starts.
+
+    move_ordering : `move_ordering.MoveOrderer` (optional)
+        The move ordering stage used by alpha-beta search to try the most
+        promising moves (transposition table move, killer moves, history
+        heuristic) first.
+
+    aspiration : float (optional)
+        Half-width of the aspiration window centered on the score of the
+        previous iterative deepening iteration for alpha-beta and PVS search;
+        None searches every iteration with a full window.
+
+    aspiration_growth : float (optional)
+        Factor used to widen the aspiration window after the search fails
+        high or low.
+
+    endgame : `endgame.EndgameSolver` (optional)
+        A solver used instead of search once the players are separated (see
+        `Board.is_partitioned()`), playing the longest path of the agent's
+        region.
+
+    tablebase : `tablebase.Tablebase` (optional)
+        Exact results of small endgame positions, used instead of the
+        heuristic evaluation at the leaves of the search.
+
+    book : `opening_book.OpeningBook` (optional)
+        Best moves of the opening positions, played without searching.
+
+    profile : boolean (optional)
+        Flag indicating whether to time move generation, scoring, copying and
+        moves during search (see `search_stats`); slows the search down.
+
+    stats_hooks : list<callable> (optional)
+        Functions called as hook(player, stats) with the `SearchStats` of
+        every move (e.g., `search_stats.StatsTotals`).
+
+    batch_eval : boolean (optional)
+        Flag indicating whether to score the leaves of each node at depth 1
+        at once with the NumPy batch variant of `score_fn` (see
+        `batch_eval`); the search results are unchanged.
     """
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='minimax', timeout=50.):
+                 iterative=True, method='minimax', timeout=50., in_place=False,
+                 tt=None, move_ordering=None, aspiration=None,
+                 aspiration_growth=4., endgame=None, tablebase=None,
+                 book=None, profile=False, stats_hooks=None, batch_eval=False):
         self.search_depth = search_depth
         self.iterative = iterative
         self.score = score_fn
         self.method = method
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.in_place = in_place
+        self.tt = tt
+        self.move_ordering = move_ordering
+        self.aspiration = aspiration
+        self.aspiration_growth = aspiration_growth
+        self.endgame = endgame
+        self.tablebase = tablebase
+        self.book = book
+        self.profile = profile
+        self.stats_hooks = list(stats_hooks or [])
+        self.batch_score = None
+        if batch_eval:
+            # NumPy is only imported by players using it
+            from batch_eval import BatchEvaluator
+            self.batch_score = BatchEvaluator.for_score(score_fn)
+            if self.batch_score is None:
+                raise ValueError("The heuristic {!r} has no batch variant.".format(score_fn))
 
         self.move_count = 0
+        self.last_ply = -1
+
+        # search counters and stats of the last call to get_move()
+        self.reset_counters()
+        self.stats = None
+
+    def __getstate__(self):
+        # the clock of the last move cannot be sent to other processes
+        state = self.__dict__.copy()
+        state["time_left"] = None
+        return state
+
+    def new_game(self):
+        """Forget everything learned during the previous game.
+
+        This is called automatically by get_move() when the board has fewer
+        moves applied than on the previous call.
+        """
+        if self.tt is not None:
+            self.tt.clear()
+            self.tt_counters = (0, 0)
+        if self.move_ordering is not None:
+            self.move_ordering.clear()
+        if self.endgame is not None:
+            self.endgame.clear()
 
     def get_move(self, game, legal_moves, time_left):
         """Search for the best move from the available legal moves and return a
@@ -259,35 +315,143 @@ class CustomPlayer:
         (int, int)
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
-        """
 
+        The statistics of the search are left in `self.stats` and reported
+        to every hook in `self.stats_hooks`.
+        """
+        start = timeit.default_timer()
         self.time_left = time_left
+        self.reset_counters()
+        self.stats = stats = SearchStats()
+        # new_game() resets the table counters during the move
+        self.tt_counters = (self.tt.hits, self.tt.misses) if self.tt is not None else None
+
+        score_fn, batch_score = self.score, self.batch_score
+        if self.profile:
+            timer = SectionTimer()
+            game = profiled_board(game, timer)
+            self.score = timer.timed(SCORING, score_fn)
+            if batch_score is not None:
+                self.batch_score = timer.timed(SCORING, batch_score)
+        # heuristics, batch evaluators and tablebases reading incrementally
+        # maintained features enable them on the root of the search (see
+        # `heuristics.Heuristic.prepare()`)
+        for prepared in (score_fn, batch_score, self.tablebase):
+            if hasattr(prepared, "prepare"):
+                prepared.prepare(game)
+        try:
+            move = self.select_move(game, legal_moves, time_left)
+        finally:
+            self.score, self.batch_score = score_fn, batch_score
 
-        # TODO: finish this function!
-
+        stats.move = move
+        if not legal_moves:
+            stats.source = "none"
+        stats.nodes = self.nodes
+        stats.nodes_per_depth = list(self.nodes_per_depth)
+        stats.leaf_evals = self.leaf_evals
+        stats.cutoffs = self.cutoffs
+        if self.tt is not None:
+            stats.tt_hits = self.tt.hits - self.tt_counters[0]
+            stats.tt_probes = stats.tt_hits + self.tt.misses - self.tt_counters[1]
+        if self.profile:
+            stats.timings = timer.totals
+        stats.time_left = time_left()
+        stats.seconds = timeit.default_timer() - start
+        for hook in self.stats_hooks:
+            hook(self, stats)
+        return move
+
+    def select_move(self, game, legal_moves, time_left):
+        """Choose the move returned by get_move(), recording the search depth
+        reached and the source of the move in `self.stats`.
+
+        See `get_move()` for the parameters.
+        """
         # Perform any required initializations, including selecting an initial
         # move from the game board (i.e., an opening book), or returning
         # immediately if there are no legal moves
+        if not legal_moves:
+            return (-1, -1)
 
+        move = self.start_move(game, legal_moves, time_left)
+        if move is not None:
+            return move
+
+        return self.search_move(game, legal_moves)
+
+    def start_move(self, game, legal_moves, time_left):
+        """Prepare the search of a move, or choose the move without searching
+        when the opening book or the endgame solver has one.
+
+        New-game detection and the start of a new search for the table and
+        the move ordering happen here, so that every search of a move (also
+        by the subclasses searching in parallel) goes through them. See
+        `get_move()` for the parameters; `legal_moves` must not be empty.
+
+        Returns
+        -------
+        (int, int) or None
+            The move to play, or None if the position must be searched.
+        """
+        self.move_count += 1
+
+        # stored scores are from this player's point of view, so results
+        # from a previous game must not leak into the current one (also
+        # when the first moves of the game come from the book)
+        if self.starts_new_game(game):
+            self.new_game()
+
+        if self.book is not None:
+            book_move = self.book.probe(game)
+            if book_move in legal_moves:
+                self.stats.source = "book"
+                return book_move
+
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.move_ordering is not None:
+            self.move_ordering.new_search()
+
+        # separated players cannot interact, so the game is decided by
+        # the longest path in each region and can be solved exactly
+        if self.endgame is not None and game.is_partitioned():
+            self.endgame.time_left = time_left
+            self.endgame.threshold = self.TIMER_THRESHOLD
+            self.stats.source = "endgame"
+            try:
+                return self.endgame.solve(game, game.active_player)[1]
+            except Timeout:
+                return legal_moves[0]
+        return None
+
+    def search_move(self, game, legal_moves):
+        """Search for the best move with the configured method, returning the
+        best move found before the time limit expires.
+
+        See `get_move()` for the parameters; `legal_moves` must not be empty.
+        """
+        best_move = legal_moves[0]
+        best_score = float("-inf")
         try:
             # The search method call (alpha beta or minimax) should happen in
             # here in order to avoid timeout. The try/except block will
             # automatically catch the exception raised by the search method
             # when the timer gets close to expiring
-            if not legal_moves:
-                return (-1, -1)
-            else:
-                best_move = legal_moves[0]
-                best_score = float("-inf")
 
-            self.move_count += 1
-            player_number = game.__player_symbols__[game.active_player]
+            # in-place search mutates the board, so work on a private copy
+            # that can be abandoned mid-search when the timer expires
+            if self.in_place:
+                game = game.copy()
 
-            if(self.method == 'minimax'):
+            if(self.method == MINIMAX):
                 if(self.iterative):
                     temp_depth = 1
                     while True:
+                        start_nodes = self.nodes
                         tmp_score, tmp_best_move = self.minimax(game, temp_depth, True)
+                        self.nodes_per_depth.append(self.nodes - start_nodes)
+                        self.stats.depth = temp_depth
                         if(tmp_score > float("-inf")):
                             best_move = tmp_best_move
                             best_score = tmp_score
@@ -296,25 +460,25 @@ class CustomPlayer:
                         temp_depth += 1
                 else:
                     tmp_score, best_move = self.minimax(game, self.search_depth, True)
-            elif(self.method == 'alphabeta'):
+                    self.stats.depth = self.search_depth
+            elif(self.method in (ALPHABETA, PVS)):
+                search = self.alphabeta if self.method == ALPHABETA else self.pvs
                 if(self.iterative):
                     temp_depth = 1
                     while True:
-                        tmp_score, tmp_best_move = self.alphabeta(game, temp_depth, float("-inf"), float("inf"), True)
+                        tmp_score, tmp_best_move = self.aspiration_search(search, game, temp_depth, best_score)
+                        self.stats.depth = temp_depth
                         if(tmp_score > float("-inf")):
                             best_move = tmp_best_move
                             best_score = tmp_score
                         else:
                             break
-                        if (best_move == None):
-                            print(game.to_string())
-                            tmp_score, tmp_best_move = self.alphabeta(game, temp_depth, float("-inf"), float("inf"), True)
-
                         temp_depth += 1
                 else:
-                    tmp_score, best_move = self.alphabeta(game, self.search_depth, float("-inf"), float("inf"), True)
+                    tmp_score, best_move = search(game, self.search_depth, float("-inf"), float("inf"), True)
+                    self.stats.depth = self.search_depth
             else:
-                raise
+                raise ValueError("Unknown search method: {}".format(self.method))
 
             return best_move
 
@@ -352,52 +516,8 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
-
-        legal_moves = game.get_legal_moves()
-        if not legal_moves:
-            return float("-inf"), (-1, -1)
-
-        best_move = None
-
-        if(depth > 1):
-            # print("depth {}".format(depth))
-            if maximizing_player:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    tmp_score, _ = self.minimax(game.forecast_move(move), depth - 1, not maximizing_player)
-                    # if there is no best_move, save the first move
-                    if(best_move == None or tmp_score > best_score):
-                        best_score = tmp_score
-                        best_move = move
-            else:
-                best_score = float("inf")
-                for move in legal_moves:
-                    tmp_score, _ = self.minimax(game.forecast_move(move), depth - 1, not maximizing_player)
-                    # if there is no best_move, save the first move
-                    if(best_move == None or tmp_score < best_score):
-                        best_score = tmp_score
-                        best_move = move
-        if(depth == 1):
-            if maximizing_player:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    tmp_score = self.score(game.forecast_move(move), game.active_player)
-                    if (best_move == None or tmp_score > best_score):
-                        best_score = tmp_score
-                        best_move = move
-            else:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    #find my score after the opponent moves
-                    tmp_score = self.score(game.forecast_move(move), game.inactive_player)
-                    #keep the lowest score, because that is what the opponent will do
-                    if (best_move == None or tmp_score < best_score):
-                        best_score = tmp_score
-                        best_move = move
-
-        return best_score, best_move
+        return self.search(game, depth, maximizing_player=maximizing_player,
+                           method=MINIMAX)
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
         """Implement minimax search with alpha-beta pruning as described in the
@@ -437,64 +557,42 @@ class CustomPlayer:
                 to pass the project unit tests; you cannot call any other
                 evaluation function directly.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise Timeout()
+        return self.search(game, depth, alpha, beta, maximizing_player,
+                           method=ALPHABETA)
 
-        legal_moves = game.get_legal_moves()
-        if not legal_moves:
-            return float("-inf"), (-1, -1)
-
-        best_move = None
-
-        if(depth > 1):
-            if maximizing_player:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    tmp_score, _ = self.alphabeta(game.forecast_move(move), depth - 1, alpha, beta, not maximizing_player)
-                    # if there is no best_move, save the first move
-                    alpha = max(tmp_score, alpha)
-                    if(best_move == None or tmp_score > best_score):
-                        best_score = tmp_score
-                        best_move = move
-                    if(beta <= alpha):
-                        best_score = tmp_score
-                        break
-            else:
-                best_score = float("inf")
-                for move in legal_moves:
-                    tmp_score, _ = self.alphabeta(game.forecast_move(move), depth - 1, alpha, beta, not maximizing_player)
-                    # if there is no best_move, save the first move
-                    beta = min(tmp_score, beta)
-                    if(best_move == None or tmp_score < best_score):
-                        best_score = tmp_score
-                        best_move = move
-                    if(beta <= alpha):
-                        best_score = tmp_score
-                        break
-
-        if(depth == 1):
-            if maximizing_player:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    tmp_score = self.score(game.forecast_move(move), game.active_player)
-                    alpha = max(tmp_score, alpha)
-                    if (best_move == None or tmp_score > best_score):
-                        best_score = tmp_score
-                        best_move = move
-                    if(beta <= alpha):
-                        best_score = tmp_score
-                        break
-            else:
-                best_score = float("-inf")
-                for move in legal_moves:
-                    #find my score after the opponent moves
-                    tmp_score = self.score(game.forecast_move(move), game.inactive_player)
-                    beta = min(tmp_score, beta)
-                    #keep the lowest score, because that is what the opponent will do
-                    if (best_move == None or tmp_score < best_score):
-                        best_score = tmp_score
-                        best_move = move
-                    if(beta <= alpha):
-                        best_score = tmp_score
-                        break
-        return best_score, best_move
\ No newline at end of file
+    def pvs(self, game, depth, alpha=float("-inf"), beta=float("inf"), maximizing_player=True):
+        """Implement principal variation search (NegaScout): the first move
+        at each node is searched with the full window, and every other move
+        is first searched with a null window that only tests whether it beats
+        the best move so far.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            An instance of the Isolation game `Board` class representing the
+            current game state
+
+        depth : int
+            Depth is an integer representing the maximum number of plies to
+            search in the game tree before aborting
+
+        alpha : float
+            Alpha limits the lower bound of search on minimizing layers
+
+        beta : float
+            Beta limits the upper bound of search on maximizing layers
+
+        maximizing_player : bool
+            Flag indicating whether the current search depth corresponds to a
+            maximizing layer (True) or a minimizing layer (False)
+
+        Returns
+        -------
+        float
+            The score for the current search branch
+
+        tuple(int, int)
+            The best move for the current branch; (-1, -1) for no legal moves
+        """
+        return self.search(game, depth, alpha, beta, maximizing_player,
+                           method=PVS)
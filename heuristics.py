@@ -0,0 +1,199 @@
+"""This file contains a small language for heuristics: a heuristic is a
+weighted sum of named features of a game state, compiled once into a single
+Python function that computes only the features it uses.
+
+A heuristic is specified as a mapping of feature names to weights:
+
+    score_fn = compile_heuristic({"own_moves": 1., "opp_moves": -2.,
+                                  "opp_distance": -.5})
+
+and the compiled function is used like any hand-written heuristic, e.g.,
+`CustomPlayer(score_fn=score_fn)`. Terminal states score -inf or +inf like
+the other heuristics. Features are from the point of view of the evaluated
+player ("own") and of its opponent ("opp"):
+
+    own_moves, opp_moves
+        The number of legal moves (one-step mobility).
+
+    own_moves2, opp_moves2
+        The number of sequences of two moves (second-order mobility, see
+        `Board.second_order_mobility()`).
+
+    own_area, opp_area
+        The number of blank cells reachable in any number of moves, which is
+        the size of each player's region once the board is partitioned (see
+        `Board.reachable_area()`).
+
+    center_distance
+        The euclidean distance from the evaluated player to the center cell.
+
+    opp_distance
+        The euclidean distance between the players.
+
+    blanks
+        The number of blank cells.
+
+Features of a player who has not moved yet count every blank cell as
+reachable, and distances involving it are 0.
+
+The features are computed together in the generated function (the mobility
+terms and locations are shared by every feature needing them) and the
+weights are compiled in as constants, so the mobility, distance and blank
+features cost no function call of their own. The second-order mobility and
+area features are read from counts and regions that the boards maintain
+incrementally as moves are applied and undone, so they stay cheap enough
+for the leaves of a timed search. Compiled heuristics can be pickled (e.g.,
+to play tournament matches in worker processes); they are compiled again
+when unpickled.
+"""
+
+import itertools
+import math
+
+# Statements computing the values shared by several features
+_LOCATIONS = ("own_location = game.get_player_location(player)\n"
+              "opp_location = game.get_player_location(game.get_opponent(player))")
+
+# Statements shared by the features, in the order they are computed
+_SHARED = (_LOCATIONS,)
+
+# The shared statements each feature needs and the statement computing it
+# (None for the terms of `Board.mobility()`, which are always computed)
+FEATURES = {
+    "own_moves": ((), None),
+    "opp_moves": ((), None),
+    "blanks": ((), None),
+    "own_moves2": ((), "own_moves2 = game.second_order_mobility(player)"),
+    "opp_moves2": ((), "opp_moves2 = game.second_order_mobility(game.get_opponent(player))"),
+    "own_area": ((), "own_area = game.reachable_area(player)"),
+    "opp_area": ((), "opp_area = game.reachable_area(game.get_opponent(player))"),
+    "center_distance": ((_LOCATIONS,),
+                        "center_distance = 0. if own_location is None else math.hypot(\n"
+                        "    own_location[0] - game.height // 2, own_location[1] - game.width // 2)"),
+    "opp_distance": ((_LOCATIONS,),
+                     "opp_distance = 0. if own_location is None or opp_location is None else math.hypot(\n"
+                     "    own_location[0] - opp_location[0], own_location[1] - opp_location[1])"),
+}
+
+# Weightings equivalent to the hand-written heuristics of `game_agent`
+PRESETS = {
+    "simple": {"own_moves": 1., "opp_moves": -1.},
+    "my_open_moves": {"own_moves": 1.},
+    "diff_in_mine_and_double_opponent": {"own_moves": 1., "opp_moves": -2.},
+    "diff_in_opp_and_double_mine": {"own_moves": -2., "opp_moves": 1.},
+    "chase_incase_of_tie": {"own_moves": 2., "opp_moves": -4., "opp_distance": -1.},
+    "run_away_incase_of_tie": {"own_moves": 2., "opp_moves": -4., "opp_distance": 1.},
+    "closest_to_center_tie": {"own_moves": 2., "opp_moves": -4., "center_distance": -1.},
+}
+
+_TEMPLATE = """\
+def {name}(game, player):
+    own_moves, opp_moves, blanks, utility = game.mobility(player)
+    if utility:
+        return utility
+{body}
+    return float({total})
+"""
+
+
+def heuristic_source(weights, name="score"):
+    """Return the Python source of the function computing a heuristic.
+
+    Parameters
+    ----------
+    weights : dict<str, float>
+        The weight of each feature (see `FEATURES`); features with a weight
+        of 0 are not computed.
+
+    name : str (optional)
+        The name of the generated function.
+    """
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError("Unknown heuristic features: {}.".format(", ".join(sorted(unknown))))
+    # integer-valued features are summed first, so that the weights of the
+    # hand-written heuristics give exactly the same values
+    used = [feature for feature in FEATURES if weights.get(feature)]
+
+    needed = set()
+    for feature in used:
+        needed.update(FEATURES[feature][0])
+    statements = [shared for shared in _SHARED if shared in needed]
+    statements += [FEATURES[feature][1] for feature in used if FEATURES[feature][1]]
+    body = "\n".join("    " + line for statement in statements for line in statement.split("\n"))
+    total = " + ".join("{!r} * {}".format(float(weights[feature]), feature)
+                       for feature in used) or "0."
+    return _TEMPLATE.format(name=name, body=body, total=total)
+
+
+class Heuristic(object):
+    """A compiled heuristic, called as heuristic(game, player).
+
+    Parameters
+    ----------
+    weights : dict<str, float>
+        The weight of each feature (see `FEATURES`).
+
+    name : str (optional)
+        A name for the heuristic, e.g., for tournament agents; defaults to
+        the weights written as "feature=weight" pairs.
+
+    Attributes
+    ----------
+    source : str
+        The Python source of the generated function.
+    """
+    def __init__(self, weights, name=None):
+        self.weights = {feature: float(weight) for feature, weight in weights.items()}
+        self.name = name or ",".join("{}={:g}".format(feature, weight)
+                                     for feature, weight in sorted(self.weights.items()))
+        self.source = heuristic_source(self.weights)
+        namespace = {"math": math}
+        exec(compile(self.source, "<heuristic {}>".format(self.name), "exec"), namespace)
+        self.__evaluate__ = namespace["score"]
+
+    def __call__(self, game, player):
+        return self.__evaluate__(game, player)
+
+    def prepare(self, game):
+        """Enable the incremental maintenance of the move counts and regions
+        used by the heuristic on the root board of a search, so that every
+        position searched from it (by copies or by push/pop) inherits them."""
+        if self.weights.get("own_moves2") or self.weights.get("opp_moves2"):
+            game.get_degrees()
+        if self.weights.get("own_area") or self.weights.get("opp_area"):
+            for player in (game.active_player, game.inactive_player):
+                game.get_reachable_mask(player)
+
+    def __reduce__(self):
+        return Heuristic, (self.weights, self.name)
+
+    def __repr__(self):
+        return "Heuristic({!r})".format(self.name)
+
+
+def compile_heuristic(weights, name=None):
+    """Return the `Heuristic` computing the weighted sum of the features in
+    `weights` (a mapping of feature names to weights, or the name of one of
+    `PRESETS`)."""
+    if isinstance(weights, str):
+        return Heuristic(PRESETS[weights], name or weights)
+    return Heuristic(weights, name)
+
+
+def sweep(grid):
+    """Return the compiled heuristics of every combination of weights.
+
+    Parameters
+    ----------
+    grid : dict<str, list<float>>
+        The weights tried for each feature.
+
+    Returns
+    -------
+    list<Heuristic>
+        One heuristic per combination, named by its weights.
+    """
+    features = sorted(grid)
+    return [Heuristic(dict(zip(features, weights)))
+            for weights in itertools.product(*(grid[feature] for feature in features))]
@@ -0,0 +1,328 @@
+"""
+This file contains the `BitBoard` class, an alternative implementation of
+the `isolation.Board` rules that packs the game state into Python ints.
+
+Each cell of the board is assigned one bit (cell index = row * width + col).
+The set of blocked cells is a single int, and each player location is stored
+as a cell index, so copying a game state only copies a handful of ints and
+legality tests become bit tests. The public API is identical to `Board`, so
+the two classes can be used interchangeably by players and by tournament.py.
+"""
+
+from .isolation import Board
+from .geometry import get_geometry
+
+
+class BitBoard(Board):
+    """
+    Implement a model for the game Isolation assuming each player moves like
+    a knight in chess, storing the board state as integer bitmasks.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self.__player_1__ = player_1
+        self.__player_2__ = player_2
+        self.__active_player__ = player_1
+        self.__inactive_player__ = player_2
+        self.__blocked__ = 0
+        self.__p1_cell__ = -1
+        self.__p2_cell__ = -1
+        self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
+        self.__geometry__ = get_geometry(width, height)
+        self.__undo_stack__ = None
+        self.__zobrist__ = 0
+        self.__symmetric_hashes__ = None
+        self.__regions__ = None
+
+    def copy(self):
+        """ Return a copy of the current board. """
+        # every mutable field of the game state is an int or an immutable
+        # tuple, so a shallow copy of the instance dictionary is a complete
+        # copy of the game
+        new_board = object.__new__(self.__class__)
+        new_board.__dict__.update(self.__dict__)
+        return new_board
+
+    def move_is_legal(self, move):
+        """
+        Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        row, col = move
+        return 0 <= row < self.height and \
+               0 <= col < self.width and \
+               not (self.__blocked__ >> (row * self.width + col)) & 1
+
+    def get_blank_spaces(self):
+        """
+        Return a list of the locations that are still available on the board.
+        """
+        blocked = self.__blocked__
+        return [move for bit, move in self.__geometry__.blank_order if not blocked & bit]
+
+    def get_blank_mask(self):
+        """
+        Return the bitmask of the cells that are still available on the board.
+        """
+        return self.__geometry__.full_mask & ~self.__blocked__
+
+    def get_player_location(self, player):
+        """
+        Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the input player.
+        """
+        cell = self.__player_cell__(player)
+        if cell < 0:
+            return Board.NOT_MOVED
+        return divmod(cell, self.width)
+
+    def get_legal_moves(self, player=None):
+        """
+        Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        ----------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self.active_player
+        cell = self.__player_cell__(player)
+        if cell < 0:
+            return self.get_blank_spaces()
+        blocked = self.__blocked__
+        return [move for bit, move in self.__geometry__.neighbor_bits[cell] if not blocked & bit]
+
+    def mobility(self, player):
+        """
+        Compute the terms of the mobility heuristics in a single pass; see
+        `Board.mobility()`.
+        """
+        blanks = self.width * self.height - self.move_count
+        if self.__player_symbols__[player] == 1:
+            own_cell, opp_cell = self.__p1_cell__, self.__p2_cell__
+        else:
+            own_cell, opp_cell = self.__p2_cell__, self.__p1_cell__
+        masks = self.__geometry__.neighbor_masks
+        open_mask = ~self.__blocked__
+        own_moves = blanks if own_cell < 0 else bin(masks[own_cell] & open_mask).count("1")
+        opp_moves = blanks if opp_cell < 0 else bin(masks[opp_cell] & open_mask).count("1")
+        if player == self.__active_player__:
+            return own_moves, opp_moves, blanks, 0. if own_moves else float("-inf")
+        return own_moves, opp_moves, blanks, 0. if opp_moves else float("inf")
+
+    def get_degrees(self):
+        """
+        Return the number of blank knight destinations of each cell index;
+        see `Board.get_degrees()`. The counts are computed from the bitmasks
+        on every call.
+        """
+        open_mask = ~self.__blocked__
+        return [bin(mask & open_mask).count("1") for mask in self.__geometry__.neighbor_masks]
+
+    def second_order_mobility(self, player):
+        """
+        Return the number of sequences of two moves available to the
+        specified player if the other player does not move; see
+        `Board.second_order_mobility()`.
+        """
+        cell = self.__player_cell__(player)
+        masks = self.__geometry__.neighbor_masks
+        open_mask = ~self.__blocked__
+        if cell < 0:
+            moves = self.__geometry__.full_mask & open_mask
+        else:
+            moves = masks[cell] & open_mask
+        count = 0
+        while moves:
+            bit = moves & -moves
+            count += bin(masks[bit.bit_length() - 1] & open_mask).count("1")
+            moves ^= bit
+        return count
+
+    def apply_move(self, move):
+        """
+        Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        None
+        """
+        row, col = move
+        cell = row * self.width + col
+        self.__blocked__ |= 1 << cell
+        if self.__player_symbols__[self.__active_player__] == 1:
+            self.__zobrist__ ^= self.__zobrist_delta__(0, self.__p1_cell__, cell)
+            if self.__symmetric_hashes__ is not None:
+                self.__update_symmetric_hashes__(0, self.__p1_cell__, cell)
+            self.__p1_cell__ = cell
+        else:
+            self.__zobrist__ ^= self.__zobrist_delta__(1, self.__p2_cell__, cell)
+            if self.__symmetric_hashes__ is not None:
+                self.__update_symmetric_hashes__(1, self.__p2_cell__, cell)
+            self.__p2_cell__ = cell
+        if self.__regions__ is not None:
+            self.__update_regions__(cell)
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        self.move_count += 1
+
+    def push(self, move):
+        """
+        Move the active player to a specified location in place, recording
+        the information needed to undo the move with `pop()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        None
+        """
+        self.__undo_stack__ = (self.__player_cell__(self.__active_player__), self.__regions__,
+                               self.__undo_stack__)
+        self.apply_move(move)
+
+    def pop(self):
+        """
+        Undo the last move applied with `push()`, restoring the previous game
+        state in place.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        if self.__undo_stack__ is None:
+            raise IndexError("pop from a board with no pushed moves")
+        last_cell, self.__regions__, self.__undo_stack__ = self.__undo_stack__
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        index = self.__player_symbols__[self.__active_player__] - 1
+        if index == 0:
+            cell, self.__p1_cell__ = self.__p1_cell__, last_cell
+        else:
+            cell, self.__p2_cell__ = self.__p2_cell__, last_cell
+        self.__zobrist__ ^= self.__zobrist_delta__(index, last_cell, cell)
+        if self.__symmetric_hashes__ is not None:
+            self.__update_symmetric_hashes__(index, last_cell, cell)
+        self.__blocked__ &= ~(1 << cell)
+        self.move_count -= 1
+        return divmod(cell, self.width)
+
+    def __zobrist_delta__(self, index, last_cell, cell):
+        """
+        Return the Zobrist key difference for player `index` (0 or 1) moving
+        from `last_cell` to `cell`; applying the same difference again undoes
+        the move.
+        """
+        geometry = self.__geometry__
+        player_keys = geometry.zobrist_players[index]
+        delta = geometry.zobrist_side ^ geometry.zobrist_blocked[cell] ^ player_keys[cell]
+        if last_cell >= 0:
+            delta ^= player_keys[last_cell]
+        return delta
+
+    def __update_symmetric_hashes__(self, index, last_cell, cell):
+        """
+        Update the hash in every orientation for player `index` (0 or 1)
+        moving from `last_cell` to `cell` (or undoing that move).
+        """
+        deltas = self.__geometry__.symmetric_deltas(index, last_cell, cell)
+        self.__symmetric_hashes__ = tuple(key ^ delta for key, delta in zip(self.__symmetric_hashes__, deltas))
+
+    def __player_cell__(self, player):
+        """ Return the cell index of a player, or -1 if it has not moved. """
+        if self.__player_symbols__[player] == 1:
+            return self.__p1_cell__
+        return self.__p2_cell__
+
+    def __get_moves__(self, move):
+        """
+        Generate the list of possible moves for an L-shaped motion (like a
+        knight in chess).
+        """
+        if move == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+        r, c = move
+        blocked = self.__blocked__
+        return [m for bit, m in self.__geometry__.neighbor_bits[r * self.width + c] if not blocked & bit]
+
+    def to_string(self):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        out = ''
+
+        for i in range(self.height):
+            out += ' | '
+
+            for j in range(self.width):
+                cell = i * self.width + j
+
+                if not (self.__blocked__ >> cell) & 1:
+                    out += ' '
+                elif cell == self.__p1_cell__:
+                    out += '1'
+                elif cell == self.__p2_cell__:
+                    out += '2'
+                else:
+                    out += '-'
+
+                out += ' | '
+            out += '\n\r'
+
+        return out
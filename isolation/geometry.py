@@ -0,0 +1,219 @@
+"""
+This file contains the precomputed tables that depend only on the dimensions
+of an Isolation board. The tables are built the first time a board with a
+given (width, height) is created and are then shared by every `Board` and
+`BitBoard` instance with the same dimensions, so move generation only needs
+to filter the precomputed knight destinations on occupancy.
+
+Cells are indexed in row-major order (cell index = row * width + col), and
+bit `1 << index` represents the cell in bitmasks.
+"""
+
+import random
+import sys
+
+
+# Knight-move offsets in the order used to generate legal moves
+DIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2),  (1, 2), (2, -1),  (2, 1))
+
+_GEOMETRIES = {}
+
+
+class Geometry(object):
+    """
+    Precomputed knight-move neighbor tables for one board size.
+
+    Attributes
+    ----------
+    cells : tuple<(int, int)>
+        The (row, col) coordinate pair of each cell index.
+
+    neighbors : tuple<tuple<(int, int)>>
+        For each cell index, the in-bounds knight destinations of that cell.
+
+    neighbor_masks : tuple<int>
+        For each cell index, the bitmask of the in-bounds knight destinations
+        of that cell.
+
+    neighbor_bits : tuple<tuple<(int, (int, int))>>
+        For each cell index, the (bit, (row, col)) pairs of the in-bounds
+        knight destinations of that cell.
+
+    neighbor_cells : tuple<tuple<(int, (int, int))>>
+        For each cell index, the (cell index, (row, col)) pairs of the
+        in-bounds knight destinations of that cell.
+
+    blank_order : tuple<(int, (int, int))>
+        The (bit, (row, col)) pairs of every cell in the order reported by
+        `Board.get_blank_spaces()`.
+
+    zobrist_blocked : tuple<int>
+        The 64-bit Zobrist key of each cell index being blocked.
+
+    zobrist_players : (tuple<int>, tuple<int>)
+        The 64-bit Zobrist keys of player 1 and player 2 standing on each
+        cell index.
+
+    zobrist_side : int
+        The 64-bit Zobrist key for player 2 holding initiative.
+
+    full_mask : int
+        The bitmask of every cell on the board.
+
+    parity_masks : (int, int)
+        The bitmasks of the cells with an even and an odd (row + col); every
+        knight move changes the parity.
+
+    symmetries : tuple<tuple<int>>
+        For each symmetry of the board that preserves knight moves (the 8
+        rotations and reflections of a square board, or the 4 reflections of
+        a rectangular one), the cell index that each cell index is mapped to.
+        The first symmetry is the identity.
+
+    inverse_symmetries : tuple<tuple<int>>
+        The inverse permutation of each symmetry.
+
+    zobrist_symmetric : tuple<(tuple<int>, (tuple<int>, tuple<int>))>
+        For each symmetry, the blocked cell and player keys of each cell
+        index after the symmetry is applied, so that the hash of a position
+        in every orientation can be maintained like `Board.hash`.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = tuple((r, c) for r in range(height) for c in range(width))
+        self.neighbors = tuple(
+            tuple((r + dr, c + dc) for dr, dc in DIRECTIONS
+                  if 0 <= r + dr < height and 0 <= c + dc < width)
+            for r, c in self.cells)
+        self.neighbor_bits = tuple(
+            tuple((1 << (r * width + c), (r, c)) for r, c in moves)
+            for moves in self.neighbors)
+        self.neighbor_masks = tuple(sum(bit for bit, _ in moves)
+                                    for moves in self.neighbor_bits)
+        self.neighbor_cells = tuple(
+            tuple((r * width + c, (r, c)) for r, c in moves)
+            for moves in self.neighbors)
+        self.blank_order = tuple((1 << (i * width + j), (i, j))
+                                 for j in range(width) for i in range(height))
+        self.full_mask = (1 << (width * height)) - 1
+        even = sum(1 << (r * width + c) for r, c in self.cells if not (r + c) % 2)
+        self.parity_masks = (even, self.full_mask & ~even)
+
+        # the keys are seeded by the board size so that hashes are identical
+        # in every process (e.g., for files written by offline tools)
+        rng = random.Random("zobrist {}x{}".format(width, height))
+        size = width * height
+        self.zobrist_blocked = tuple(rng.getrandbits(64) for _ in range(size))
+        self.zobrist_players = (tuple(rng.getrandbits(64) for _ in range(size)),
+                                tuple(rng.getrandbits(64) for _ in range(size)))
+        self.zobrist_side = rng.getrandbits(64)
+
+        transforms = [lambda r, c: (r, c),
+                      lambda r, c: (height - 1 - r, c),
+                      lambda r, c: (r, width - 1 - c),
+                      lambda r, c: (height - 1 - r, width - 1 - c)]
+        if width == height:
+            transforms += [lambda r, c: (c, r),
+                           lambda r, c: (width - 1 - c, r),
+                           lambda r, c: (c, height - 1 - r),
+                           lambda r, c: (width - 1 - c, height - 1 - r)]
+        self.symmetries = tuple(
+            tuple(row * width + col for row, col in (transform(r, c) for r, c in self.cells))
+            for transform in transforms)
+        self.inverse_symmetries = tuple(
+            tuple(sorted(range(size), key=permutation.__getitem__))
+            for permutation in self.symmetries)
+        self.zobrist_symmetric = tuple(
+            (tuple(self.zobrist_blocked[i] for i in permutation),
+             tuple(tuple(keys[i] for i in permutation) for keys in self.zobrist_players))
+            for permutation in self.symmetries)
+
+    def reachable(self, index, open_mask):
+        """ Return the bitmask of the cells in `open_mask` that a knight
+        standing on cell `index` can reach through cells in `open_mask`. """
+        masks = self.neighbor_masks
+        region = frontier = masks[index] & open_mask
+        while frontier:
+            step = 0
+            while frontier:
+                bit = frontier & -frontier
+                step |= masks[bit.bit_length() - 1]
+                frontier ^= bit
+            frontier = step & open_mask & ~region
+            region |= frontier
+        return region
+
+    def symmetric_hashes(self, blocked, p1_cell, p2_cell, side):
+        """ Return the hash of a position in the orientation of each symmetry,
+        given the bitmask of its blocked cells, the cell index of each player
+        (-1 if not placed) and whether player 2 holds initiative. """
+        hashes = []
+        for blocked_keys, player_keys in self.zobrist_symmetric:
+            key = self.zobrist_side if side else 0
+            mask = blocked
+            while mask:
+                bit = mask & -mask
+                key ^= blocked_keys[bit.bit_length() - 1]
+                mask ^= bit
+            for keys, cell in zip(player_keys, (p1_cell, p2_cell)):
+                if cell >= 0:
+                    key ^= keys[cell]
+            hashes.append(key)
+        return tuple(hashes)
+
+    def symmetric_deltas(self, index, last_cell, cell):
+        """ Return the difference of the hash in each orientation for player
+        `index` (0 or 1) moving from `last_cell` (-1 if not placed) to
+        `cell`. """
+        side = self.zobrist_side
+        if last_cell < 0:
+            return tuple(side ^ blocked_keys[cell] ^ player_keys[index][cell]
+                         for blocked_keys, player_keys in self.zobrist_symmetric)
+        return tuple(side ^ blocked_keys[cell] ^ player_keys[index][cell] ^ player_keys[index][last_cell]
+                     for blocked_keys, player_keys in self.zobrist_symmetric)
+
+    def memory_usage(self):
+        """ Return the approximate number of bytes used by the tables. """
+        seen = set()
+        stack = [self.cells, self.neighbors, self.neighbor_bits,
+                 self.neighbor_masks, self.neighbor_cells, self.blank_order,
+                 self.zobrist_blocked, self.zobrist_players, self.symmetries,
+                 self.inverse_symmetries, self.zobrist_symmetric]
+        total = 0
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+            if isinstance(obj, tuple):
+                stack.extend(obj)
+        return total
+
+
+def get_geometry(width, height):
+    """
+    Return the shared `Geometry` for a board of the given dimensions,
+    building it on first use.
+    """
+    key = (width, height)
+    geometry = _GEOMETRIES.get(key)
+    if geometry is None:
+        geometry = _GEOMETRIES[key] = Geometry(width, height)
+    return geometry
+
+
+def memory_usage():
+    """
+    Return the memory used by the neighbor tables built so far.
+
+    Returns
+    ----------
+    dict<(int, int), int>
+        The approximate number of bytes used by the tables of each board
+        size, keyed by (width, height).
+    """
+    return {key: geometry.memory_usage() for key, geometry in _GEOMETRIES.items()}
@@ -10,9 +10,10 @@ be available to project reviewers.
 
 import timeit
 
-from copy import deepcopy
 from copy import copy
 
+from .geometry import get_geometry
+
 
 TIME_LIMIT_MILLIS = 200
 
@@ -52,6 +53,14 @@ class Board(object):
         self.__board_state__ = [[Board.BLANK for i in range(width)] for j in range(height)]
         self.__last_player_move__ = {player_1: Board.NOT_MOVED, player_2: Board.NOT_MOVED}
         self.__player_symbols__ = {Board.BLANK: Board.BLANK, player_1: 1, player_2: 2}
+        self.__geometry__ = get_geometry(width, height)
+        self.__undo_stack__ = None
+        self.__zobrist__ = 0
+        # hashes in every symmetric orientation, blank neighbor counts and
+        # reachable regions, maintained once requested
+        self.__symmetric_hashes__ = None
+        self.__degrees__ = None
+        self.__regions__ = None
 
     @property
     def active_player(self):
@@ -69,6 +78,67 @@ class Board(object):
         """
         return self.__inactive_player__
 
+    @property
+    def hash(self):
+        """
+        The 64-bit Zobrist hash of the current game state, combining the
+        blocked cells, the location of each player and the player holding
+        initiative. The hash is updated incrementally as moves are applied
+        and undone, and is identical for `Board` and `BitBoard` instances
+        encoding the same game state.
+        """
+        return self.__zobrist__
+
+    def symmetric_hashes(self):
+        """
+        Return the hash of the game state in the orientation of each symmetry
+        of the board (see `Geometry.symmetries`); the first one is `hash`.
+
+        The hashes are computed on the first call and then maintained by
+        every following move on this board and its copies.
+        """
+        if self.__symmetric_hashes__ is None:
+            cells = []
+            for player in (self.__player_1__, self.__player_2__):
+                location = self.get_player_location(player)
+                cells.append(-1 if location is Board.NOT_MOVED else location[0] * self.width + location[1])
+            blocked = self.__geometry__.full_mask & ~self.get_blank_mask()
+            self.__symmetric_hashes__ = self.__geometry__.symmetric_hashes(
+                blocked, cells[0], cells[1], self.__player_symbols__[self.active_player] == 2)
+        return self.__symmetric_hashes__
+
+    def canonical_hash(self):
+        """
+        Return a hash shared by every symmetric orientation of the game state.
+
+        Returns
+        ----------
+        (int, int)
+            The smallest hash over the symmetries of the board, and the index
+            of the symmetry that maps the game state to the orientation with
+            that hash (see `transform_move()`).
+        """
+        hashes = self.symmetric_hashes()
+        key = min(hashes)
+        return key, hashes.index(key)
+
+    def transform_move(self, move, symmetry):
+        """
+        Return the coordinate pair that `move` is mapped to by a symmetry of
+        the board (e.g., a move in the canonical orientation of the game
+        state).
+        """
+        row, col = move
+        return divmod(self.__geometry__.symmetries[symmetry][row * self.width + col], self.width)
+
+    def untransform_move(self, move, symmetry):
+        """
+        Return the coordinate pair that a symmetry of the board maps to
+        `move`; the inverse of `transform_move()`.
+        """
+        row, col = move
+        return divmod(self.__geometry__.inverse_symmetries[symmetry][row * self.width + col], self.width)
+
     def get_opponent(self, player):
         """
         Return the opponent of the supplied player.
@@ -99,7 +169,14 @@ class Board(object):
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        # the cells only hold ints, so copying each row is a deep copy
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
+        new_board.__undo_stack__ = self.__undo_stack__
+        new_board.__zobrist__ = self.__zobrist__
+        new_board.__symmetric_hashes__ = self.__symmetric_hashes__
+        if self.__degrees__ is not None:
+            new_board.__degrees__ = self.__degrees__[:]
+        new_board.__regions__ = self.__regions__
         return new_board
 
     def forecast_move(self, move):
@@ -149,6 +226,122 @@ class Board(object):
         return [(i, j) for j in range(self.width) for i in range(self.height)
             if self.__board_state__[i][j] == Board.BLANK]
 
+    def get_blank_mask(self):
+        """
+        Return the bitmask of the cells that are still available on the board
+        (bit `1 << (row * width + col)` is set for each blank cell).
+        """
+        state = self.__board_state__
+        return sum(bit for bit, (i, j) in self.__geometry__.blank_order
+                   if state[i][j] == Board.BLANK)
+
+    def get_reachable_mask(self, player):
+        """
+        Return the bitmask of the blank cells that the specified player can
+        reach through any sequence of moves, ignoring the other player (who
+        may only block cells in the same region).
+
+        The regions of both players are cached on the first call and then
+        maintained by every following move on this board and its copies: a
+        move only removes cells from a region, so the region of a player is
+        kept when the moved-to cell is outside of it, and is otherwise
+        searched again within the previous region rather than the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        int
+            The bitmask of the reachable cells; every blank cell if the player
+            has not moved yet.
+        """
+        regions = self.__regions__
+        if regions is None:
+            # every blank cell, to be narrowed down for each player
+            blank_mask = self.get_blank_mask()
+            regions = ((blank_mask, False), (blank_mask, False))
+        index = self.__player_symbols__[player] - 1
+        region, exact = regions[index]
+        if not exact:
+            location = self.get_player_location(player)
+            if location is not Board.NOT_MOVED:
+                region = self.__geometry__.reachable(location[0] * self.width + location[1], region)
+            regions = (regions[0], (region, True)) if index else ((region, True), regions[1])
+        self.__regions__ = regions
+        return region
+
+    def reachable_area(self, player):
+        """
+        Return the number of blank cells that the specified player can reach
+        through any sequence of moves (see `get_reachable_mask()`).
+        """
+        return bin(self.get_reachable_mask(player)).count("1")
+
+    def get_degrees(self):
+        """
+        Return the number of blank knight destinations of each cell index.
+
+        The counts are computed on the first call and then maintained by
+        every following move on this board and its copies, which only
+        updates the destinations of the moved-to cell. The list is owned by
+        the board and must not be modified.
+        """
+        if self.__degrees__ is None:
+            state = self.__board_state__
+            self.__degrees__ = [len([1 for r, c in moves if state[r][c] == Board.BLANK])
+                                for moves in self.__geometry__.neighbors]
+        return self.__degrees__
+
+    def second_order_mobility(self, player):
+        """
+        Return the number of sequences of two moves available to the
+        specified player if the other player does not move: the sum, over
+        the legal moves of the player, of the number of moves from there.
+
+        The counts of moves are read from `get_degrees()` once it has been
+        called on this board (or the board it was copied from), and are
+        otherwise computed for the moves of the player only.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        int
+            The number of two-move sequences of the player.
+        """
+        state = self.__board_state__
+        location = self.__last_player_move__[player]
+        if location is Board.NOT_MOVED:
+            moves = [(i * self.width + j, (i, j)) for i, j in self.get_blank_spaces()]
+        else:
+            moves = [(cell, (r, c)) for cell, (r, c) in
+                     self.__geometry__.neighbor_cells[location[0] * self.width + location[1]]
+                     if state[r][c] == Board.BLANK]
+        degrees = self.__degrees__
+        if degrees is not None:
+            return sum([degrees[cell] for cell, _ in moves])
+        neighbors = self.__geometry__.neighbors
+        return sum([len([1 for r, c in neighbors[cell] if state[r][c] == Board.BLANK])
+                    for cell, _ in moves])
+
+    def is_partitioned(self):
+        """
+        Return True if the players can no longer interfere with each other
+        because no blank cell is reachable by both of them, so the game is
+        decided by the longest path each player can make in its own region.
+        """
+        if self.get_player_location(self.__player_1__) is Board.NOT_MOVED or \
+                self.get_player_location(self.__player_2__) is Board.NOT_MOVED:
+            return False
+        return not (self.get_reachable_mask(self.__player_1__) &
+                    self.get_reachable_mask(self.__player_2__))
+
     def get_player_location(self, player):
         """
         Find the current location of the specified player on the board.
@@ -200,11 +393,71 @@ class Board(object):
         None
         """
         row, col = move
+        last_location = self.__last_player_move__[self.active_player]
+        self.__zobrist__ ^= self.__zobrist_delta__(last_location, move)
+        if self.__symmetric_hashes__ is not None:
+            self.__update_symmetric_hashes__(last_location, move)
         self.__last_player_move__[self.active_player] = move
         self.__board_state__[row][col] = self.__player_symbols__[self.active_player]
+        cell = row * self.width + col
+        if self.__degrees__ is not None:
+            degrees = self.__degrees__
+            for neighbor, _ in self.__geometry__.neighbor_cells[cell]:
+                degrees[neighbor] -= 1
+        if self.__regions__ is not None:
+            self.__update_regions__(cell)
         self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
         self.move_count += 1
 
+    def push(self, move):
+        """
+        Move the active player to a specified location in place, recording
+        the information needed to undo the move with `pop()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        ----------
+        None
+        """
+        # the undo stack is an immutable linked list of (previous location,
+        # previous regions, rest of stack) tuples so that copies of the board
+        # can share it
+        self.__undo_stack__ = (self.__last_player_move__[self.active_player], self.__regions__,
+                               self.__undo_stack__)
+        self.apply_move(move)
+
+    def pop(self):
+        """
+        Undo the last move applied with `push()`, restoring the previous game
+        state in place.
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair (row, column) of the move that was undone.
+        """
+        if self.__undo_stack__ is None:
+            raise IndexError("pop from a board with no pushed moves")
+        last_location, self.__regions__, self.__undo_stack__ = self.__undo_stack__
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        move = self.__last_player_move__[self.active_player]
+        self.__board_state__[move[0]][move[1]] = Board.BLANK
+        if self.__degrees__ is not None:
+            degrees = self.__degrees__
+            for neighbor, _ in self.__geometry__.neighbor_cells[move[0] * self.width + move[1]]:
+                degrees[neighbor] += 1
+        self.__last_player_move__[self.active_player] = last_location
+        self.__zobrist__ ^= self.__zobrist_delta__(last_location, move)
+        if self.__symmetric_hashes__ is not None:
+            self.__update_symmetric_hashes__(last_location, move)
+        self.move_count -= 1
+        return move
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
         return player == self.inactive_player and not self.get_legal_moves(self.active_player)
@@ -213,6 +466,34 @@ class Board(object):
         """ Test whether the specified player has lost the game. """
         return player == self.active_player and not self.get_legal_moves(self.active_player)
 
+    def mobility(self, player):
+        """
+        Compute the terms of the mobility heuristics in a single pass: the
+        number of legal moves of a player and of its opponent, the number of
+        blank cells, and whether the game is over.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        (int, int, int, float)
+            The number of legal moves of `player` and of its opponent, the
+            number of blank cells, and the utility of the game state for
+            `player` (+inf if it has won, -inf if it has lost, 0 otherwise).
+        """
+        active = player == self.__active_player__
+        opponent = self.__inactive_player__ if active else self.__active_player__
+        # every move blocks exactly one cell
+        blanks = self.width * self.height - self.move_count
+        own_moves = self.__count_moves__(self.__last_player_move__[player], blanks)
+        opp_moves = self.__count_moves__(self.__last_player_move__[opponent], blanks)
+        if active:
+            return own_moves, opp_moves, blanks, 0. if own_moves else float("-inf")
+        return own_moves, opp_moves, blanks, 0. if opp_moves else float("inf")
+
     def utility(self, player):
         """
         Returns the utility of the current game state from the perspective
@@ -247,6 +528,41 @@ class Board(object):
 
         return 0.
 
+    def __zobrist_delta__(self, last_location, move):
+        """
+        Return the Zobrist key difference for the active player moving from
+        `last_location` to `move`; applying the same difference again undoes
+        the move.
+        """
+        geometry = self.__geometry__
+        player_keys = geometry.zobrist_players[self.__player_symbols__[self.active_player] - 1]
+        cell = move[0] * self.width + move[1]
+        delta = geometry.zobrist_side ^ geometry.zobrist_blocked[cell] ^ player_keys[cell]
+        if last_location is not Board.NOT_MOVED:
+            delta ^= player_keys[last_location[0] * self.width + last_location[1]]
+        return delta
+
+    def __update_symmetric_hashes__(self, last_location, move):
+        """
+        Update the hash in every orientation for the active player moving
+        from `last_location` to `move` (or undoing that move).
+        """
+        width = self.width
+        last_cell = -1 if last_location is Board.NOT_MOVED else last_location[0] * width + last_location[1]
+        deltas = self.__geometry__.symmetric_deltas(self.__player_symbols__[self.active_player] - 1,
+                                                    last_cell, move[0] * width + move[1])
+        self.__symmetric_hashes__ = tuple(key ^ delta for key, delta in zip(self.__symmetric_hashes__, deltas))
+
+    def __update_regions__(self, cell):
+        """
+        Update the cached regions for a player moving to `cell`: the cell is
+        removed from both regions, and a region that contained it must be
+        searched again (within the remaining cells) when it is next needed.
+        """
+        bit = 1 << cell
+        self.__regions__ = tuple((region & ~bit, exact and not region & bit)
+                                 for region, exact in self.__regions__)
+
     def __get_moves__(self, move):
         """
         Generate the list of possible moves for an L-shaped motion (like a
@@ -257,14 +573,30 @@ class Board(object):
             return self.get_blank_spaces()
 
         r, c = move
+        board_state = self.__board_state__
 
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2),  (1, 2), (2, -1),  (2, 1)]
-
-        valid_moves = [(r+dr,c+dc) for dr, dc in directions if self.move_is_legal((r+dr, c+dc))]
+        # the shared neighbor table only holds in-bounds destinations, so the
+        # moves only need to be filtered on occupancy
+        valid_moves = [(r2, c2) for r2, c2 in self.__geometry__.neighbors[r * self.width + c]
+                       if board_state[r2][c2] == Board.BLANK]
 
         return valid_moves
 
+    def __count_moves__(self, move, blanks):
+        """
+        Count the moves available from a location without building the list
+        of moves; a player that has not moved yet can move to any of the
+        `blanks` blank cells.
+        """
+        if move == Board.NOT_MOVED:
+            return blanks
+        r, c = move
+        if self.__degrees__ is not None:
+            return self.__degrees__[r * self.width + c]
+        board_state = self.__board_state__
+        return len([1 for r2, c2 in self.__geometry__.neighbors[r * self.width + c]
+                    if board_state[r2][c2] == Board.BLANK])
+
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
         return self.to_string()
@@ -316,8 +648,12 @@ class Board(object):
             Return multiple including the winning player, the complete game
             move history, and a string indicating the reason for losing
             (e.g., timeout or invalid move).
+
+        The number of milliseconds taken by each move is recorded in
+        `self.move_times`.
         """
         move_history = []
+        self.move_times = []
 
         curr_time_millis = lambda: 1000 * timeit.default_timer()
 
@@ -331,6 +667,7 @@ class Board(object):
             time_left = lambda : time_limit - (curr_time_millis() - move_start)
             curr_move = self.active_player.get_move(game_copy, legal_player_moves, time_left)
             move_end = time_left()
+            self.move_times.append(time_limit - move_end)
 
             # print move_end
 
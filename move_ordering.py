@@ -0,0 +1,133 @@
+"""This file contains the move ordering stage used by `CustomPlayer` to sort
+the legal moves at each node of alpha-beta search so that cutoffs happen as
+early as possible.
+
+Moves are tried in the following order:
+
+    1. the best move stored in the transposition table for the position
+    2. killer moves -- moves that caused a cutoff at the same ply elsewhere
+       in the tree
+    3. the remaining moves sorted by their history heuristic score (the
+       total depth^2 of the cutoffs each move has caused for the player)
+       and, optionally, by the mobility left to the opponent after the move
+"""
+
+
+class MoveOrderer(object):
+    """Order legal moves using the transposition table move, killer moves
+    and the history heuristic.
+
+    Parameters
+    ----------
+    killers : int (optional)
+        The number of killer moves remembered for each ply (0 disables the
+        killer heuristic).
+
+    history : boolean (optional)
+        Flag indicating whether to order quiet moves by history score.
+
+    mobility : boolean (optional)
+        Flag indicating whether to break history ties by ordering moves that
+        leave the opponent with the fewest moves (and the player with the
+        most onward moves) first.
+    """
+    def __init__(self, killers=2, history=True, mobility=False):
+        self.num_killers = killers
+        self.use_history = history
+        self.use_mobility = mobility
+        self.clear()
+
+    def clear(self):
+        """Forget all killer moves, history scores and counters."""
+        self.killers = {}
+        self.history = {}
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Age the history scores so that recent cutoffs dominate."""
+        for key in self.history:
+            self.history[key] //= 2
+
+    def order(self, game, moves, tt_move=None):
+        """Return the moves sorted in the order they should be searched.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The game state in which the moves will be played.
+
+        moves : list<(int, int)>
+            The legal moves of the active player.
+
+        tt_move : (int, int) (optional)
+            The best move stored in the transposition table, if any.
+
+        Returns
+        -------
+        list<(int, int)>
+            The same moves in search order.
+        """
+        if len(moves) < 2:
+            return moves
+
+        first = []
+        if tt_move is not None and tt_move in moves:
+            first.append(tt_move)
+        for move in self.killers.get(game.move_count, ()):
+            if move in moves and move not in first:
+                first.append(move)
+        rest = [move for move in moves if move not in first]
+
+        if self.use_history or self.use_mobility:
+            side = game.__player_symbols__[game.active_player]
+            history = self.history
+            if self.use_mobility:
+                opp_moves = game.get_legal_moves(game.inactive_player)
+                num_opp_moves = len(opp_moves)
+                rest.sort(key=lambda move: (-history.get((side, move), 0),
+                                            num_opp_moves - (move in opp_moves),
+                                            -len(game.__get_moves__(move))))
+            else:
+                rest.sort(key=lambda move: -history.get((side, move), 0))
+
+        return first + rest
+
+    def record_cutoff(self, game, move, depth, index):
+        """Update the killer moves and history scores after a move caused a
+        beta cutoff.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The game state in which the move was played.
+
+        move : (int, int)
+            The move that caused the cutoff.
+
+        depth : int
+            The remaining search depth at the node.
+
+        index : int
+            The position of the move in the order it was searched.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if self.num_killers:
+            killers = self.killers.setdefault(game.move_count, [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.num_killers:]
+
+        if self.use_history:
+            key = (game.__player_symbols__[game.active_player], move)
+            self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def stats(self):
+        """Return the cutoff counters as a dictionary."""
+        rate = self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.
+        return {"cutoffs": self.cutoffs,
+                "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": rate}
@@ -0,0 +1,129 @@
+"""This file contains the opening book: the best move of every position in the
+first plies of the game, computed offline by deep search and played by
+`CustomPlayer` without searching.
+
+Knight moves are preserved by the symmetries of the board (the 8 rotations
+and reflections of a square board, or the 4 reflections of a rectangular
+one), so symmetric positions have symmetric best moves. The book stores one
+entry per class of symmetric positions, keyed by `Board.canonical_hash()`,
+with the best move in the canonical orientation.
+
+Books are written to `book_{width}x{height}.bin`:
+
+    header   magic b"ISOB", version, width, height, plies, record count
+    records  (key, move cell index) pairs
+
+and loaded into a dictionary so that each probe is a single hashed lookup.
+"""
+
+import os
+import struct
+import sys
+
+from isolation import Board
+
+MAGIC = b"ISOB"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBBI")
+RECORD = struct.Struct("<QB")
+
+
+def default_path(width, height):
+    """Return the file name of the opening book for a board size."""
+    return "book_{}x{}.bin".format(width, height)
+
+
+class OpeningBook(object):
+    """Opening book loaded from a file into memory.
+
+    Parameters
+    ----------
+    path : str
+        The book file.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.width, self.height, self.plies, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} opening book.".format(path, VERSION))
+        self.moves = dict(RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size]))
+        self.hits = 0
+
+    def probe(self, game):
+        """Return the book move of a game state, or None if the game state is
+        not in the book.
+        """
+        if game.move_count >= self.plies or game.width != self.width or \
+                game.height != self.height:
+            return None
+        key, symmetry = game.canonical_hash()
+        index = self.moves.get(key)
+        if index is None:
+            return None
+        self.hits += 1
+        # map the move back from the canonical orientation
+        return game.untransform_move(divmod(index, self.width), symmetry)
+
+
+def build(width, height, plies, player, path=None):
+    """Search every position of the first plies of the game and write the
+    best moves to an opening book file.
+
+    Parameters
+    ----------
+    width, height : int
+        The board size.
+
+    plies : int
+        The book covers every position with fewer moves applied.
+
+    player : `game_agent.CustomPlayer`
+        The agent used to search each position; it is given unlimited time,
+        so it must use fixed-depth search (e.g., a deep alpha-beta search).
+
+    path : str (optional)
+        The output file; defaults to `default_path(width, height)`.
+
+    Returns
+    -------
+    int
+        The number of positions in the book.
+    """
+    moves = {}
+    level = [Board("player 1", "player 2", width=width, height=height)]
+    for _ in range(plies):
+        following = {}
+        for game in level:
+            key, symmetry = game.canonical_hash()
+            if key in moves:
+                continue
+            move = player.get_move(game, game.get_legal_moves(), lambda: float("inf"))
+            row, col = game.transform_move(move, symmetry)
+            moves[key] = row * width + col
+            for move in game.get_legal_moves():
+                child = game.forecast_move(move)
+                following.setdefault(child.canonical_hash()[0], child)
+        level = list(following.values())
+
+    path = default_path(width, height) if path is None else path
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, plies, len(moves)))
+        for key, index in sorted(moves.items()):
+            f.write(RECORD.pack(key, index))
+    os.replace(path + ".tmp", path)
+    return len(moves)
+
+
+if __name__ == "__main__":
+    # e.g. python opening_book.py 7 7 [plies] [search depth]
+    from game_agent import CustomPlayer
+    from move_ordering import MoveOrderer
+    from transposition import TranspositionTable
+    size = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (7, 7)
+    plies = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    depth = int(sys.argv[4]) if len(sys.argv) > 4 else 7
+    searcher = CustomPlayer(depth, iterative=False, method="alphabeta",
+                            tt=TranspositionTable(), move_ordering=MoveOrderer())
+    count = build(size[0], size[1], plies, searcher)
+    print("Wrote {} positions to {}".format(count, default_path(*size)))
@@ -0,0 +1,582 @@
+"""This file contains parallel versions of the `CustomPlayer` search that use
+the idle cores of the machine during each turn.
+
+`RootParallelPlayer` splits the moves at the root of every iterative
+deepening iteration across a persistent pool of worker processes. The
+workers share the best score found so far (alpha) for the iteration, so each
+root move is searched with the tightest known window, and the main process
+merges the results of every iteration completed before the deadline.
+
+`LazySMPPlayer` runs the same iterative deepening search in every worker
+(Lazy SMP). The workers start at staggered depths and try the root moves in
+different orders, and they share a single `SharedTranspositionTable`, so
+each worker mostly reuses the results of the others and explores the part of
+the tree they have not reached yet.
+"""
+
+import inspect
+import multiprocessing
+import timeit
+import weakref
+
+from game_agent import CustomPlayer
+from isolation import Board
+from move_ordering import MoveOrderer
+from search import ALPHABETA, PVS
+from search import SearchEngine
+from search import Timeout
+from transposition import SharedTranspositionTable
+from transposition import TranspositionTable
+
+
+def snapshot(game):
+    """Return a picklable description of a game state that does not refer to
+    the player objects registered with the board.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The game state to describe.
+
+    Returns
+    -------
+    tuple
+        The board class, width, height, blocked cells, the location of each
+        player, and the number of moves applied. Profiled boards (see
+        `search_stats.profiled_board()`) are described by the board class
+        they extend.
+    """
+    blanks = set(game.get_blank_spaces())
+    blocked = [(r, c) for r in range(game.height) for c in range(game.width)
+               if (r, c) not in blanks]
+    locations = (game.get_player_location(game.__player_1__),
+                 game.get_player_location(game.__player_2__))
+    board_class = getattr(type(game), "base_class", type(game))
+    return board_class, game.width, game.height, blocked, locations, game.move_count
+
+
+def restore_snapshot(state, player_1=1, player_2=2):
+    """Rebuild a game state described by `snapshot()` with new player objects.
+
+    The blocked cells are replayed as moves so that the board (including its
+    position hash) is identical to the original; each player visits its share
+    of the blocked cells and ends on its recorded location.
+    """
+    board_class, width, height, blocked, locations, move_count = state
+    game = board_class(player_1, player_2, width=width, height=height)
+    others = [cell for cell in blocked if cell not in locations]
+    paths = []
+    for index, location in enumerate(locations):
+        # player 1 makes the extra move when the move count is odd
+        num_moves = (move_count + 1 - index) // 2
+        if location is None:
+            paths.append([])
+        else:
+            paths.append([others.pop() for _ in range(num_moves - 1)] + [location])
+    for turn in range(move_count):
+        game.apply_move(paths[turn % 2][turn // 2])
+    return game
+
+
+class _WorkerEngine(SearchEngine):
+    """Search engine living in each worker process of a parallel player.
+
+    While `shared_alpha` is set, every node re-reads the best root score
+    found by any worker (see `_search_root_move()`) and narrows its window
+    with it, as alpha-beta narrows the window of every node with the alpha
+    of the root; `alpha_bound` records the highest root score used.
+    """
+
+    def __init__(self, score_fn, method, in_place, tt, move_ordering, tablebase=None,
+                 batch_score=None):
+        self.score = score_fn
+        self.method = method
+        self.in_place = in_place
+        self.tt = tt
+        self.move_ordering = move_ordering
+        self.tablebase = tablebase
+        self.batch_score = batch_score
+        self.TIMER_THRESHOLD = 0.
+        self.time_left = None
+        self.aspiration = None
+        self.aspiration_growth = 1.
+        self.reset_counters()
+        self.last_ply = -1
+        self.shared_alpha = None
+        self.alpha_bound = float("-inf")
+
+    def negamax(self, game, depth, alpha, beta, player, method):
+        if self.shared_alpha is not None:
+            root_alpha = self.shared_alpha()
+            # a window closed by the root score would store wrong bounds in
+            # the table, so the node is then searched with its own window
+            if game.active_player == player:
+                if alpha < root_alpha < beta:
+                    alpha = root_alpha
+                    self.alpha_bound = max(self.alpha_bound, root_alpha)
+            elif alpha < -root_alpha < beta:
+                beta = -root_alpha
+                self.alpha_bound = max(self.alpha_bound, root_alpha)
+        return super(_WorkerEngine, self).negamax(game, depth, alpha, beta, player, method)
+
+
+def _worker_engine(player):
+    """Return the `_WorkerEngine` of the pool workers of a parallel player.
+
+    The heuristics are unwrapped from the timers of a profiled move (see
+    `search_stats.SectionTimer.timed()`), which belong to the main process.
+    """
+    batch_score = player.batch_score
+    if batch_score is not None:
+        batch_score = inspect.unwrap(batch_score)
+    return _WorkerEngine(inspect.unwrap(player.score), player.method, player.in_place,
+                         player.tt, player.move_ordering, player.tablebase, batch_score)
+
+
+# per-process state of the pool workers, set by _init_worker(), and the
+# snapshot and board of the position searched last, set by _start_search()
+_engine = None
+_shared = None
+_root = None
+
+
+def _init_worker(engine, shared):
+    """Pool initializer: keep the search engine and the shared search state
+    for the lifetime of the worker process.
+    """
+    global _engine, _shared, _root
+    _engine = engine
+    _shared = shared
+    _root = None
+
+
+def _start_search(state):
+    """Prepare the worker engine for a task searching the position described
+    by `state` (see `snapshot()`) and return its board.
+
+    The board is restored once for all the tasks of a position. Starting a
+    new position forgets the results of a previous game like
+    `CustomPlayer.new_game()`; a `SharedTranspositionTable` is cleared by the
+    main process before the search starts, and may already hold its results,
+    so only private tables are cleared here.
+    """
+    global _root
+    _engine.reset_counters()
+    _engine.shared_alpha = None
+    if _root is None or _root[0] != state:
+        game = restore_snapshot(state)
+        if _engine.starts_new_game(game):
+            if _engine.tt is not None and not isinstance(_engine.tt, SharedTranspositionTable):
+                _engine.tt.clear()
+            if _engine.move_ordering is not None:
+                _engine.move_ordering.clear()
+        _root = state, game
+    return _root[1]
+
+
+def _search_root_move(state, agent_index, move, depth, deadline, search_id):
+    """Search one root move in a worker process.
+
+    The move is searched with the window (alpha, +inf), where alpha is the
+    best score found by any worker for the same iteration; every node of the
+    search re-reads it, and the shared alpha is raised when the move
+    improves on it.
+
+    Returns
+    -------
+    (move, float or None, bool, int)
+        The move, its score for the agent (None if the search timed out),
+        whether the score is exact rather than an upper bound, and the number
+        of nodes searched.
+    """
+    game = _start_search(state)
+    agent = (1, 2)[agent_index]
+    _engine.time_left = lambda: 1000 * (deadline - timeit.default_timer())
+
+    # the values are read without the lock, which only orders the updates
+    values = _shared.get_obj()
+    _engine.shared_alpha = lambda: values[1] if values[0] == search_id else float("-inf")
+    alpha = _engine.alpha_bound = _engine.shared_alpha()
+    try:
+        child = game.forecast_move(move)
+        score = -_engine.negamax(child, depth - 1, float("-inf"), -alpha, agent, _engine.method)[0]
+    except Timeout:
+        return move, None, False, _engine.nodes
+    finally:
+        _engine.shared_alpha = None
+
+    with _shared.get_lock():
+        if _shared[0] == search_id and score > _shared[1]:
+            _shared[1] = score
+    return move, score, score > _engine.alpha_bound, _engine.nodes
+
+
+class RootParallelPlayer(CustomPlayer):
+    """Game-playing agent that performs iterative deepening alpha-beta (or
+    PVS) search with the root moves of each iteration split across a pool
+    of worker processes.
+
+    The pool is started the first time the player is asked for a move and is
+    reused for every following move; call close() to stop it. When only one
+    core is available the player searches serially like `CustomPlayer`.
+
+    Parameters
+    ----------
+    processes : int (optional)
+        The number of worker processes; defaults to the number of cores.
+
+    All other parameters are the same as `CustomPlayer`; the transposition
+    table and move ordering objects are copied into each worker.
+    """
+    def __init__(self, *args, processes=None, **kwargs):
+        super(RootParallelPlayer, self).__init__(*args, **kwargs)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = None
+        self.shared = None
+        self.search_id = 0
+
+    def __getstate__(self):
+        # the pool cannot be sent to other processes; copies start their own
+        state = super().__getstate__()
+        state["pool"] = state["shared"] = None
+        return state
+
+    def start(self):
+        """Start the worker pool (done automatically by get_move())."""
+        if self.pool is None:
+            engine = _worker_engine(self)
+            # slot 0 identifies the current iteration, slot 1 holds its alpha
+            self.shared = multiprocessing.Array('d', [0., float("-inf")])
+            self.pool = multiprocessing.Pool(self.processes, _init_worker,
+                                             (engine, self.shared))
+
+    def close(self):
+        """Stop the worker pool."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def select_move(self, game, legal_moves, time_left):
+        """Search for the best move with the root moves split across the
+        worker pool, returning the best move of the deepest iteration that
+        completed before the time limit.
+
+        See `CustomPlayer.get_move()` for the parameters; the node counts
+        include the nodes searched by the workers.
+        """
+        if self.processes < 2 or self.method not in (ALPHABETA, PVS) or len(legal_moves) < 2:
+            return super(RootParallelPlayer, self).select_move(game, legal_moves, time_left)
+
+        move = self.start_move(game, legal_moves, time_left)
+        if move is not None:
+            return move
+        self.start()
+
+        deadline = timeit.default_timer() + (time_left() - self.TIMER_THRESHOLD) / 1000.
+        state = snapshot(game)
+        agent_index = game.__player_symbols__[game.active_player] - 1
+
+        best_move = legal_moves[0]
+        root_moves = list(legal_moves)
+        depth = 1 if self.iterative else self.search_depth
+        while True:
+            self.search_id += 1
+            with self.shared.get_lock():
+                self.shared[0] = self.search_id
+                self.shared[1] = float("-inf")
+
+            start_nodes = self.nodes
+            pending = [self.pool.apply_async(_search_root_move,
+                                             (state, agent_index, move, depth,
+                                              deadline, self.search_id))
+                       for move in root_moves]
+            results = []
+            for result in pending:
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    return best_move
+                try:
+                    move, score, exact, nodes = result.get(
+                        timeout=remaining if remaining != float("inf") else None)
+                except multiprocessing.TimeoutError:
+                    return best_move
+                self.nodes += nodes
+                if score is None:
+                    return best_move
+                results.append((score, exact, move))
+            self.nodes_per_depth.append(self.nodes - start_nodes)
+            self.stats.depth = depth
+
+            # moves searched with a raised alpha that failed low only have an
+            # upper bound on their score; the best move always has an exact one
+            exact_results = [(score, move) for score, exact, move in results if exact]
+            if not exact_results:
+                # every move loses
+                return best_move
+            best_score, best_move = max(exact_results, key=lambda result: result[0])
+            if best_score == float("-inf") or not self.iterative:
+                return best_move
+
+            # search the most promising moves first in the next iteration
+            order = {move: index for index, move in enumerate(root_moves)}
+            results.sort(key=lambda result: (-result[0], order[result[2]]))
+            root_moves = [move for _, _, move in results]
+            depth += 1
+
+
+def _lazy_smp_search(state, agent_index, worker, max_depth, deadline, search_id):
+    """Run iterative deepening in a helper worker of `LazySMPPlayer` until the
+    deadline passes, `max_depth` is searched, or the main process moves on
+    to another search (the shared search id changes).
+
+    Helper workers start at depth 1 or 2 (alternating between workers) and
+    try the root moves rotated by the worker number, so that the workers do
+    not all search the same subtrees at the same time.
+
+    Returns
+    -------
+    dict
+        The worker number, the deepest completed depth, its score and best
+        move, the number of nodes searched and the elapsed seconds.
+    """
+    start = timeit.default_timer()
+    game = _start_search(state)
+    agent = (1, 2)[agent_index]
+    _engine.time_left = lambda: -1. if _shared.value != search_id else \
+        1000 * (deadline - timeit.default_timer())
+
+    moves = game.get_legal_moves()
+    shift = worker % len(moves)
+    moves = moves[shift:] + moves[:shift]
+    result = {"worker": worker, "depth": 0, "score": None, "move": None}
+    depth = 1 + worker % 2
+    try:
+        while max_depth is None or depth <= max_depth:
+            alpha, best_move = float("-inf"), moves[0]
+            for move in moves:
+                child = game.forecast_move(move)
+                score = -_engine.negamax(child, depth - 1, float("-inf"), -alpha,
+                                         agent, _engine.method)[0]
+                if score > alpha:
+                    alpha, best_move = score, move
+            result.update(depth=depth, score=alpha, move=best_move)
+            if alpha == float("-inf"):
+                break
+            # search the best move first in the next iteration
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            depth += 1
+    except Timeout:
+        pass
+    result.update(nodes=_engine.nodes, seconds=timeit.default_timer() - start)
+    return result
+
+
+class LazySMPPlayer(CustomPlayer):
+    """Game-playing agent that runs iterative deepening alpha-beta (or PVS)
+    search in the main process and in a pool of helper processes at the same
+    time, all sharing one transposition table (Lazy SMP).
+
+    The move of the main search is played unless a helper completed a deeper
+    iteration first. The statistics of every worker for the last move are
+    kept in `worker_stats`. When only one core is available the player
+    searches serially like `CustomPlayer`.
+
+    Parameters
+    ----------
+    processes : int (optional)
+        The total number of searching processes (including the main one);
+        defaults to the number of cores.
+
+    tt_entries : int (optional)
+        The number of entries of the shared transposition table, used when
+        `tt` is not already a `SharedTranspositionTable`.
+
+    All other parameters are the same as `CustomPlayer`; the move ordering
+    object is copied into each helper. Unless `tt` is a
+    `SharedTranspositionTable`, the player creates its table the first time
+    it is asked for a move and releases it in close() or when the player is
+    garbage collected; copies of the player (e.g., sent to tournament
+    workers) create their own table.
+    """
+    def __init__(self, *args, processes=None, tt_entries=2**16, **kwargs):
+        super(LazySMPPlayer, self).__init__(*args, **kwargs)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.tt_entries = tt_entries
+        self.owns_tt = not isinstance(self.tt, SharedTranspositionTable)
+        if self.owns_tt:
+            self.tt = None
+        self.__finalizer__ = None
+        self.pool = None
+        self.shared = None
+        self.search_id = 0
+        self.worker_stats = []
+
+    def __getstate__(self):
+        # the pool cannot be sent to other processes; copies start their own,
+        # and their own table
+        state = super().__getstate__()
+        state["pool"] = state["shared"] = state["__finalizer__"] = None
+        if self.owns_tt:
+            state["tt"] = None
+        return state
+
+    def start_table(self):
+        """Create the shared transposition table if the player has none (done
+        automatically by get_move())."""
+        if self.tt is None:
+            self.tt = SharedTranspositionTable(self.tt_entries)
+            self.__finalizer__ = weakref.finalize(self, self.tt.close)
+
+    def get_move(self, game, legal_moves, time_left):
+        self.start_table()
+        return super(LazySMPPlayer, self).get_move(game, legal_moves, time_left)
+
+    def start(self):
+        """Start the helper pool (done automatically by get_move())."""
+        self.start_table()
+        if self.pool is None:
+            engine = _worker_engine(self)
+            # the id of the current search; helpers stop when it changes
+            self.shared = multiprocessing.Value('i', 0, lock=False)
+            self.pool = multiprocessing.Pool(self.processes - 1, _init_worker,
+                                             (engine, self.shared))
+
+    def close(self):
+        """Stop the helper pool and release the shared transposition table
+        created by the player."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.__finalizer__ is not None:
+            self.__finalizer__()
+            self.__finalizer__ = self.tt = None
+
+    def select_move(self, game, legal_moves, time_left):
+        """Search for the best move in the main process while the helpers
+        search the same position, returning the move of the deepest search
+        completed before the time limit.
+
+        See `CustomPlayer.get_move()` for the parameters; the search stats
+        only count the nodes of the main process (see `worker_stats`).
+        """
+        if self.processes < 2 or self.method not in (ALPHABETA, PVS) or len(legal_moves) < 2:
+            return super(LazySMPPlayer, self).select_move(game, legal_moves, time_left)
+
+        # start_move() clears the shared table of a new game before the
+        # helpers use it
+        move = self.start_move(game, legal_moves, time_left)
+        if move is not None:
+            return move
+        self.start()
+        start = timeit.default_timer()
+        self.search_id += 1
+        self.shared.value = self.search_id
+        # helpers stop one threshold before the main search so that their
+        # results reach the main process in time
+        deadline = start + (time_left() - 2 * self.TIMER_THRESHOLD) / 1000.
+        state = snapshot(game)
+        agent_index = game.__player_symbols__[game.active_player] - 1
+        max_depth = None if self.iterative else self.search_depth
+        pending = [self.pool.apply_async(_lazy_smp_search,
+                                         (state, agent_index, worker, max_depth,
+                                          deadline, self.search_id))
+                   for worker in range(1, self.processes)]
+
+        best_move = self.search_move(game, legal_moves)
+        depth = self.stats.depth
+        # stop the helpers and collect the iterations they completed
+        self.shared.value = -self.search_id
+        self.worker_stats = [{"worker": 0, "depth": depth, "move": best_move,
+                              "nodes": self.nodes,
+                              "seconds": timeit.default_timer() - start}]
+        for result in pending:
+            remaining = max(0., (time_left() - self.TIMER_THRESHOLD / 2) / 1000.)
+            try:
+                self.worker_stats.append(result.get(
+                    timeout=remaining if remaining != float("inf") else None))
+            except multiprocessing.TimeoutError:
+                break
+        for stats in self.worker_stats:
+            stats["nps"] = stats["nodes"] / stats["seconds"] if stats["seconds"] else 0.
+
+        for stats in self.worker_stats[1:]:
+            if stats["depth"] > depth and stats["score"] != float("-inf"):
+                depth, best_move = stats["depth"], stats["move"]
+        self.stats.depth = depth
+        return best_move
+
+
+def benchmark(processes=None, depth=5, score_fn=None, positions=None,
+              board_class=Board):
+    """Compare Lazy SMP search to serial alpha-beta search on a fixed set of
+    positions, searching each position to a fixed depth.
+
+    Parameters
+    ----------
+    processes : int (optional)
+        The number of searching processes; defaults to the number of cores.
+
+    depth : int (optional)
+        The search depth.
+
+    score_fn : callable (optional)
+        The heuristic; defaults to `sample_players.improved_score`.
+
+    positions : list<list<(int, int)>> (optional)
+        Move sequences from the empty board to each position; defaults to
+        the 7x7 positions of the search speed benchmark (see
+        `benchmark.load_positions()`).
+
+    board_class : class (optional)
+        The board implementation to search with.
+
+    Returns
+    -------
+    dict
+        The total serial and parallel search times in seconds, the speedup,
+        and the nodes, seconds and nodes per second of each worker summed
+        over the positions.
+    """
+    if score_fn is None:
+        from sample_players import improved_score as score_fn
+    if positions is None:
+        from benchmark import load_positions
+        positions = [position["moves"] for position in load_positions()[1]
+                     if (position["width"], position["height"]) == (7, 7)]
+    serial = CustomPlayer(depth, score_fn, False, ALPHABETA,
+                          tt=TranspositionTable(), move_ordering=MoveOrderer())
+    parallel = LazySMPPlayer(depth, score_fn, False, ALPHABETA,
+                             move_ordering=MoveOrderer(), processes=processes)
+    serial_seconds = parallel_seconds = 0.
+    workers = {}
+    try:
+        for moves in positions:
+            for player in (serial, parallel):
+                game = board_class(player, "opponent")
+                for move in moves:
+                    game.apply_move(move)
+                # every position is searched from scratch
+                player.new_game()
+                start = timeit.default_timer()
+                player.get_move(game, game.get_legal_moves(), lambda: float("inf"))
+                elapsed = timeit.default_timer() - start
+                if player is serial:
+                    serial_seconds += elapsed
+                    continue
+                parallel_seconds += elapsed
+                for stats in parallel.worker_stats:
+                    total = workers.setdefault(stats["worker"], {"nodes": 0, "seconds": 0.})
+                    total["nodes"] += stats["nodes"]
+                    total["seconds"] += stats["seconds"]
+    finally:
+        parallel.close()
+
+    for total in workers.values():
+        total["nps"] = total["nodes"] / total["seconds"] if total["seconds"] else 0.
+    return {"serial_seconds": serial_seconds,
+            "parallel_seconds": parallel_seconds,
+            "speedup": serial_seconds / parallel_seconds if parallel_seconds else 0.,
+            "workers": [dict(worker=worker, **workers[worker]) for worker in sorted(workers)]}
@@ -26,13 +26,8 @@ def null_score(game, player):
         The heuristic value of the current game state.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    return 0.
+    # the utility is 0 unless the game is over
+    return game.utility(player)
 
 
 def open_move_score(game, player):
@@ -55,13 +50,11 @@ def open_move_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
+    own_moves, _, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    return float(len(game.get_legal_moves(player)))
+    return float(own_moves)
 
 
 def improved_score(game, player):
@@ -85,14 +78,10 @@ def improved_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    own_moves, opp_moves, _, utility = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves - opp_moves)
 
 
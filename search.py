@@ -0,0 +1,324 @@
+"""This file contains the negamax search engine shared by every search method
+of `CustomPlayer` (minimax, alpha-beta and principal variation search).
+
+Negamax scores every position from the point of view of the player holding
+initiative, so maximizing and minimizing layers share a single code path: the
+score of a move is the negated score of the position it leads to. Heuristic
+values are always computed for the searching agent (as required by the
+project tests) and negated on the agent's opponent's turns.
+"""
+
+from transposition import EXACT, LOWER, UPPER
+
+# Search methods supported by the engine
+MINIMAX = 'minimax'
+ALPHABETA = 'alphabeta'
+PVS = 'pvs'
+
+# Width of the null window used by principal variation search to test
+# whether a move scores better than the current best move
+SCOUT_WINDOW = 1e-6
+
+
+class Timeout(Exception):
+    """Subclass base exception for code clarity."""
+    pass
+
+
+class SearchEngine(object):
+    """Depth-limited negamax search with optional alpha-beta pruning, null
+    window scouting (PVS), transposition table, move ordering, in-place
+    move application and aspiration windows.
+
+    Subclasses must provide the following attributes:
+
+        score : callable
+            The heuristic evaluation function score(game, player).
+
+        time_left : callable
+            Function returning the milliseconds left in the current turn.
+
+        TIMER_THRESHOLD : float
+            Time remaining (in milliseconds) when search is aborted.
+
+        in_place : boolean
+            Whether moves are applied with push()/pop() on a single board.
+
+        tt : `transposition.TranspositionTable` or None
+            Table of previous search results.
+
+        move_ordering : `move_ordering.MoveOrderer` or None
+            Move ordering stage for alpha-beta and PVS.
+
+        tablebase : `tablebase.Tablebase` or None
+            Exact endgame results used instead of the heuristic at leaves.
+
+        batch_score : callable or None
+            Function batch_score(game, moves, player) returning the heuristic
+            values of the children of `game` (see `batch_eval`), used
+            instead of `score` at depth 1 without a tablebase.
+
+        aspiration, aspiration_growth : float
+            Aspiration window half-width (or None) and widening factor.
+
+        nodes : int, nodes_per_depth : list<int>
+        leaf_evals : int, cutoffs : int
+            Counters updated by the search (see `reset_counters()`).
+
+        last_ply : int
+            The number of moves applied to the board at the previous search
+            (-1 before the first one; see `starts_new_game()`).
+    """
+
+    def reset_counters(self):
+        """Reset the node, leaf evaluation and cutoff counters."""
+        self.nodes = 0
+        self.nodes_per_depth = []
+        self.leaf_evals = 0
+        self.cutoffs = 0
+
+    def starts_new_game(self, game):
+        """Record the start of a search from `game` and return whether it
+        belongs to a new game: the board has no more moves applied than at
+        the previous search."""
+        new_game = game.move_count <= self.last_ply
+        self.last_ply = game.move_count
+        return new_game
+
+    def search(self, game, depth, alpha=float("-inf"), beta=float("inf"),
+               maximizing_player=True, method=ALPHABETA):
+        """Search the game tree from `game` to a fixed depth.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The current game state.
+
+        depth : int
+            The number of plies to search.
+
+        alpha, beta : float
+            The search window, from the point of view of the searching agent.
+
+        maximizing_player : bool
+            Flag indicating whether the searching agent holds initiative in
+            `game` (True) or is waiting for its opponent to move (False).
+
+        method : {MINIMAX, ALPHABETA, PVS}
+            The search method.
+
+        Returns
+        -------
+        float
+            The score of `game` for the searching agent.
+
+        tuple(int, int)
+            The best move for the active player; (-1, -1) for no legal moves.
+        """
+        if maximizing_player:
+            return self.negamax(game, depth, alpha, beta, game.active_player, method)
+        score, move = self.negamax(game, depth, -beta, -alpha, game.inactive_player, method)
+        return -score, move
+
+    def negamax(self, game, depth, alpha, beta, player, method):
+        """Search the game tree in negamax form.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The current game state.
+
+        depth : int
+            The number of plies left to search.
+
+        alpha, beta : float
+            The search window, from the point of view of the active player.
+
+        player : object
+            The searching agent; the heuristic is always evaluated for this
+            player.
+
+        method : {MINIMAX, ALPHABETA, PVS}
+            The search method.
+
+        Returns
+        -------
+        float
+            The score of `game` for the active player.
+
+        tuple(int, int)
+            The best move for the active player; (-1, -1) for no legal moves.
+        """
+        self.nodes += 1
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise Timeout()
+
+        # heuristic values are from the agent's point of view
+        sign = 1 if game.active_player == player else -1
+        evaluate = self.score if self.tablebase is None else self.tablebase_score
+        if depth <= 0:
+            self.leaf_evals += 1
+            return sign * evaluate(game, player), None
+
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return float("-inf"), (-1, -1)
+
+        prune = method != MINIMAX
+        tt = self.tt if prune else None
+
+        # reuse a stored result that was searched at least as deep, or narrow
+        # the window with a stored bound; the result of the search is stored
+        # with its bound in the original window
+        window_alpha, window_beta = alpha, beta
+        tt_move = None
+        if tt is not None:
+            # symmetric tables share entries between orientations of a
+            # position, with moves stored in the canonical orientation
+            if tt.symmetric:
+                key, symmetry = game.canonical_hash()
+            else:
+                key = game.hash
+            entry = tt.probe(key)
+            if entry is not None:
+                _, tt_depth, tt_score, bound, tt_move, _ = entry
+                if tt.symmetric and tt_move is not None:
+                    tt_move = game.untransform_move(tt_move, symmetry)
+                # an entry whose move is not legal here belongs to another
+                # position with the same key, and must not be reused (at the
+                # root its move would be played)
+                if tt_move not in legal_moves:
+                    tt_move = None
+                elif tt_depth >= depth:
+                    if bound == EXACT:
+                        return tt_score, tt_move
+                    if bound == LOWER:
+                        alpha = max(alpha, tt_score)
+                    else:
+                        beta = min(beta, tt_score)
+                    if beta <= alpha:
+                        return tt_score, tt_move
+
+        if prune and self.move_ordering is not None:
+            legal_moves = self.move_ordering.order(game, legal_moves, tt_move)
+
+        in_place = self.in_place
+        scout = method == PVS
+        best_score, best_move = float("-inf"), legal_moves[0]
+        # score every leaf at once without creating the children
+        leaf_scores = None
+        if depth == 1 and self.batch_score is not None and self.tablebase is None:
+            leaf_scores = self.batch_score(game, legal_moves, player)
+        for index, move in enumerate(legal_moves):
+            if leaf_scores is not None:
+                self.nodes += 1
+                self.leaf_evals += 1
+                score = sign * leaf_scores[index]
+            else:
+                if in_place:
+                    game.push(move)
+                    child = game
+                else:
+                    child = game.forecast_move(move)
+
+                if depth == 1:
+                    # evaluate the leaves directly rather than through another
+                    # level of recursion
+                    self.nodes += 1
+                    self.leaf_evals += 1
+                    score = sign * evaluate(child, player)
+                elif scout and index and alpha != float("-inf"):
+                    score = -self.negamax(child, depth - 1, -alpha - SCOUT_WINDOW, -alpha, player, method)[0]
+                    if alpha < score < beta:
+                        score = -self.negamax(child, depth - 1, -beta, -score, player, method)[0]
+                else:
+                    score = -self.negamax(child, depth - 1, -beta, -alpha, player, method)[0]
+
+                if in_place:
+                    game.pop()
+
+            if score > best_score:
+                best_score, best_move = score, move
+            if prune:
+                if score > alpha:
+                    alpha = score
+                if beta <= alpha:
+                    self.cutoffs += 1
+                    self.record_cutoff(game, move, depth, index)
+                    break
+
+        if tt is not None:
+            if best_score <= window_alpha:
+                bound = UPPER
+            elif best_score >= window_beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            stored_move = game.transform_move(best_move, symmetry) if tt.symmetric else best_move
+            tt.store(key, depth, best_score, bound, stored_move)
+
+        return best_score, best_move
+
+    def tablebase_score(self, game, player):
+        """Return the exact value of `game` for `player` if the position is
+        in the tablebase, otherwise its heuristic value.
+        """
+        result = self.tablebase.probe(game)
+        if result is None:
+            return self.score(game, player)
+        return float("inf") if result[0] == (game.active_player == player) else float("-inf")
+
+    def aspiration_search(self, search, game, depth, previous_score):
+        """Search the game tree to a fixed depth with a window centered on the
+        score of the previous iterative deepening iteration, widening the
+        window and searching again whenever the result falls outside of it.
+
+        Parameters
+        ----------
+        search : callable
+            The search method (e.g., `self.alphabeta` or `self.pvs`).
+
+        game : isolation.Board
+            The current game state.
+
+        depth : int
+            The search depth of this iteration.
+
+        previous_score : float
+            The score found by the previous iteration; the full window is used
+            when the score is not finite or aspiration windows are disabled.
+
+        Returns
+        -------
+        float
+            The score of the current game state.
+
+        tuple(int, int)
+            The best move in the current game state.
+        """
+        start_nodes = self.nodes
+        alpha, beta = float("-inf"), float("inf")
+        delta = self.aspiration
+        if delta is not None and abs(previous_score) != float("inf"):
+            alpha, beta = previous_score - delta, previous_score + delta
+
+        while True:
+            score, move = search(game, depth, alpha, beta, True)
+            if alpha < score < beta or (score <= alpha and alpha == float("-inf")) \
+                    or (score >= beta and beta == float("inf")):
+                break
+            delta *= self.aspiration_growth
+            if score <= alpha:
+                alpha = score - delta if score != float("-inf") else score
+            else:
+                beta = score + delta if score != float("inf") else score
+
+        self.nodes_per_depth.append(self.nodes - start_nodes)
+        return score, move
+
+    def record_cutoff(self, game, move, depth, index):
+        """Report a move that caused an alpha-beta cutoff to the move ordering
+        stage (if any) so it is tried earlier at similar nodes.
+        """
+        if self.move_ordering is not None:
+            self.move_ordering.record_cutoff(game, move, depth, index)
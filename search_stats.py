@@ -0,0 +1,239 @@
+"""This file contains the statistics reported by `CustomPlayer` for every
+move it makes, and the hooks that receive them.
+
+After each call to `get_move()` the player's `stats` attribute holds a
+`SearchStats` object describing the search (depth reached, nodes per depth,
+leaf evaluations, cutoffs, transposition table hits, elapsed and remaining
+time), and every callable in the player's `stats_hooks` list is called with
+the player and the stats. `StatsTotals` is a hook that sums the stats of
+many moves, e.g., to compare the nodes per second of tournament agents.
+
+Players constructed with `profile=True` also split the search time between
+move generation, heuristic scoring, board copying and applying/undoing
+moves. Profiling times every call to these operations, so it slows the
+search down noticeably and is disabled by default.
+"""
+
+import timeit
+
+# Sections of the search timed by profiling
+MOVEGEN = "movegen"
+SCORING = "scoring"
+COPYING = "copying"
+MOVES = "moves"
+SECTIONS = (MOVEGEN, SCORING, COPYING, MOVES)
+
+
+class SearchStats(object):
+    """Statistics of the search for a single move.
+
+    Attributes
+    ----------
+    move : (int, int)
+        The move returned.
+
+    source : str
+        What chose the move: "search", "book", "endgame" or "none" (no
+        legal moves).
+
+    depth : int
+        The deepest search iteration completed (the fixed search depth
+        without iterative deepening).
+
+    nodes : int, nodes_per_depth : list<int>
+        The nodes visited in total and in each completed iteration.
+
+    leaf_evals : int
+        The number of heuristic (or tablebase) evaluations.
+
+    cutoffs : int
+        The number of alpha-beta cutoffs.
+
+    tt_probes, tt_hits : int
+        Transposition table lookups and the number that found an entry.
+
+    seconds : float
+        The time spent in `get_move()`.
+
+    time_left : float
+        The milliseconds left on the clock when the search stopped.
+
+    timings : dict<str, float> or None
+        The seconds spent in each of `SECTIONS` when profiling; time spent
+        in an operation called by another one (e.g., generating moves in the
+        heuristic) is only counted for the inner operation.
+    """
+    def __init__(self):
+        self.move = None
+        self.source = "search"
+        self.depth = 0
+        self.nodes = 0
+        self.nodes_per_depth = []
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.seconds = 0.
+        self.time_left = None
+        self.timings = None
+
+    @property
+    def nps(self):
+        """The number of nodes visited per second."""
+        return self.nodes / self.seconds if self.seconds else 0.
+
+    def as_dict(self):
+        """Return the stats as a dictionary of JSON-serializable values."""
+        stats = dict(self.__dict__)
+        stats["nps"] = self.nps
+        return stats
+
+
+class StatsTotals(object):
+    """Stats hook summing the stats of every move reported to it.
+
+    Attributes
+    ----------
+    moves, nodes, leaf_evals, cutoffs, tt_hits : int
+        Totals over the reported moves.
+
+    seconds : float
+        The total time spent choosing the moves.
+
+    max_depth : int
+        The deepest search iteration completed for any move.
+    """
+    def __init__(self):
+        self.moves = 0
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.tt_hits = 0
+        self.seconds = 0.
+        self.max_depth = 0
+
+    def __call__(self, player, stats):
+        self.moves += 1
+        self.nodes += stats.nodes
+        self.leaf_evals += stats.leaf_evals
+        self.cutoffs += stats.cutoffs
+        self.tt_hits += stats.tt_hits
+        self.seconds += stats.seconds
+        self.max_depth = max(self.max_depth, stats.depth)
+
+    @property
+    def nps(self):
+        """The number of nodes visited per second over every move."""
+        return self.nodes / self.seconds if self.seconds else 0.
+
+    def as_dict(self):
+        """Return the totals as a dictionary."""
+        return {"moves": self.moves, "nodes": self.nodes,
+                "leaf_evals": self.leaf_evals, "cutoffs": self.cutoffs,
+                "tt_hits": self.tt_hits, "seconds": self.seconds,
+                "max_depth": self.max_depth}
+
+
+class SectionTimer(object):
+    """Accumulate the exclusive time spent in nested sections of code."""
+    def __init__(self):
+        self.totals = dict.fromkeys(SECTIONS, 0.)
+        self.__stack__ = []
+        self.__mark__ = 0.
+
+    def start(self, section):
+        """Enter a section, pausing the enclosing one."""
+        now = timeit.default_timer()
+        if self.__stack__:
+            self.totals[self.__stack__[-1]] += now - self.__mark__
+        self.__stack__.append(section)
+        self.__mark__ = now
+
+    def stop(self):
+        """Leave the current section, resuming the enclosing one."""
+        now = timeit.default_timer()
+        self.totals[self.__stack__.pop()] += now - self.__mark__
+        self.__mark__ = now
+
+    def timed(self, section, function):
+        """Return a wrapper of `function` timed as `section`; the function
+        itself is kept as the `__wrapped__` attribute of the wrapper."""
+        def wrapper(*args, **kwargs):
+            self.start(section)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.stop()
+        wrapper.__wrapped__ = function
+        return wrapper
+
+
+class _ProfiledBoard(object):
+    """Board mixin timing move generation, copies and moves; the boards
+    it creates keep the mixin and share the timer. The profiled classes
+    are created at run time and cannot be pickled, so each one records the
+    board class it extends as `base_class`.
+    """
+    def get_legal_moves(self, player=None):
+        self.__timer__.start(MOVEGEN)
+        try:
+            return super(_ProfiledBoard, self).get_legal_moves(player)
+        finally:
+            self.__timer__.stop()
+
+    def copy(self):
+        self.__timer__.start(COPYING)
+        try:
+            new_board = super(_ProfiledBoard, self).copy()
+            new_board.__class__ = self.__class__
+            new_board.__timer__ = self.__timer__
+            return new_board
+        finally:
+            self.__timer__.stop()
+
+    def apply_move(self, move):
+        self.__timer__.start(MOVES)
+        try:
+            return super(_ProfiledBoard, self).apply_move(move)
+        finally:
+            self.__timer__.stop()
+
+    def push(self, move):
+        self.__timer__.start(MOVES)
+        try:
+            return super(_ProfiledBoard, self).push(move)
+        finally:
+            self.__timer__.stop()
+
+    def pop(self):
+        self.__timer__.start(MOVES)
+        try:
+            return super(_ProfiledBoard, self).pop()
+        finally:
+            self.__timer__.stop()
+
+
+# profiled subclass of each board class, created on first use
+_profiled_classes = {}
+
+
+def profiled_board(game, timer):
+    """Return a copy of `game` whose board operations are timed by `timer`.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The game state (an instance of any board class).
+
+    timer : SectionTimer
+        The timer of the current move.
+    """
+    board_class = type(game)
+    if board_class not in _profiled_classes:
+        _profiled_classes[board_class] = type("Profiled" + board_class.__name__,
+                                              (_ProfiledBoard, board_class),
+                                              {"base_class": board_class})
+    new_board = game.copy()
+    new_board.__class__ = _profiled_classes[board_class]
+    new_board.__timer__ = timer
+    return new_board
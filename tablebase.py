@@ -0,0 +1,308 @@
+"""This file contains the endgame tablebase: exact win/loss results for small
+Isolation positions computed offline by retrograde analysis, stored in a
+sorted binary file and probed by `CustomPlayer` during search.
+
+Only the cells that either player can still reach matter to the outcome of a
+position, so positions are keyed by a Zobrist hash of the reachable blank
+cells, the two player locations and the side to move (see `region_key()`).
+Positions that differ only in cells neither player can reach, or that are
+symmetric orientations of each other, share a key.
+
+Each board size has its own file, `tablebase_{width}x{height}.bin`:
+
+    header   magic b"ISTB", version, width, height, record count,
+             maximum reachable cells and maximum blank cells of any record
+    records  (key, result) sorted by key; the result byte holds the win flag
+             for the side to move in bit 7 and the number of plies until the
+             game ends with perfect play in bits 0-6
+
+The generator plays random games until the reachable region of a position is
+small enough, enumerates every position that can follow it, and solves them
+backwards from the terminal positions: a position is won if any move leads
+to a lost position, and lost once every move has been shown to lead to a won
+position.
+"""
+
+import heapq
+import mmap
+import os
+import random
+import struct
+import sys
+
+from isolation import BitBoard
+from isolation import Board
+
+MAGIC = b"ISTB"
+VERSION = 2
+HEADER = struct.Struct("<4sHBBIBB")
+RECORD = struct.Struct("<QB")
+
+
+def default_path(width, height):
+    """Return the file name of the tablebase for a board size."""
+    return "tablebase_{}x{}.bin".format(width, height)
+
+
+def reachable_region(game):
+    """Return the bitmask of the blank cells reachable by either player (read
+    from the regions maintained by the board, see
+    `Board.get_reachable_mask()`), or None if a player has not been placed
+    on the board yet."""
+    players = (game.__player_1__, game.__player_2__)
+    if any(game.get_player_location(player) is Board.NOT_MOVED for player in players):
+        return None
+    return game.get_reachable_mask(players[0]) | game.get_reachable_mask(players[1])
+
+
+def region_key(game, region=None):
+    """Return the tablebase key of a game state.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The game state.
+
+    region : int (optional)
+        The `reachable_region()` of the game state, if already known.
+
+    Returns
+    -------
+    (int, int) or None
+        The 64-bit key and the number of blank cells reachable by either
+        player, or None if a player has not been placed on the board yet.
+    """
+    if region is None:
+        region = reachable_region(game)
+        if region is None:
+            return None
+    geometry = game.__geometry__
+    width = game.width
+    cells = [row * width + col for row, col in
+             (game.get_player_location(player) for player in (game.__player_1__, game.__player_2__))]
+
+    # symmetric positions have the same result, so they share the smallest
+    # key over every orientation (the reachable cells take the blocked keys)
+    hashes = geometry.symmetric_hashes(region, cells[0], cells[1],
+                                       game.__player_symbols__[game.active_player] == 2)
+    return min(hashes), bin(region).count("1")
+
+
+class Tablebase(object):
+    """Read-only view of a tablebase file through a memory map.
+
+    Parameters
+    ----------
+    path : str
+        The tablebase file.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, self.count, self.max_cells, \
+            self.max_blanks = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} tablebase.".format(path, VERSION))
+        self.probes = 0
+        self.hits = 0
+
+    def __getstate__(self):
+        # memory maps cannot be pickled; other processes map the file again
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def close(self):
+        """Unmap the file."""
+        self.map.close()
+
+    def lookup(self, key):
+        """Return the result byte stored for a key, or None."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            stored, result = RECORD.unpack_from(self.map, HEADER.size + mid * RECORD.size)
+            if stored < key:
+                lo = mid + 1
+            elif stored > key:
+                hi = mid
+            else:
+                return result
+        return None
+
+    def prepare(self, game):
+        """Compute the reachable regions of the root board of a search, so
+        that every position searched from it (by copies or by push/pop)
+        updates them incrementally for `probe()`."""
+        reachable_region(game)
+
+    def probe(self, game):
+        """Look up the exact result of a game state.
+
+        Positions with more blank cells than any record, or with a larger
+        reachable region, are rejected before the key is computed; the
+        region is read from the regions maintained by the board, and the
+        symmetric hashes are only computed for regions small enough to be
+        in the tablebase.
+
+        Returns
+        -------
+        (bool, int) or None
+            Whether the active player wins with perfect play and the number of
+            plies until the game ends, or None if the position is not in the
+            tablebase.
+        """
+        if game.width * game.height - game.move_count > self.max_blanks or \
+                game.width != self.width or game.height != self.height:
+            return None
+        self.probes += 1
+        region = reachable_region(game)
+        if region is None or bin(region).count("1") > self.max_cells:
+            return None
+        result = self.lookup(region_key(game, region)[0])
+        if result is None:
+            return None
+        self.hits += 1
+        return bool(result & 0x80), result & 0x7F
+
+
+def solve_subtree(game, results, max_positions=None):
+    """Solve every position that can follow `game` by retrograde analysis,
+    adding the results to `results`.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The root position; both players must have been placed.
+
+    results : dict<int, (bool, int, int)>
+        Known results (win flag, plies to the end, blank cells) keyed by
+        `region_key()`; new positions are added in place.
+
+    max_positions : int (optional)
+        Abandon the subtree (returning False) if it has more positions.
+
+    Returns
+    -------
+    bool
+        True if the subtree was solved.
+    """
+    # enumerate the positions and the moves between them
+    blanks = game.width * game.height
+    successors = {}
+    predecessors = {}
+    root = region_key(game)[0]
+    stack = [(root, game)]
+    successors[root] = None
+    num_blanks = {root: blanks - game.move_count}
+    while stack:
+        key, position = stack.pop()
+        children = set()
+        for move in position.get_legal_moves():
+            child = position.forecast_move(move)
+            child_key = region_key(child)[0]
+            children.add(child_key)
+            predecessors.setdefault(child_key, []).append(key)
+            num_blanks[child_key] = max(num_blanks.get(child_key, 0), blanks - child.move_count)
+            if child_key not in successors:
+                successors[child_key] = None
+                if child_key not in results:
+                    stack.append((child_key, child))
+        successors[key] = children
+        if max_positions is not None and len(successors) > max_positions:
+            return False
+
+    # positions that were solved earlier act as terminal positions
+    remaining = {}
+    queue = []
+    for key, children in successors.items():
+        if key in results:
+            queue.append((results[key][1], key, results[key][0]))
+        elif not children:
+            results[key] = (False, 0, num_blanks[key])
+            queue.append((0, key, False))
+        else:
+            remaining[key] = len(children)
+    heapq.heapify(queue)
+
+    # propagate the results backwards in order of distance to the end, so
+    # that won positions take the shortest win and lost ones the longest loss
+    while queue:
+        distance, key, won = heapq.heappop(queue)
+        for parent in set(predecessors.get(key, ())):
+            if parent in results:
+                continue
+            if not won:
+                results[parent] = (True, distance + 1, num_blanks[parent])
+                heapq.heappush(queue, (distance + 1, parent, True))
+            else:
+                remaining[parent] -= 1
+                if not remaining[parent]:
+                    results[parent] = (False, distance + 1, num_blanks[parent])
+                    heapq.heappush(queue, (distance + 1, parent, False))
+    return True
+
+
+def generate(width, height, path=None, games=100, max_cells=16,
+             max_positions=200000, seed=0):
+    """Build the tablebase of a board size and write it to a file.
+
+    Parameters
+    ----------
+    width, height : int
+        The board size.
+
+    path : str (optional)
+        The output file; defaults to `default_path(width, height)`.
+
+    games : int (optional)
+        The number of random games used to find root positions.
+
+    max_cells : int (optional)
+        The largest reachable region (in blank cells) of a root position.
+
+    max_positions : int (optional)
+        The largest number of positions enumerated from one root position.
+
+    seed : int (optional)
+        The seed of the random games.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    rng = random.Random(seed)
+    results = {}
+    for _ in range(games):
+        game = BitBoard(1, 2, width=width, height=height)
+        while True:
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+            key = region_key(game)
+            if key is not None and key[1] <= max_cells:
+                if key[0] not in results:
+                    solve_subtree(game, results, max_positions)
+                break
+
+    path = default_path(width, height) if path is None else path
+    records = sorted(results.items())
+    max_blanks = max([blanks for _, (_, _, blanks) in records] or [0])
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, len(records),
+                            max_cells, max_blanks))
+        for key, (won, distance, _) in records:
+            f.write(RECORD.pack(key, (0x80 if won else 0) | distance))
+    os.replace(path + ".tmp", path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    # e.g. python tablebase.py 7 7 [games]
+    size = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (7, 7)
+    count = generate(*size, games=int(sys.argv[3]) if len(sys.argv) > 3 else 100)
+    print("Wrote {} positions to {}".format(count, default_path(*size)))
@@ -20,10 +20,23 @@ initiative in the second match with agentB at (5, 2) as player 1 and agentA at
 """
 
 import itertools
+import json
+import math
+import multiprocessing
+import os
+import pickle
+import queue
 import random
+import secrets
+import sys
+import threading
+import time
 import warnings
 
+from collections import deque
 from collections import namedtuple
+from multiprocessing.connection import Client
+from multiprocessing.connection import Listener
 
 from isolation import Board
 from sample_players import RandomPlayer
@@ -32,11 +45,25 @@ from sample_players import open_move_score
 from sample_players import improved_score
 from game_agent import CustomPlayer
 from game_agent import custom_score
+from heuristics import sweep
+from search_stats import StatsTotals
 
 NUM_MATCHES = 5  # number of matches against each opponent
 #I used the number 250 to test 1000 games per scoring funciton
 # NUM_MATCHES = 250  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+BOARD_CLASS = Board  # board engine used for matches (Board or BitBoard)
+PROCESSES = 1  # number of worker processes playing matches in parallel
+PIN_CPUS = False  # pin each worker process to its own core
+SEED = None  # base seed of the match openings (None for a random one)
+LOG_FILE = None  # JSON lines file recording every game (None to disable)
+COORDINATOR = None  # (host, port) or socket path to serve matches to workers
+# secret shared by the coordinator and its workers; without one the
+# coordinator generates a random key and prints it for the workers
+AUTHKEY = os.environ.get("TOURNAMENT_AUTHKEY", "").encode() or None
+LEASE_TIMEOUT = 120.  # seconds before the match of a silent worker is re-queued
+WORKER_LINGER = 60.  # seconds a worker waits for the next coordinator
+SWEEP_GRID = None  # {feature: [weights]} of compiled heuristics evaluated by main_mine
 
 TIMEOUT_WARNING = "One or more agents lost a match this round due to " + \
                   "timeout. The get_move() function must return before " + \
@@ -58,28 +85,63 @@ same opponents.
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# A match to play: the id of the match, the index of the opponent in the
+# round, the indexes of the agents playing first and second, the seed of the
+# opening moves, and the numbers of the games of the match to play (game 1
+# is played with the agents swapped)
+Match = namedtuple("Match", ["match_id", "opponent", "player_1", "player_2", "seed", "games"],
+                   defaults=((0, 1),))
 
-def play_match(player1, player2):
+
+def play_match(player1, player2, seed=None, records=None, games=(0, 1)):
     """
     Play a "fair" set of matches between two agents by playing two games
     between the players, forcing each agent to play from randomly selected
     positions. This should control for differences in outcome resulting from
     advantage due to starting position on the board.
+
+    The opening moves are drawn from `random.Random(seed)` when a seed is
+    given, so the same seed always produces the same opening, and only the
+    games numbered in `games` are played (game 0 with `player1` first, game
+    1 with `player2` first). When a `records` list is given, a dictionary
+    describing each game (opening moves, winner, termination, plies,
+    per-move times and the search totals of each player that reports
+    `SearchStats`) is appended to it.
     """
+    rng = random if seed is None else random.Random(seed)
     num_wins = {player1: 0, player2: 0}
     num_timeouts = {player1: 0, player2: 0}
     num_invalid_moves = {player1: 0, player2: 0}
-    games = [Board(player1, player2), Board(player2, player1)]
+    boards = [BOARD_CLASS(player1, player2), BOARD_CLASS(player2, player1)]
 
     # initialize both games with a random move and response
+    opening = []
     for _ in range(2):
-        move = random.choice(games[0].get_legal_moves())
-        games[0].apply_move(move)
-        games[1].apply_move(move)
+        move = rng.choice(boards[0].get_legal_moves())
+        boards[0].apply_move(move)
+        boards[1].apply_move(move)
+        opening.append(move)
 
-    # play both games and tally the results
-    for game in games:
-        winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    # play the games and tally the results
+    for game in [boards[number] for number in games]:
+        players = [game.__player_1__, game.__player_2__]
+        totals = [StatsTotals() if hasattr(player, "stats_hooks") else None for player in players]
+        for player, hook in zip(players, totals):
+            if hook is not None:
+                player.stats_hooks.append(hook)
+        try:
+            winner, _, termination = game.play(time_limit=TIME_LIMIT)
+        finally:
+            for player, hook in zip(players, totals):
+                if hook is not None:
+                    player.stats_hooks.remove(hook)
+        if records is not None:
+            records.append({"opening": opening,
+                            "winner": 1 if winner == game.__player_1__ else 2,
+                            "termination": termination,
+                            "plies": game.move_count,
+                            "move_times": [round(ms, 3) for ms in game.move_times],
+                            "search": [hook and hook.as_dict() for hook in totals]})
 
         if player1 == winner:
             num_wins[player1] += 1
@@ -104,9 +166,683 @@ def play_match(player1, player2):
     return num_wins[player1], num_wins[player2]
 
 
-def play_round(agents, num_matches):
+def schedule_round(agents, num_matches, seed=None, round_id=""):
+    """
+    Return the matches of one round in the order they are played serially,
+    each with a deterministic seed derived from the base seed and its id.
+    Match ids are prefixed with `round_id` so that several rounds can share
+    a results log.
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    last = len(agents) - 1
+    matches = []
+    for idx in range(last):
+        # Each player takes a turn going first
+        for order, (p1, p2) in enumerate(itertools.permutations((last, idx))):
+            for number in range(num_matches):
+                match_id = "{}/{}-{}-{}".format(round_id, idx, order, number)
+                matches.append(Match(match_id, idx, p1, p2, "{}:{}".format(seed, match_id)))
+    return matches
+
+
+# per-process state of the match workers: the players of the last match
+# played and the key of the batch they were sent with
+_players = None
+_players_key = None
+
+
+def _init_match_worker(counter, pin_cpus):
+    """
+    Pool initializer: optionally pin the worker process to a single core.
+    """
+    if pin_cpus:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        _pin_to_cpu(index)
+
+
+def _pin_to_cpu(index):
+    """ Pin this process to the index-th core it may run on (wrapping
+    around), where the platform supports it. """
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+
+
+def _play_pooled_match(match, key, players):
+    """ Play a match in a worker process of a `MatchPool`, where `players` is
+    the pickled list of players (or function returning it) of the batch
+    identified by `key`; it is only unpickled for the first match of each
+    batch played by the worker. """
+    global _players, _players_key
+    if key != _players_key:
+        _players = pickle.loads(players)
+        if callable(_players):
+            _players = _players()
+        _players_key = key
+    return _play_scheduled_match(match, _players)
+
+
+def _play_scheduled_match(match, players):
+    """ Play the games of a scheduled match, returning the scores and the
+    records of the games. """
+    records = []
+    score_1, score_2 = play_match(players[match.player_1], players[match.player_2], match.seed,
+                                  records, match.games)
+    # the second game is played with the agents swapped
+    for index, (game, record) in enumerate(zip(match.games, records)):
+        order = [match.player_1, match.player_2] if game == 0 else [match.player_2, match.player_1]
+        records[index] = dict(match_id=match.match_id, game=game, seed=match.seed,
+                             agents=None, players=order, opening=record["opening"],
+                             winner=order[record["winner"] - 1],
+                             termination=record["termination"], plies=record["plies"],
+                             move_times=record["move_times"], search=record["search"])
+    return match, score_1, score_2, records
+
+
+def play_matches(agents, matches, processes=1, pin_cpus=False, coordinator=None):
+    """
+    Play scheduled matches, yielding (match, score_1, score_2, records) in
+    schedule order, where records describe each game of the match (see
+    `play_match()`) with the agents identified by their name and their index
+    in `agents`.
+
+    Parameters
+    ----------
+    agents : list<Agent>
+        The agents referred to by the matches.
+
+    matches : list<Match>
+        The matches to play (see `schedule_round()`).
+
+    processes : int (optional)
+        The number of worker processes; 1 plays the matches in this process.
+
+    pin_cpus : bool (optional)
+        Flag indicating whether to pin each worker process to its own core
+        so that the timed turns of concurrent games do not contend.
+
+    coordinator : tuple or str (optional)
+        The (host, port) or Unix socket path on which to serve the matches to
+        workers started with `run_worker()`, instead of playing them here
+        (see `MatchCoordinator`).
+    """
+    with MatchPool(processes, pin_cpus, coordinator) as pool:
+        for result in pool.imap([agent.player for agent in agents], matches):
+            _name_records(agents, result[3])
+            yield result
+
+
+def _name_records(agents, records):
+    """ Add the names of the agents to the records of the games of a match. """
+    for record in records:
+        record["agents"] = [agents[index].name for index in record["players"]]
+
+
+class MatchPool(object):
+    """
+    A long-lived set of match workers: worker processes on this host, the
+    workers connected to a `MatchCoordinator`, or this process alone.
+
+    A pool plays any number of batches of matches (e.g., the batches of an
+    SPRT or the iterations of a tuning run) without restarting its workers.
+    The players of a batch are pickled once and unpickled once by each
+    worker process. Matches are submitted lazily, at most `window` at a
+    time, so a caller that stops iterating early (e.g., an SPRT that has
+    accepted a hypothesis) does not play the rest; the matches already
+    submitted to worker processes are finished before the batch returns.
+
+    Parameters
+    ----------
+    processes, pin_cpus, coordinator : (optional)
+        See `play_matches()`.
+    """
+    def __init__(self, processes=1, pin_cpus=False, coordinator=None):
+        self.coordinator = None
+        self.pool = None
+        self.__key__ = 0
+        if coordinator is not None:
+            self.coordinator = MatchCoordinator([], [], coordinator)
+        elif processes > 1:
+            counter = multiprocessing.Value('i', 0)
+            self.pool = multiprocessing.Pool(processes, _init_match_worker, (counter, pin_cpus))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop the workers (or the coordinator). """
+        if self.coordinator is not None:
+            self.coordinator.close()
+            self.coordinator = None
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def imap(self, players, matches, window=None):
+        """
+        Play a batch of matches, yielding (match, score_1, score_2, records)
+        in the order of `matches` (see `play_matches()`).
+
+        Parameters
+        ----------
+        players : list<object> or callable
+            The players referred to by the matches, or a picklable function
+            returning them (called once per worker process).
+
+        matches : iterable<Match>
+            The matches to play.
+
+        window : int (optional)
+            The maximum number of matches submitted but not yet returned;
+            None submits every match at once.
+        """
+        return self.__play__(players, matches, window, True)
+
+    def imap_unordered(self, players, matches, window=None):
+        """ Play a batch of matches like `imap()`, yielding each match as
+        soon as it completes. """
+        return self.__play__(players, matches, window, False)
+
+    def __play__(self, players, matches, window, ordered):
+        if self.pool is None and self.coordinator is None:
+            players = players() if callable(players) else players
+            for match in matches:
+                yield _play_scheduled_match(match, players)
+            return
+
+        if self.pool is not None:
+            self.__key__ += 1
+            key, data = self.__key__, pickle.dumps(players)
+            finished = queue.Queue()
+
+            def submit(index, match):
+                self.pool.apply_async(_play_pooled_match, (match, key, data),
+                                      callback=lambda result: finished.put((index, result, None)),
+                                      error_callback=lambda error: finished.put((index, None, error)))
+
+            def wait():
+                index, result, error = finished.get()
+                if error is not None:
+                    raise error
+                return index, result
+
+            def cancel():
+                # a started match cannot be withdrawn from the pool: wait for
+                # the submitted matches, so that they do not compete with the
+                # next batch for the cores, and so that no worker is
+                # returning a result when the pool is terminated (a worker
+                # killed while returning a result makes the pool hang)
+                for _ in range(in_flight):
+                    finished.get()
+        else:
+            coordinator = self.coordinator
+            players = players() if callable(players) else players
+            jobs = {}
+
+            def submit(index, match):
+                jobs[coordinator.submit([match], players)[0]] = index
+
+            def wait():
+                job, result = coordinator.wait(list(jobs))
+                return jobs.pop(job), result
+
+            def cancel():
+                coordinator.cancel(list(jobs))
+
+        matches = iter(matches)
+        submitted = in_flight = returned = 0
+        buffered = {}
+        try:
+            while True:
+                while window is None or in_flight < window:
+                    match = next(matches, None)
+                    if match is None:
+                        break
+                    submit(submitted, match)
+                    submitted += 1
+                    in_flight += 1
+                if not in_flight:
+                    return
+                # counted first, as a failed match raises in wait()
+                in_flight -= 1
+                index, result = wait()
+                if not ordered:
+                    yield result
+                    continue
+                buffered[index] = result
+                while returned in buffered:
+                    yield buffered.pop(returned)
+                    returned += 1
+        finally:
+            cancel()
+
+
+class MatchCoordinator(object):
+    """
+    Serve matches to worker processes (see `run_worker()`) over a socket and
+    collect their results.
+
+    Workers connect, ask for a match, and receive its specification: the
+    match (whose seed fixes the opening) and the two players. They keep no
+    state between matches, so any number of workers on any number of hosts
+    can join or leave at any time. Each match handed out is leased to its
+    worker: when the worker disconnects, or does not return the result
+    before the lease expires, the match is queued again for another worker
+    (and only the first result returned for a match is kept).
+
+    Parameters
+    ----------
+    players : list<object>
+        The players referred to by the matches.
+
+    matches : list<Match>
+        The matches to serve.
+
+    address : tuple or str
+        The (host, port) to listen on (port 0 picks a free port), or the path
+        of a Unix socket. An empty host listens on localhost only; remote
+        workers need an explicit host such as "0.0.0.0".
+
+    authkey : bytes (optional)
+        The secret shared with the workers; connections are authenticated
+        before any message is unpickled, so anyone knowing the key can run
+        code in this process. Defaults to `AUTHKEY`, or to a random key
+        generated once per process and printed (see `session_authkey()`).
+
+    lease_timeout : float (optional)
+        The number of seconds a worker may spend on a match; it must exceed
+        the duration of the longest match.
+    """
+    def __init__(self, players, matches, address, authkey=AUTHKEY, lease_timeout=LEASE_TIMEOUT):
+        self.players = players
+        self.matches = []
+        self.authkey = authkey if authkey is not None else session_authkey()
+        self.lease_timeout = lease_timeout
+        self.requeued = 0
+        self.closed = False
+        self.__pending__ = deque()
+        self.__job_players__ = []
+        self.__leases__ = {}
+        self.__results__ = {}
+        self.__condition__ = threading.Condition()
+        self.submit(matches)
+        if isinstance(address, tuple) and not address[0]:
+            address = ("localhost",) + tuple(address[1:])
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.__thread__ = threading.Thread(target=self.__accept__, daemon=True)
+        self.__thread__.start()
+
+    def __accept__(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                if self.closed:
+                    return
+                continue
+            if self.closed:
+                conn.close()
+                return
+            threading.Thread(target=self.__serve__, args=(conn,), daemon=True).start()
+
+    def __serve__(self, conn):
+        leased = set()
+        try:
+            with conn:
+                while True:
+                    message = conn.recv()
+                    if message[0] == "result":
+                        self.__finish__(message[1], message[2:])
+                        leased.discard(message[1])
+                    reply = self.__next_job__()
+                    if reply[0] == "job":
+                        leased.add(reply[1])
+                    conn.send(reply)
+                    if reply[0] == "done":
+                        return
+        except (EOFError, OSError):
+            # the worker is gone, so its matches need not wait for the lease
+            with self.__condition__:
+                for job in leased:
+                    if self.__leases__.pop(job, None) is not None:
+                        self.__pending__.appendleft(job)
+                        self.requeued += 1
+
+    def __next_job__(self):
+        """ Lease the next match to a worker, returning the message to send. """
+        with self.__condition__:
+            now = time.time()
+            for job, deadline in list(self.__leases__.items()):
+                if deadline <= now:
+                    del self.__leases__[job]
+                    # earlier matches first, as results are consumed in order
+                    self.__pending__.appendleft(job)
+                    self.requeued += 1
+            while self.__pending__:
+                job = self.__pending__.popleft()
+                if job in self.__results__:
+                    continue
+                self.__leases__[job] = now + self.lease_timeout
+                match = self.matches[job]
+                players = {index: self.__job_players__[job][index]
+                           for index in (match.player_1, match.player_2)}
+                return ("job", job, tuple(match), players)
+            if len(self.__results__) == len(self.matches):
+                return ("done",)
+            # every remaining match is leased; ask again in case a lease expires
+            return ("wait", min(1., self.lease_timeout / 2))
+
+    def __finish__(self, job, result):
+        with self.__condition__:
+            self.__leases__.pop(job, None)
+            if job not in self.__results__:
+                self.__results__[job] = result
+                self.__condition__.notify_all()
+
+    def submit(self, matches, players=None):
+        """ Queue more matches, played by `players` (by default the players
+        given to the constructor), returning their job numbers. """
+        players = self.players if players is None else players
+        with self.__condition__:
+            jobs = list(range(len(self.matches), len(self.matches) + len(matches)))
+            self.matches.extend(matches)
+            self.__job_players__.extend([players] * len(matches))
+            self.__pending__.extend(jobs)
+        return jobs
+
+    def cancel(self, jobs):
+        """ Stop serving the given jobs; results returned for them later are
+        ignored. """
+        with self.__condition__:
+            for job in jobs:
+                self.__leases__.pop(job, None)
+                self.__results__.setdefault(job, None)
+            self.__condition__.notify_all()
+
+    def wait(self, jobs):
+        """ Wait until one of `jobs` is played, returning the job and its
+        (match, score_1, score_2, records). """
+        with self.__condition__:
+            while True:
+                for job in jobs:
+                    if self.__results__.get(job) is not None:
+                        score_1, score_2, records = self.__results__[job]
+                        return job, (self.matches[job], score_1, score_2, records)
+                self.__condition__.wait()
+
+    def results(self):
+        """ Yield (match, score_1, score_2, records) for every match in
+        schedule order, waiting for the workers to play them. """
+        for job in range(len(self.matches)):
+            yield self.wait([job])[1]
+
+    def close(self):
+        """ Stop accepting workers and release the socket. """
+        if self.closed:
+            return
+        self.closed = True
+        # wake up the thread blocked accepting connections
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+        self.__thread__.join()
+        self.listener.close()
+
+
+_session_authkey = None
+
+
+def session_authkey():
+    """ Return the random key authenticating the workers of the coordinators
+    started without a key, generated and printed on first use, so that the
+    workers of every round of this process can use the same key. """
+    global _session_authkey
+    if _session_authkey is None:
+        _session_authkey = secrets.token_hex(16).encode()
+        print("Coordinator key (start workers with TOURNAMENT_AUTHKEY={})".format(
+            _session_authkey.decode()))
+    return _session_authkey
+
+
+def run_worker(address, authkey=AUTHKEY, cpu=None, linger=WORKER_LINGER):
+    """
+    Play matches served by a `MatchCoordinator` until no match has been
+    served for `linger` seconds, so that one worker can serve the
+    coordinators of consecutive rounds.
+
+    Parameters
+    ----------
+    address : tuple or str
+        The (host, port) or Unix socket path of the coordinator.
+
+    authkey : bytes
+        The secret shared with the coordinator; defaults to `AUTHKEY` (the
+        TOURNAMENT_AUTHKEY environment variable), which must be set.
+
+    cpu : int (optional)
+        Pin the worker to this core (an index into the cores it may run on).
+
+    linger : float (optional)
+        The number of seconds to keep asking for matches after the last one.
+
+    Returns
+    ----------
+    int
+        The number of matches played.
+    """
+    if authkey is None:
+        raise ValueError("The key of the coordinator is required (set TOURNAMENT_AUTHKEY).")
+    if cpu is not None:
+        _pin_to_cpu(cpu)
+    played = 0
+    last_played = time.time()
+    while True:
+        try:
+            with Client(address, authkey=authkey) as conn:
+                message = ("ready",)
+                while True:
+                    conn.send(message)
+                    reply = conn.recv()
+                    if reply[0] == "job":
+                        _, job, match, players = reply
+                        _, score_1, score_2, records = _play_scheduled_match(Match(*match), players)
+                        message = ("result", job, score_1, score_2, records)
+                        played += 1
+                        last_played = time.time()
+                    elif reply[0] == "wait":
+                        time.sleep(reply[1])
+                        message = ("ready",)
+                    else:
+                        break
+        except (EOFError, OSError):
+            pass
+        if time.time() - last_played >= linger:
+            return played
+        time.sleep(.5)
+
+
+def _parse_address(text):
+    """ Parse a "host:port" address, or return a Unix socket path as is. """
+    host, _, port = text.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else text
+
+
+def main_worker(args):
+    """ Start worker processes, each pinned to its own core, that play the
+    matches of the coordinator at args[0] ("host:port" or a socket path);
+    args[1] is the number of workers (default: one per core). The key of the
+    coordinator is read from the TOURNAMENT_AUTHKEY environment variable. """
+    if AUTHKEY is None:
+        sys.exit("Set TOURNAMENT_AUTHKEY to the key printed by the coordinator.")
+    address = _parse_address(args[0])
+    if len(args) > 1:
+        processes = int(args[1])
+    elif hasattr(os, "sched_getaffinity"):
+        processes = len(os.sched_getaffinity(0))
+    else:
+        processes = os.cpu_count()
+    workers = [multiprocessing.Process(target=run_worker, args=(address, AUTHKEY, cpu))
+               for cpu in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def read_log(path):
+    """
+    Yield the game records stored in a results log one at a time; a missing
+    file has no records, and a partially written last line is ignored.
+    """
+    if path is None or not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize_log(path):
+    """
+    Compute the results of every agent in a results log, streaming over the
+    records rather than loading the whole file.
+
+    Returns
+    ----------
+    dict<str, dict>
+        For each agent name, the number of games played, games won, games
+        lost by timeout, moves made and total milliseconds spent on them,
+        and the nodes searched and seconds spent searching (for agents that
+        report search stats).
+    """
+    summary = {}
+    for record in read_log(path):
+        names = record["agents"]
+        for number, name in enumerate(names):
+            stats = summary.setdefault(name, {"games": 0, "wins": 0, "timeouts": 0,
+                                              "moves": 0, "move_ms": 0.,
+                                              "nodes": 0, "search_seconds": 0.})
+            stats["games"] += 1
+            if record["players"][number] == record["winner"]:
+                stats["wins"] += 1
+            elif record["termination"] == "timeout":
+                stats["timeouts"] += 1
+            # the agents alternate moves, starting with the first player
+            times = record["move_times"][number::2]
+            stats["moves"] += len(times)
+            stats["move_ms"] += sum(times)
+            search = record.get("search", [None, None])[number]
+            if search is not None:
+                stats["nodes"] += search["nodes"]
+                stats["search_seconds"] += search["seconds"]
+    return summary
+
+
+def print_log_summary(path):
+    """ Print a table of the results of every agent in a results log. """
+    print("{:<15}{:>8}{:>8}{:>9}{:>10}{:>12}{:>10}".format(
+        "Agent", "Games", "Wins", "Win %", "Timeouts", "ms / move", "kN / s"))
+    for name, stats in sorted(summarize_log(path).items()):
+        print("{!s:<15}{:>8}{:>8}{:>8.2f}%{:>10}{:>12.2f}{:>10.1f}".format(
+            name, stats["games"], stats["wins"], 100. * stats["wins"] / stats["games"],
+            stats["timeouts"], stats["move_ms"] / stats["moves"] if stats["moves"] else 0.,
+            stats["nodes"] / stats["search_seconds"] / 1000. if stats["search_seconds"] else 0.))
+
+
+def _logged_seed(log):
+    """ Return the base seed of the matches in a results log (so that an
+    interrupted run resumes with the same openings), or None. """
+    for record in read_log(log):
+        return record["seed"].rsplit(":", 1)[0]
+    return None
+
+
+def _round_results(agents, matches, pool, log, ordered=True, window=None):
+    """
+    Yield (match, score_1, score_2) for the matches of a round, taking the
+    games already recorded in the log from the log and playing every other
+    game on its own with a `MatchPool`, appending it to the log as soon as
+    it completes.
+
+    The matches are yielded in schedule order, or when `ordered` is False,
+    the recorded matches first and then the others as their last game
+    completes, with the games of at most `window` matches played at a time
+    (see `MatchPool.imap()`).
+    """
+    matches = list(matches)
+    winners = {match.match_id: {} for match in matches}
+    for record in read_log(log):
+        if record["match_id"] in winners:
+            winners[record["match_id"]][record["game"]] = record["winner"]
+
+    def complete(match):
+        return len(winners[match.match_id]) == len(match.games)
+
+    def result(match):
+        games = list(winners[match.match_id].values())
+        return match, games.count(match.player_1), games.count(match.player_2)
+
+    pending = [match._replace(games=(game,)) for match in matches for game in match.games
+               if game not in winners[match.match_id]]
+    players = [agent.player for agent in agents]
+    # the games are taken as they complete, so that none waits for the
+    # games before it to be recorded
+    played = pool.imap_unordered(players, pending, None if window is None else 2 * window)
+    scheduled = {match.match_id: match for match in matches}
+    # the matches still to yield in schedule order
+    upcoming = deque(matches if ordered else [])
+    log_file = open(log, "a") if log is not None else None
+    try:
+        if not ordered:
+            # the recorded matches come first
+            for match in matches:
+                if complete(match):
+                    yield result(match)
+        while True:
+            while upcoming and complete(upcoming[0]):
+                yield result(upcoming.popleft())
+            game_match, _, _, records = next(played, (None, None, None, None))
+            if game_match is None:
+                return
+            _name_records(agents, records)
+            if log_file is not None:
+                for record in records:
+                    log_file.write(json.dumps(record) + "\n")
+                log_file.flush()
+            match = scheduled[game_match.match_id]
+            for record in records:
+                winners[match.match_id][record["game"]] = record["winner"]
+            if not ordered and complete(match):
+                yield result(match)
+    finally:
+        played.close()
+        if log_file is not None:
+            log_file.close()
+
+
+def play_round(agents, num_matches, processes=PROCESSES, seed=SEED,
+               pin_cpus=PIN_CPUS, log=LOG_FILE, round_id="", coordinator=COORDINATOR):
     """
     Play one round (i.e., a single match between each pair of opponents)
+
+    When a results log is given, every game is appended to it as soon as it
+    completes, and games already in the log are not played again;
+    resuming a round requires the same seed (by default the seed recorded in
+    the log is reused) and round id.
+
+    When a coordinator address is given, the matches are played by workers
+    connected to it (see `MatchCoordinator` and `run_worker()`).
     """
     agent_1 = agents[-1]
     wins = 0.
@@ -115,28 +851,169 @@ def play_round(agents, num_matches):
     print("\nPlaying Matches:")
     print("----------")
 
-    for idx, agent_2 in enumerate(agents[:-1]):
+    if seed is None:
+        seed = _logged_seed(log)
+    matches = schedule_round(agents, num_matches, seed, round_id)
+    with MatchPool(processes, pin_cpus, coordinator) as pool:
+        results = _round_results(agents, matches, pool, log)
+        for idx, agent_2 in enumerate(agents[:-1]):
 
-        counts = {agent_1.player: 0., agent_2.player: 0.}
-        names = [agent_1.name, agent_2.name]
-        print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
+            counts = {agent_1.player: 0., agent_2.player: 0.}
+            names = [agent_1.name, agent_2.name]
+            print("  Match {}: {!s:^11} vs {!s:^11}".format(idx + 1, *names), end=' ')
 
-        # Each player takes a turn going first
-        for p1, p2 in itertools.permutations((agent_1.player, agent_2.player)):
-            for _ in range(num_matches):
-                score_1, score_2 = play_match(p1, p2)
-                counts[p1] += score_1
-                counts[p2] += score_2
+            # Each player takes a turn going first
+            for _ in range(2 * num_matches):
+                match, score_1, score_2 = next(results)
+                counts[agents[match.player_1].player] += score_1
+                counts[agents[match.player_2].player] += score_2
                 total += score_1 + score_2
 
-        wins += counts[agent_1.player]
+            wins += counts[agent_1.player]
 
-        print("\tResult: {} to {}".format(int(counts[agent_1.player]),
-                                          int(counts[agent_2.player])))
+            print("\tResult: {} to {}".format(int(counts[agent_1.player]),
+                                              int(counts[agent_2.player])))
+        results.close()
 
     return 100. * wins / total
 
 
+def elo_to_score(elo):
+    """ Return the expected score of a player with an Elo advantage. """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """ Return the Elo advantage of a player with an expected score. """
+    return -400. * math.log10(1. / score - 1.)
+
+
+def sprt_stats(pair_counts, elo0, elo1):
+    """
+    Compute the log-likelihood ratio of H1 (Elo difference elo1) against H0
+    (Elo difference elo0) and the Elo estimate from the results of paired,
+    color-swapped games, using the normal approximation of the generalized
+    SPRT.
+
+    Parameters
+    ----------
+    pair_counts : list<int>
+        The number of pairs the candidate scored 0, 1 and 2 wins in.
+
+    Returns
+    ----------
+    (float, float, float)
+        The log-likelihood ratio, the Elo estimate and its 95% error bar.
+    """
+    # a small pseudo-count keeps the variance positive while every pair
+    # has had the same outcome
+    counts = [count + 1e-3 for count in pair_counts]
+    num_pairs = sum(counts)
+    scores = (0., .5, 1.)
+    mean = sum(count * score for count, score in zip(counts, scores)) / num_pairs
+    variance = sum(count * (score - mean) ** 2 for count, score in zip(counts, scores)) / num_pairs
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    llr = num_pairs * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+    margin = 1.96 * math.sqrt(variance / num_pairs)
+    clamp = lambda score: min(max(score, 1e-6), 1 - 1e-6)
+    elo = score_to_elo(clamp(mean))
+    error = (score_to_elo(clamp(mean + margin)) - score_to_elo(clamp(mean - margin))) / 2
+    return llr, elo, error
+
+
+def sprt(candidate, baseline, elo0=0., elo1=20., alpha=.05, beta=.05,
+         batch=10, max_matches=1000, processes=PROCESSES, seed=SEED,
+         pin_cpus=PIN_CPUS, log=LOG_FILE, coordinator=COORDINATOR):
+    """
+    Compare a candidate agent to a baseline agent with a sequential
+    probability ratio test, playing matches (pairs of games from the same
+    opening with the agents swapped, see `play_match()`) until the test
+    accepts one of the hypotheses.
+
+    The matches are streamed to a single `MatchPool` for the whole test and
+    counted as they complete; the test is checked after every `batch`
+    matches, and no further match is started once it accepts a hypothesis.
+
+    Parameters
+    ----------
+    candidate, baseline : Agent
+        The agents to compare.
+
+    elo0, elo1 : float (optional)
+        The Elo difference of the candidate under H0 and H1.
+
+    alpha, beta : float (optional)
+        The false positive and false negative rates of the test.
+
+    batch : int (optional)
+        The number of matches played between checks of the test, which is
+        also the number of matches played at the same time (at least one
+        per worker process).
+
+    max_matches : int (optional)
+        The number of matches after which the test stops inconclusively.
+
+    processes, seed, pin_cpus, log, coordinator : (optional)
+        See `play_round()`; matches are recorded under the round id "sprt".
+
+    Returns
+    ----------
+    dict
+        The accepted hypothesis ("H0", "H1" or None), the log-likelihood
+        ratio and its bounds, the number of matches, the candidate's wins
+        and losses, and the Elo estimate with its 95% error bar.
+    """
+    lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+    agents = [baseline, candidate]
+    if seed is None:
+        seed = _logged_seed(log)
+    if seed is None:
+        seed = random.getrandbits(32)
+    matches = [Match("sprt/{}".format(number), 0, 1, 0, "{}:sprt/{}".format(seed, number))
+               for number in range(max_matches)]
+    pair_counts = [0, 0, 0]
+    llr = elo = error = 0.
+    result = None
+    num_matches = 0
+    with MatchPool(processes, pin_cpus, coordinator) as pool:
+        results = _round_results(agents, matches, pool, log, ordered=False,
+                                 window=max(batch, processes))
+        for _, score_1, _ in results:
+            pair_counts[int(score_1)] += 1
+            num_matches += 1
+            if num_matches % batch and num_matches < max_matches:
+                continue
+            llr, elo, error = sprt_stats(pair_counts, elo0, elo1)
+            if llr >= upper:
+                result = "H1"
+            elif llr <= lower:
+                result = "H0"
+            if result is not None:
+                break
+        results.close()
+
+    wins = pair_counts[1] + 2 * pair_counts[2]
+    return {"result": result, "llr": llr, "bounds": (lower, upper),
+            "matches": num_matches, "wins": wins, "losses": 2 * num_matches - wins,
+            "elo": elo, "elo_error": error}
+
+
+def main_sprt():
+    """ Test whether the custom heuristic is stronger than the improved
+    heuristic, stopping as soon as the result is statistically clear. """
+    CUSTOM_ARGS = {"method": 'alphabeta', 'iterative': True}
+    elo0, elo1 = 0., 20.
+    candidate = Agent(CustomPlayer(score_fn=custom_score, **CUSTOM_ARGS), "Student")
+    baseline = Agent(CustomPlayer(score_fn=improved_score, **CUSTOM_ARGS), "ID_Improved")
+    result = sprt(candidate, baseline, elo0, elo1)
+    print("SPRT [{}, {}]: {} after {} matches (LLR {:.2f}, bounds {:.2f} to {:.2f})".format(
+        elo0, elo1, result["result"] or "inconclusive", result["matches"], result["llr"],
+        *result["bounds"]))
+    print("Elo: {:+.1f} +/- {:.1f} ({} wins, {} losses)".format(
+        result["elo"], result["elo_error"], result["wins"], result["losses"]))
+
+
 def main():
 
     HEURISTICS = [("Null", null_score),
@@ -173,12 +1050,16 @@ def main():
         print("*************************")
 
         agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        win_ratio = play_round(agents, NUM_MATCHES, round_id=agentUT.name)
 
         print("\n\nResults:")
         print("----------")
         print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
 
+    if LOG_FILE is not None:
+        print("\nAll games in {}:".format(LOG_FILE))
+        print_log_summary(LOG_FILE)
+
 #I used this function to test several heuristic functions at the same time.  The regular version is above
 def main_mine():
 
@@ -229,20 +1110,35 @@ def main_mine():
         Agent(CustomPlayer(score_fn=custom_score_divide_own_by_opponent, **CUSTOM_ARGS), "Student"),
         Agent(CustomPlayer(score_fn=custom_score_diff_in_free_percent_of_board, **CUSTOM_ARGS), "Student")
     ]
+    if SWEEP_GRID is not None:
+        # every weighting of the grid, e.g. {"own_moves": [1.],
+        # "opp_moves": [-1., -2.], "opp_area": [0., -.5]} (see heuristics)
+        test_agents = test_agents[:1] + [Agent(CustomPlayer(score_fn=h, **CUSTOM_ARGS), h.name)
+                                         for h in sweep(SWEEP_GRID)]
 
     print(DESCRIPTION)
-    for agentUT in test_agents:
+    for round_number, agentUT in enumerate(test_agents):
         print("")
         print("*************************")
         print("{:^25}".format("Evaluating: " + agentUT.name))
         print("*************************")
 
         agents = random_agents + mm_agents + ab_agents + [agentUT]
-        win_ratio = play_round(agents, NUM_MATCHES)
+        # several agents share a name, so rounds are identified by number
+        win_ratio = play_round(agents, NUM_MATCHES, round_id=round_number)
 
         print("\n\nResults:")
         print("----------")
         print("{!s:<15}{:>10.2f}%".format(agentUT.name, win_ratio))
 
+    if LOG_FILE is not None:
+        print("\nAll games in {}:".format(LOG_FILE))
+        print_log_summary(LOG_FILE)
+
 if __name__ == "__main__":
-    main_mine()
+    # TOURNAMENT_AUTHKEY=KEY python tournament.py worker HOST:PORT [processes]
+    # to join a coordinator
+    if sys.argv[1:2] == ["worker"]:
+        main_worker(sys.argv[2:])
+    else:
+        main_mine()
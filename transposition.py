@@ -0,0 +1,291 @@
+"""This file contains the transposition table used by `CustomPlayer` to
+remember the results of previous searches.
+
+Search results are keyed by the Zobrist hash of the position (`Board.hash`)
+and record the remaining search depth, the score, whether the score is exact
+or only a lower/upper bound, and the best move found. The table has a fixed
+number of two-slot buckets: the first slot keeps the deepest result seen for
+the bucket (depth-preferred), and the second slot always takes the most
+recent result (always-replace).
+
+`SharedTranspositionTable` provides the same interface for tables shared by
+several processes through a shared memory block.
+"""
+
+import struct
+
+from multiprocessing import shared_memory
+
+# Bound types for stored scores
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Approximate size of one stored entry (tuple, key, score and list slot)
+ENTRY_BYTES = 160
+
+
+class TranspositionTable(object):
+    """Fixed-size hash table of search results with a two-slot bucket
+    replacement policy.
+
+    Parameters
+    ----------
+    entries : int (optional)
+        The maximum number of entries stored in the table.
+
+    mb : float (optional)
+        The approximate memory budget of the table in megabytes; used to
+        compute the number of entries when `entries` is not given.
+
+    symmetric : boolean (optional)
+        Flag indicating whether the search should key positions by
+        `Board.canonical_hash()` and store moves in the canonical orientation,
+        so that every symmetric orientation of a position shares one entry.
+        Only valid with heuristics that are invariant under the symmetries.
+    """
+    def __init__(self, entries=None, mb=None, symmetric=False):
+        self.symmetric = symmetric
+        if entries is None:
+            entries = int(mb * 2**20 / ENTRY_BYTES) if mb is not None else 2**16
+        if entries < 2:
+            raise ValueError("A transposition table needs at least two entries.")
+        self.num_buckets = entries // 2
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        """Remove every entry from the table and reset the counters."""
+        self.__depth_slots__ = [None] * self.num_buckets
+        self.__recent_slots__ = [None] * self.num_buckets
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Mark the start of a new search so that deep entries left over from
+        earlier moves can be replaced in the depth-preferred slots.
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """Look up the entry stored for a position.
+
+        Parameters
+        ----------
+        key : int
+            The hash of the position (i.e., `Board.hash`).
+
+        Returns
+        -------
+        tuple or None
+            The entry (key, depth, score, bound, move, generation) stored for
+            the position, or None if the position is not in the table.
+        """
+        index = key % self.num_buckets
+        entry = self.__depth_slots__[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        other = self.__recent_slots__[index]
+        if other is not None and other[0] == key:
+            self.hits += 1
+            return other
+        self.misses += 1
+        # the bucket is occupied by other positions that map to the same index
+        if entry is not None or other is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a position.
+
+        Parameters
+        ----------
+        key : int
+            The hash of the position (i.e., `Board.hash`).
+
+        depth : int
+            The remaining search depth used to compute the score.
+
+        score : float
+            The score of the position.
+
+        bound : {EXACT, LOWER, UPPER}
+            Whether the score is exact, or a lower or upper bound on the true
+            score of the position.
+
+        move : (int, int)
+            The best move found in the position.
+        """
+        self.stores += 1
+        index = key % self.num_buckets
+        entry = (key, depth, score, bound, move, self.generation)
+        current = self.__depth_slots__[index]
+        if current is None or current[0] == key or depth >= current[1] \
+                or current[5] != self.generation:
+            self.__depth_slots__[index] = entry
+            # drop the stale copy of the position from the other slot
+            other = self.__recent_slots__[index]
+            if other is not None and other[0] == key:
+                self.__recent_slots__[index] = None
+        else:
+            self.__recent_slots__[index] = entry
+
+    def stats(self):
+        """Return the table counters as a dictionary."""
+        used = sum(entry is not None for entry in self.__depth_slots__) + \
+            sum(entry is not None for entry in self.__recent_slots__)
+        return {"hits": self.hits, "misses": self.misses,
+                "collisions": self.collisions, "stores": self.stores,
+                "entries": used, "capacity": 2 * self.num_buckets}
+
+
+class SharedTranspositionTable(object):
+    """Transposition table stored in a `multiprocessing.shared_memory` block
+    so that several worker processes can read and write the same entries.
+
+    Entries are written without locks: each slot stores the score, a packed
+    word with the depth, bound, move and generation, and a check word equal
+    to the XOR of the key with the two data words. A reader only accepts a
+    slot whose check word matches, so entries torn by concurrent writes are
+    treated as misses. The table has the same interface and two-slot bucket
+    replacement policy as `TranspositionTable`; the counters are kept per
+    process.
+
+    Parameters
+    ----------
+    entries : int (optional)
+        The maximum number of entries stored in the table.
+
+    mb : float (optional)
+        The memory budget of the table in megabytes; used to compute the
+        number of entries when `entries` is not given.
+
+    symmetric : boolean (optional)
+        See `TranspositionTable`.
+
+    name : str (optional)
+        The name of an existing shared memory block to attach to instead of
+        creating a new one.
+    """
+    SLOT = struct.Struct("<QdQ")
+    HEADER = struct.Struct("<Q")
+
+    def __init__(self, entries=None, mb=None, symmetric=False, name=None):
+        self.symmetric = symmetric
+        if name is not None:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.num_buckets = (self.memory.size - self.HEADER.size) // (2 * self.SLOT.size)
+        else:
+            if entries is None:
+                entries = int(mb * 2**20 / self.SLOT.size) if mb is not None else 2**16
+            if entries < 2:
+                raise ValueError("A transposition table needs at least two entries.")
+            self.num_buckets = entries // 2
+            size = self.HEADER.size + 2 * self.num_buckets * self.SLOT.size
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:size] = bytes(size)
+        self.owner = name is None
+        self.reset_counters()
+
+    def __getstate__(self):
+        # other processes attach to the same block by name
+        return {"name": self.memory.name, "symmetric": self.symmetric}
+
+    def __setstate__(self, state):
+        self.__init__(symmetric=state["symmetric"], name=state["name"])
+
+    def reset_counters(self):
+        """Reset the hit/miss/collision counters of this process."""
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        """Remove every entry from the table and reset the counters."""
+        size = self.memory.size
+        self.memory.buf[:size] = bytes(size)
+        self.reset_counters()
+
+    def close(self):
+        """Detach from the shared memory block, destroying it if this table
+        created it.
+        """
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    @property
+    def generation(self):
+        """The search generation shared by every process using the table."""
+        return self.HEADER.unpack_from(self.memory.buf, 0)[0]
+
+    def new_search(self):
+        """Mark the start of a new search so that deep entries left over from
+        earlier moves can be replaced in the depth-preferred slots.
+        """
+        self.HEADER.pack_into(self.memory.buf, 0, (self.generation + 1) & 0xFFFF)
+
+    def _read(self, offset):
+        """Return the verified (key, depth, score, bound, move, generation)
+        entry stored at a slot offset, or None for an empty or torn slot.
+        """
+        check, score, info = self.SLOT.unpack_from(self.memory.buf, offset)
+        if not info:
+            return None
+        score_bits = struct.unpack("<Q", struct.pack("<d", score))[0]
+        move = (info >> 24) & 0xFFFF
+        move = None if move == 0xFFFF else (move >> 8, move & 0xFF)
+        return (check ^ score_bits ^ info, (info & 0xFFFF) - 1, score,
+                (info >> 16) & 0xFF, move, info >> 40)
+
+    def _write(self, offset, key, depth, score, bound, move):
+        """Write an entry to a slot offset."""
+        move = 0xFFFF if move is None else (move[0] << 8) | move[1]
+        info = (depth + 1) | (bound << 16) | (move << 24) | (self.generation << 40)
+        score_bits = struct.unpack("<Q", struct.pack("<d", score))[0]
+        self.SLOT.pack_into(self.memory.buf, offset, key ^ score_bits ^ info, score, info)
+
+    def probe(self, key):
+        """Look up the entry stored for a position; see
+        `TranspositionTable.probe()`.
+        """
+        offset = self.HEADER.size + (key % self.num_buckets) * 2 * self.SLOT.size
+        occupied = False
+        for slot in (offset, offset + self.SLOT.size):
+            entry = self._read(slot)
+            if entry is not None:
+                if entry[0] == key:
+                    self.hits += 1
+                    return entry
+                occupied = True
+        self.misses += 1
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a position; see
+        `TranspositionTable.store()`.
+        """
+        self.stores += 1
+        offset = self.HEADER.size + (key % self.num_buckets) * 2 * self.SLOT.size
+        current = self._read(offset)
+        if current is None or current[0] == key or depth >= current[1] \
+                or current[5] != self.generation:
+            self._write(offset, key, depth, score, bound, move)
+        else:
+            self._write(offset + self.SLOT.size, key, depth, score, bound, move)
+
+    def stats(self):
+        """Return the table counters of this process as a dictionary."""
+        used = 0
+        for index in range(2 * self.num_buckets):
+            if self._read(self.HEADER.size + index * self.SLOT.size) is not None:
+                used += 1
+        return {"hits": self.hits, "misses": self.misses,
+                "collisions": self.collisions, "stores": self.stores,
+                "entries": used, "capacity": 2 * self.num_buckets}
@@ -0,0 +1,285 @@
+"""This file contains the automatic tuning of the weights of a heuristic
+written in the language of `heuristics`, by simultaneous perturbation
+stochastic approximation (SPSA) over self-play matches.
+
+Every iteration perturbs all the weights at once in a random direction,
+plays a batch of matches between an agent using the weights plus the
+perturbation and an agent using the weights minus the perturbation, and
+moves the weights toward the side that won more games:
+
+    theta += a_k * (wins_plus - wins_minus) / games / (2 * c_k) * delta
+
+where delta is a random vector of +1/-1, the weights are perturbed by
++/- c_k * delta, and the step sizes a_k and c_k (per weight) shrink with
+the iteration number k. A single batch of matches estimates the gradient in
+every dimension, so the cost of an iteration does not grow with the number
+of weights.
+
+The matches of an iteration are independent and are played by a
+`tournament.MatchPool` (processes or a coordinator with remote workers)
+started once for the whole run; each iteration only sends the perturbed
+weights to the workers, which build the two agents from them. An iteration
+therefore takes time proportional to the number of matches divided by the
+number of workers; use a number of matches per iteration that is a
+multiple of the number of workers. The state is written
+to a JSON checkpoint after every iteration, and a tuning run started with
+an existing checkpoint continues from it. The perturbations and match
+openings are derived from the seed and the iteration number, so a resumed
+run plays the same matches as an uninterrupted one.
+
+    python tuning.py CHECKPOINT [--iterations N] [--matches N]
+                     [--processes N] [--weights JSON]
+
+The tuned weights are available as a heuristic with `load_score_fn()`:
+
+    CustomPlayer(score_fn=tuning.load_score_fn("tuning.json"))
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+
+import tournament
+
+from game_agent import CustomPlayer
+from heuristics import compile_heuristic
+
+# Version of the checkpoint format
+FORMAT_VERSION = 1
+
+# Weights tuned by default: the mobility, second-order mobility and area
+# of both players
+DEFAULT_WEIGHTS = {"own_moves": 1., "opp_moves": -1., "own_moves2": 0.,
+                   "opp_moves2": 0., "own_area": 0., "opp_area": 0.}
+
+# Agents of the tuning matches: iterative deepening alpha-beta search
+PLAYER_ARGS = {"method": "alphabeta", "iterative": True}
+
+
+def tuning_players(player_args, minus, plus):
+    """Return the agents of a tuning match: the `CustomPlayer`s using the
+    weights minus and plus the perturbation."""
+    return [CustomPlayer(score_fn=compile_heuristic(minus), **player_args),
+            CustomPlayer(score_fn=compile_heuristic(plus), **player_args)]
+
+
+class SPSATuner(object):
+    """SPSA optimizer of the weights of a heuristic.
+
+    Parameters
+    ----------
+    weights : dict<str, float>
+        The initial weight of each feature (see `heuristics.FEATURES`).
+
+    a : float (optional)
+        The scale of the weight updates.
+
+    c : float or dict<str, float> (optional)
+        The size of the perturbations, for every feature or per feature.
+
+    A : float (optional)
+        The stability constant delaying the decay of the update size.
+
+    alpha, gamma : float (optional)
+        The decay exponents of the update and perturbation sizes.
+
+    matches : int (optional)
+        The number of matches (two games each) per iteration.
+
+    seed : int (optional)
+        The seed of the perturbations and match openings; random if None.
+
+    player_args : dict (optional)
+        The arguments of the `CustomPlayer` of both agents, besides the
+        heuristic.
+
+    Attributes
+    ----------
+    iteration : int
+        The number of completed iterations.
+
+    history : list<dict>
+        The iteration number, weights and games won by each side for every
+        completed iteration.
+    """
+    def __init__(self, weights, a=.5, c=.5, A=10., alpha=.602, gamma=.101,
+                 matches=8, seed=None, player_args=None):
+        self.weights = {feature: float(weight) for feature, weight in weights.items()}
+        self.features = sorted(self.weights)
+        if not isinstance(c, dict):
+            c = dict.fromkeys(self.features, c)
+        self.a, self.c, self.A = a, {feature: float(c[feature]) for feature in self.features}, A
+        self.alpha, self.gamma = alpha, gamma
+        self.matches = matches
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.player_args = dict(PLAYER_ARGS if player_args is None else player_args)
+        self.iteration = 0
+        self.history = []
+        # compile the weights once to reject unknown features early
+        compile_heuristic(self.weights)
+
+    def perturbation(self, iteration):
+        """Return the random +1/-1 direction of each feature at an iteration."""
+        rng = random.Random("{}:spsa/{}".format(self.seed, iteration))
+        return {feature: rng.choice((-1., 1.)) for feature in self.features}
+
+    def step_sizes(self, iteration):
+        """Return the update size of an iteration and the factor of the
+        perturbation sizes `c`."""
+        k = iteration + 1
+        return self.a / (k + self.A) ** self.alpha, 1. / k ** self.gamma
+
+    def step(self, processes=1, pin_cpus=False, coordinator=None, pool=None):
+        """Run one iteration: play the matches between the two perturbed
+        weightings and update the weights.
+
+        Parameters
+        ----------
+        processes, pin_cpus, coordinator : (optional)
+            See `tournament.play_matches()`; used to start a pool for this
+            iteration when `pool` is not given.
+
+        pool : tournament.MatchPool (optional)
+            The pool playing the matches, kept across iterations by `run()`.
+
+        Returns
+        -------
+        dict
+            The record of the iteration appended to `history`.
+        """
+        if pool is None:
+            with tournament.MatchPool(processes, pin_cpus, coordinator) as pool:
+                return self.step(pool=pool)
+        delta = self.perturbation(self.iteration)
+        a_k, c_k = self.step_sizes(self.iteration)
+        size = {feature: c_k * self.c[feature] for feature in self.features}
+        plus = {feature: self.weights[feature] + size[feature] * delta[feature]
+                for feature in self.features}
+        minus = {feature: self.weights[feature] - size[feature] * delta[feature]
+                 for feature in self.features}
+        # the workers build the agents from the weights
+        players = functools.partial(tuning_players, self.player_args, minus, plus)
+
+        # each match plays both colors from the same opening
+        round_id = "spsa/{}".format(self.iteration)
+        matches = [tournament.Match("{}/{}".format(round_id, number), 0, 1, 0,
+                                    "{}:{}/{}".format(self.seed, round_id, number))
+                   for number in range(self.matches)]
+        wins_plus = wins_minus = 0
+        for _, score_plus, score_minus, _ in pool.imap(players, matches):
+            wins_plus += score_plus
+            wins_minus += score_minus
+
+        result = (wins_plus - wins_minus) / (2. * self.matches)
+        for feature in self.features:
+            self.weights[feature] += a_k * result / (2. * size[feature]) * delta[feature]
+        self.iteration += 1
+        record = {"iteration": self.iteration, "wins_plus": wins_plus,
+                  "wins_minus": wins_minus, "weights": dict(self.weights)}
+        self.history.append(record)
+        return record
+
+    def run(self, iterations, checkpoint=None, processes=1, pin_cpus=False,
+            coordinator=None, callback=None):
+        """Run iterations until `iterations` have been completed in total,
+        writing the checkpoint (if given) after each one.
+
+        Parameters
+        ----------
+        iterations : int
+            The total number of iterations, including those of a resumed run.
+
+        checkpoint : str (optional)
+            The path of the JSON checkpoint.
+
+        processes, pin_cpus, coordinator : (optional)
+            See `tournament.play_matches()`; one pool plays the matches of
+            every iteration.
+
+        callback : callable (optional)
+            Function called as callback(tuner, record) after every iteration.
+        """
+        with tournament.MatchPool(processes, pin_cpus, coordinator) as pool:
+            while self.iteration < iterations:
+                record = self.step(pool=pool)
+                if checkpoint is not None:
+                    self.save(checkpoint)
+                if callback is not None:
+                    callback(self, record)
+        return self.weights
+
+    def score_fn(self, name="tuned"):
+        """Return the heuristic of the current weights."""
+        return compile_heuristic(self.weights, name)
+
+    def as_dict(self):
+        """Return the state of the tuner as a dictionary of JSON-serializable
+        values."""
+        return {"format": FORMAT_VERSION, "weights": self.weights,
+                "settings": {"a": self.a, "c": self.c, "A": self.A, "alpha": self.alpha,
+                             "gamma": self.gamma, "matches": self.matches,
+                             "seed": self.seed, "player_args": self.player_args},
+                "iteration": self.iteration, "history": self.history}
+
+    def save(self, path):
+        """Write the state of the tuner to a JSON checkpoint; the previous
+        checkpoint is replaced atomically, so an interrupted run never
+        leaves a partial file."""
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write("\n")
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Return the tuner saved in a JSON checkpoint."""
+        with open(path) as f:
+            state = json.load(f)
+        if state["format"] != FORMAT_VERSION:
+            raise ValueError("Unsupported checkpoint format {}.".format(state["format"]))
+        tuner = cls(state["weights"], **state["settings"])
+        tuner.iteration = state["iteration"]
+        tuner.history = state["history"]
+        return tuner
+
+
+def load_score_fn(path, name="tuned"):
+    """Return the heuristic of the weights in a tuning checkpoint."""
+    return SPSATuner.load(path).score_fn(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the weights of a heuristic by self-play.")
+    parser.add_argument("checkpoint", help="JSON checkpoint, resumed if it exists")
+    parser.add_argument("--iterations", type=int, default=100, help="total iterations")
+    parser.add_argument("--matches", type=int, default=8, help="matches per iteration")
+    parser.add_argument("--processes", type=int, default=tournament.PROCESSES,
+                        help="worker processes playing the matches")
+    parser.add_argument("--weights", type=json.loads, default=DEFAULT_WEIGHTS,
+                        help="initial weights as a JSON object (new runs only)")
+    parser.add_argument("--seed", type=int, help="seed of a new run")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.checkpoint):
+        tuner = SPSATuner.load(args.checkpoint)
+        print("Resuming {} at iteration {}".format(args.checkpoint, tuner.iteration))
+    else:
+        tuner = SPSATuner(args.weights, matches=args.matches, seed=args.seed)
+
+    def report(tuner, record):
+        print("{:>5}  +{:<3} -{:<3} {}".format(
+            record["iteration"], record["wins_plus"], record["wins_minus"],
+            " ".join("{}={:.3f}".format(feature, weight)
+                     for feature, weight in sorted(record["weights"].items()))))
+
+    tuner.run(args.iterations, args.checkpoint, args.processes, tournament.PIN_CPUS,
+              tournament.COORDINATOR, report)
+    print("\nTuned heuristic:\n")
+    print(tuner.score_fn().source)
+
+
+if __name__ == "__main__":
+    main()